@@ -5,6 +5,9 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Le flux des promotions (plats:promotions-flux) n'est diffusé en continu que sous ASGI,
+par exemple : uvicorn E_Menu.asgi:application --workers 4
 """
 
 import os
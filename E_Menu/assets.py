@@ -0,0 +1,68 @@
+"""Regroupement des fichiers statiques (bundles CSS/JS).
+
+Chaque bundle de settings.STATIC_BUNDLES est la concaténation de ses sources. `BundleFinder`
+l'expose comme un fichier statique ordinaire : runserver le sert tel quel, et `collectstatic`
+le copie, lui ajoute l'empreinte de son contenu (manifest) et en génère la version gzip,
+comme pour les autres fichiers.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core import checks
+from django.core.files.storage import FileSystemStorage
+
+
+class BundleFinder(finders.BaseFinder):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Hors du dépôt : les bundles sont reconstruits à la demande
+        self.dossier = os.path.join(tempfile.gettempdir(), 'e-menu-bundles')
+        self.stockage = FileSystemStorage(location=self.dossier)
+
+    @staticmethod
+    def bundles():
+        return getattr(settings, 'STATIC_BUNDLES', {})
+
+    def check(self, **kwargs):
+        return [
+            checks.Error(f"Source introuvable pour le bundle {nom} : {source}", id='e_menu.E001')
+            for nom, sources in self.bundles().items()
+            for source in sources
+            if finders.find(source) is None
+        ]
+
+    def find(self, path, find_all=False, **kwargs):
+        find_all = find_all or kwargs.get('all', False)
+        if path not in self.bundles():
+            return [] if find_all else None
+        chemin = self.construire(path)
+        return [chemin] if find_all else chemin
+
+    def list(self, ignore_patterns):
+        for nom in self.bundles():
+            self.construire(nom)
+            yield nom, self.stockage
+
+    def construire(self, nom):
+        """Écrit le bundle `nom` (seulement si son contenu a changé) et retourne son chemin"""
+        separateur = b'\n;\n' if nom.endswith('.js') else b'\n'
+        morceaux = []
+        for source in self.bundles()[nom]:
+            with open(finders.find(source), 'rb') as fichier:
+                morceaux.append(fichier.read())
+        contenu = separateur.join(morceaux)
+
+        chemin = self.stockage.path(nom)
+        try:
+            with open(chemin, 'rb') as fichier:
+                if fichier.read() == contenu:
+                    return chemin
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        descripteur, temporaire = tempfile.mkstemp(dir=os.path.dirname(chemin))
+        with os.fdopen(descripteur, 'wb') as sortie:
+            sortie.write(contenu)
+        os.replace(temporaire, chemin)
+        return chemin
@@ -27,6 +27,9 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+# Adresse publique du site, pour les liens absolus hors requête (QR codes des menus)
+SITE_URL = os.environ.get('SITE_URL', 'http://localhost:8000')
+
 
 # Application definition
 
@@ -36,6 +39,10 @@ INSTALLED_APPS = [
     'menus.apps.MenusConfig',
     'plats.apps.PlatsConfig',
     'structures.apps.StructuresConfig',
+    'recherche.apps.RechercheConfig',
+    'medias.apps.MediasConfig',
+    'api.apps.ApiConfig',
+    'rest_framework',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -46,6 +53,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -92,6 +100,25 @@ DATABASES = {
 }
 
 
+# Cache : Redis (django-redis) en production via REDIS_URL, mémoire locale sinon (développement, tests)
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'e-menu',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -137,10 +164,38 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
 
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    'E_Menu.assets.BundleFinder',
+]
+
+# Fichiers regroupés (E_Menu.assets) : une seule requête pour les CSS/JS communs à une page
+STATIC_BUNDLES = {
+    'css/site.css': ['css/base.css', 'css/responsive.css', 'css/cards.css'],
+    'css/accueil.css': ['css/home.css', 'css/promotions.css'],
+    'js/site.js': ['js/script.js', 'js/scroll-animations.js'],
+}
+
 # Media files (user-uploaded files)
 MEDIA_URL = '/photos/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'photos')
 
+# Médias rangés par empreinte de contenu : un même fichier n'est stocké qu'une fois.
+# Statiques : en production, `collectstatic` ajoute l'empreinte du contenu aux noms (manifest)
+# et génère les versions gzip, servies par WhiteNoise avec un cache immuable.
+STORAGES = {
+    'default': {'BACKEND': 'medias.stockage.StockageContenu'},
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
+# Fichiers sans empreinte (favicon...) : cache court ; les fichiers empreintés sont immuables
+WHITENOISE_MAX_AGE = 0 if DEBUG else 3600
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -154,3 +209,46 @@ LOGOUT_REDIRECT_URL = 'accounts:login'  # Redirection après déconnexion
 
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
+
+# Journal des connexions (accounts.audit) : écriture différée par lots depuis un thread
+LOGIN_AUDIT = {
+    'SYNCHRONE': False,   # True : insertion immédiate (tests)
+    'TAILLE_LOT': 100,    # écriture dès que la file atteint cette taille...
+    'INTERVALLE': 2.0,    # ...ou au plus tard après ce délai (secondes)
+}
+
+# Traitement des photos (medias.traitement) : pool de threads hors requête
+IMAGE_PROCESSING = {
+    'SYNCHRONE': False,   # True : traitement immédiat dans la requête (tests)
+    'WORKERS': 2,         # nombre de threads du pool
+}
+
+# Export PDF des menus (menus.pdf) : rendu reportlab dans un pool de threads
+MENU_PDF = {
+    'SYNCHRONE': False,   # True : rendu immédiat dans la requête (tests)
+    'WORKERS': 1,         # nombre de threads du pool
+}
+
+# Événements de promotion en direct (plats.evenements), servis en SSE sous E_Menu.asgi
+PROMOTIONS_EVENEMENTS = {
+    'REDIS_URL': REDIS_URL,  # diffusion entre processus ; None : abonnés du seul processus
+    'BATTEMENT': 15,         # secondes entre deux commentaires de maintien de la connexion
+    'TAILLE_FILE': 100,      # événements en attente par abonné
+}
+
+# Service des médias (medias.views) ; derrière nginx, définir une location `internal` :
+#   location /_photos/ { internal; alias /chemin/vers/photos/; }
+MEDIA_SERVING = {
+    'ACCEL_REDIRECT': os.environ.get('MEDIA_ACCEL_REDIRECT'),  # ex. '/_photos/'
+    'MAX_AGE': 24 * 3600,  # fichiers à nom non adressé par contenu (les autres sont immuables)
+}
+
+# API JSON en lecture seule (api) : publique, sans session ni formulaire navigable
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+    'DEFAULT_PARSER_CLASSES': ['rest_framework.parsers.JSONParser'],
+    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.AllowAny'],
+    'UNAUTHENTICATED_USER': None,
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.PaginationCurseur',
+}
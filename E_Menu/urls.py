@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import TemplateView
@@ -10,4 +11,6 @@ urlpatterns = [
     path("avis/", include("avis.urls", namespace="avis")),
     path("plats/", include("plats.urls", namespace="plats")),
     path("structures/", include("structures.urls", namespace="structures")),
+    path("api/v1/", include("api.urls", namespace="api")),
+    path(settings.MEDIA_URL.lstrip('/'), include("medias.urls", namespace="medias")),
 ]
@@ -0,0 +1,123 @@
+"""Journal des connexions en écriture différée (write-behind).
+
+Les vues ajoutent les événements de connexion/déconnexion/échec dans une file en mémoire ;
+un thread d'arrière-plan les insère par `bulk_create` dès que la file atteint `TAILLE_LOT`
+ou toutes les `INTERVALLE` secondes, et reporte le lot dans les cumuls `LoginDailyStats`.
+La file est vidée à l'arrêt du processus (atexit, ou `journal_connexions.vider()` depuis
+le hook `worker_exit` de gunicorn).
+
+Configuration (settings.LOGIN_AUDIT) :
+    SYNCHRONE   insertion immédiate dans la requête (tests)
+    TAILLE_LOT  nombre d'événements déclenchant une écriture
+    INTERVALLE  délai maximal (secondes) avant écriture
+    TAILLE_MAX  taille maximale de la file (les plus anciens sont abandonnés au-delà)
+"""
+import atexit
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import User, UserLoginHistory
+from accounts.statistiques import cumuler_connexions
+
+logger = logging.getLogger(__name__)
+
+CONFIGURATION_PAR_DEFAUT = {
+    'SYNCHRONE': False,
+    'TAILLE_LOT': 100,
+    'INTERVALLE': 2.0,
+    'TAILLE_MAX': 10000,
+}
+
+
+def configuration():
+    return {**CONFIGURATION_PAR_DEFAUT, **getattr(settings, 'LOGIN_AUDIT', {})}
+
+
+def adresse_ip(request):
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    return x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR')
+
+
+class JournalConnexions:
+    def __init__(self):
+        self._file = deque(maxlen=configuration()['TAILLE_MAX'])
+        self._verrou = threading.Lock()
+        self._reveil = threading.Event()
+        self._thread = None
+
+    def enregistrer(self, request, action, login_success, user=None, email=None):
+        """Ajoute un événement ; l'utilisateur est donné directement ou retrouvé par email à l'écriture"""
+        evenement = {
+            'user_id': user.pk if user is not None else None,
+            'email': email,
+            'ip_address': adresse_ip(request),
+            'user_agent': request.META.get('HTTP_USER_AGENT', '')[:255],
+            'login_success': login_success,
+            'action': action,
+            'login_time': timezone.now(),
+        }
+        config = configuration()
+        if config['SYNCHRONE']:
+            self._ecrire([evenement])
+            return
+
+        with self._verrou:
+            self._file.append(evenement)
+            taille = len(self._file)
+        self._demarrer()
+        if taille >= config['TAILLE_LOT']:
+            self._reveil.set()
+
+    def vider(self):
+        """Écrit immédiatement tous les événements en attente"""
+        while True:
+            with self._verrou:
+                lot = list(self._file)
+                self._file.clear()
+            if not lot:
+                return
+            self._ecrire(lot)
+
+    def _demarrer(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._verrou:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._boucle, name='journal-connexions', daemon=True)
+                self._thread.start()
+
+    def _boucle(self):
+        while True:
+            self._reveil.wait(configuration()['INTERVALLE'])
+            self._reveil.clear()
+            try:
+                self.vider()
+            finally:
+                connection.close()
+
+    @staticmethod
+    def _ecrire(lot):
+        emails = {e['email'] for e in lot if e['user_id'] is None and e['email']}
+        ids_par_email = dict(User.objects.filter(email__in=emails).values_list('email', 'id')) if emails else {}
+        lignes = []
+        for evenement in lot:
+            user_id = evenement.pop('user_id') or ids_par_email.get(evenement['email'])
+            evenement.pop('email')
+            # Échec sur un email inconnu : rien à historiser
+            if user_id is not None:
+                lignes.append(UserLoginHistory(user_id=user_id, **evenement))
+        try:
+            with transaction.atomic():
+                UserLoginHistory.objects.bulk_create(lignes)
+                cumuler_connexions(lignes)
+        except Exception:
+            logger.exception("Échec d'écriture de %d événement(s) de connexion", len(lignes))
+
+
+journal_connexions = JournalConnexions()
+atexit.register(journal_connexions.vider)
@@ -0,0 +1,79 @@
+"""Parties propres à l'utilisateur des pages publiques, servies à part de la page en cache.
+
+Les pages publiques (structure, menu, plat et leurs avis) sont rendues sans utilisateur et mises
+en cache pour tous ; `static/js/utilisateur.js` récupère ensuite ce contexte en JSON et
+affiche les éléments marqués `data-si="..."` (propriétaire, avis existant, navigation...).
+"""
+from django.db.models import BooleanField, Exists, ExpressionWrapper, OuterRef, Q, Subquery
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from avis.models import Avis
+from menus.models import Menus
+from plats.models import Plats
+from structures.models import Structures
+
+
+def _annotations(user, champ_avis):
+    return {
+        'avis_id': Subquery(Avis.objects.filter(user=user, **{champ_avis: OuterRef('pk')}).values('pk')[:1]),
+        'a_structure': Exists(Structures.objects.filter(user=user)),
+    }
+
+
+def _ligne_structure(user, structure_id):
+    return Structures.objects.filter(pk=structure_id).annotate(
+        proprietaire=ExpressionWrapper(Q(user_id=user.pk), output_field=BooleanField()),
+        **_annotations(user, 'structure'),
+    ).values('proprietaire', 'avis_id', 'a_structure').first()
+
+
+def _ligne_plat(user, plat_id):
+    return Plats.objects.filter(pk=plat_id).annotate(
+        proprietaire=ExpressionWrapper(Q(createur_id=user.pk), output_field=BooleanField()),
+        menu_parent_id=Subquery(Menus.objects.filter(plats=OuterRef('pk')).values('pk')[:1]),
+        **_annotations(user, 'plat'),
+    ).values('proprietaire', 'avis_id', 'a_structure', 'menu_parent_id').first()
+
+
+def _ligne_menu(user, menu_id):
+    return Menus.objects.filter(pk=menu_id).annotate(
+        proprietaire=ExpressionWrapper(Q(createur_id=user.pk), output_field=BooleanField()),
+        a_structure=Exists(Structures.objects.filter(user=user)),
+    ).values('proprietaire', 'a_structure').first()
+
+
+def contexte_utilisateur(request, structure_id=None, plat_id=None, menu_id=None, chemin=''):
+    """Contexte JSON de l'utilisateur pour une page publique, en une seule requête indexée"""
+    user = request.user
+    if not user.is_authenticated:
+        return {'connecte': False}
+
+    ligne = None
+    if structure_id is not None:
+        ligne = _ligne_structure(user, structure_id)
+    elif plat_id is not None:
+        ligne = _ligne_plat(user, plat_id)
+    elif menu_id is not None:
+        ligne = _ligne_menu(user, menu_id)
+    if ligne is None:
+        # Page sans objet (ou objet supprimé entre-temps) : seule la navigation est utile
+        ligne = {'a_structure': Structures.objects.filter(user=user).exists()}
+
+    liens = {}
+    if ligne.get('avis_id'):
+        liens['modifier_avis'] = reverse('avis:avis-update', args=[ligne['avis_id']])
+    if ligne.get('menu_parent_id'):
+        liens['menu_parent'] = reverse('menus:menu-detail', args=[ligne['menu_parent_id']])
+
+    return {
+        'connecte': True,
+        'proprietaire': bool(ligne.get('proprietaire')),
+        'avis': ligne.get('avis_id'),
+        'liens': liens,
+        'csrf': get_token(request),
+        'navigation': render_to_string(
+            '_navigation_utilisateur.html', {'a_structure': ligne['a_structure'], 'chemin': chemin}, request=request
+        ),
+    }
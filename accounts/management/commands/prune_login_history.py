@@ -0,0 +1,43 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.models import UserLoginHistory
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprime par petits lots l'historique brut des connexions au-delà de la durée de rétention "
+        "(les cumuls quotidiens LoginDailyStats sont conservés)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help="Durée de rétention en jours (défaut : 90)")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--pause', type=float, default=0.0, help="Pause entre deux lots (secondes)")
+        parser.add_argument('--dry-run', action='store_true', help="Compter les lignes sans rien supprimer")
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=options['days'])
+        anciens = UserLoginHistory.objects.filter(login_time__lt=limite)
+
+        if options['dry_run']:
+            self.stdout.write(f"{anciens.count()} événement(s) antérieur(s) au {limite:%d/%m/%Y} à supprimer.")
+            return
+
+        total = 0
+        while True:
+            # Un DELETE court par lot d'ids (autocommit) plutôt qu'une transaction unique sur toute la table
+            ids = list(anciens.order_by('id').values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            supprimes, _ = UserLoginHistory.objects.filter(id__in=ids).delete()
+            total += supprimes
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} événement(s) antérieur(s) au {limite:%d/%m/%Y} supprimé(s)."
+        ))
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+
+def remplir_cumuls(apps, schema_editor):
+    UserLoginHistory = apps.get_model('accounts', 'UserLoginHistory')
+    LoginDailyStats = apps.get_model('accounts', 'LoginDailyStats')
+    lignes = (
+        UserLoginHistory.objects.annotate(day=TruncDate('login_time'))
+        .order_by()
+        .values('user_id', 'day')
+        .annotate(
+            successes=Count('id', filter=Q(action='LOGIN', login_success=True)),
+            failures=Count('id', filter=Q(action='FAILED_ATTEMPT') | Q(action='LOGIN', login_success=False)),
+            logouts=Count('id', filter=Q(action='LOGOUT')),
+        )
+    )
+    batch = []
+    for ligne in lignes.iterator():
+        batch.append(LoginDailyStats(**ligne))
+        if len(batch) >= 1000:
+            LoginDailyStats.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        LoginDailyStats.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_login_time_evenement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoginDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('successes', models.PositiveIntegerField(default=0)),
+                ('failures', models.PositiveIntegerField(default=0)),
+                ('logouts', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['day'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='userloginhistory',
+            index=models.Index(fields=['user', 'login_time'], name='accounts_login_user_time_idx'),
+        ),
+        migrations.AddField(
+            model_name='logindailystats',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='login_daily_stats', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='logindailystats',
+            constraint=models.UniqueConstraint(fields=('user', 'day'), name='unique_login_daily_stats'),
+        ),
+        migrations.RunPython(remplir_cumuls, migrations.RunPython.noop),
+    ]
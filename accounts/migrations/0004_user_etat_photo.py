@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_login_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='etat_photo',
+            field=models.CharField(blank=True, choices=[('', 'Non traitée'), ('en_attente', 'En attente'), ('prete', 'Prête'), ('echec', 'Échec')], default='', editable=False, max_length=12),
+        ),
+    ]
@@ -1,5 +1,9 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
+from django.utils import timezone
+
+from medias.models import EtatPhoto
+
 
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -46,6 +50,7 @@ class User(AbstractUser):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='client')
     photo = models.ImageField(upload_to='users/', blank=True, null=True)
+    etat_photo = models.CharField(max_length=12, choices=EtatPhoto.choices, default=EtatPhoto.AUCUN, blank=True, editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name']
@@ -85,7 +90,8 @@ class UserLoginHistory(models.Model):
     ]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='login_history')
-    login_time = models.DateTimeField(auto_now_add=True)
+    # Heure de l'événement (fixée à la requête, l'écriture pouvant être différée)
+    login_time = models.DateTimeField(default=timezone.now, editable=False)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.CharField(max_length=255, blank=True)
     login_success = models.BooleanField(default=True)
@@ -93,3 +99,21 @@ class UserLoginHistory(models.Model):
 
     class Meta:
         ordering = ['login_time']
+        indexes = [
+            models.Index(fields=['user', 'login_time'], name='accounts_login_user_time_idx'),
+        ]
+
+
+class LoginDailyStats(models.Model):
+    """Cumul quotidien des événements de connexion, tenu à jour à l'écriture du journal"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='login_daily_stats')
+    day = models.DateField()
+    successes = models.PositiveIntegerField(default=0)
+    failures = models.PositiveIntegerField(default=0)
+    logouts = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['day']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_login_daily_stats'),
+        ]
@@ -0,0 +1,96 @@
+"""Statistiques du tableau de bord calculées par agrégations conditionnelles."""
+from collections import Counter
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from accounts.models import LoginDailyStats
+from plats.models import Plats
+from structures.models import Structures
+
+JOURS_CONNEXIONS = 7
+
+
+@dataclass(frozen=True)
+class StatistiquesDashboard:
+    structures_count: int
+    menus_count: int
+    plats_count: int
+    plats_disponibles: int
+    plats_indisponibles: int
+    promotions_count: int
+    plats_par_categorie: dict  # libellé de catégorie -> nombre de plats
+    connexions_par_jour: dict  # 'jj/mm' -> nombre d'événements de connexion, du plus récent au plus ancien
+
+
+def statistiques_dashboard(user, now=None):
+    """Calcule tous les compteurs du tableau de bord en trois requêtes (connexions lues dans les cumuls quotidiens)"""
+    now = now or timezone.now()
+
+    par_categorie = {
+        code: Count('id', filter=Q(categorie=code)) for code, _ in Plats.CATEGORIES
+    }
+    plats = Plats.objects.filter(createur=user).aggregate(
+        total=Count('id'),
+        disponibles=Count('id', filter=Q(disponibilite=True)),
+        indisponibles=Count('id', filter=Q(disponibilite=False)),
+        promotions=Count('id', filter=Q(en_promotion=True)),
+        **par_categorie,
+    )
+
+    # Structures du propriétaire et menus qu'il y a créés, en une jointure
+    structures = Structures.objects.filter(user=user).aggregate(
+        total=Count('id', distinct=True),
+        menus=Count('menus', filter=Q(menus__createur=user)),
+    )
+
+    aujourd_hui = timezone.localdate(now)
+    jours = [aujourd_hui - timedelta(days=i) for i in range(JOURS_CONNEXIONS)]
+    connexions = dict(
+        LoginDailyStats.objects.filter(user=user, day__gte=jours[-1])
+        .annotate(total=F('successes') + F('failures') + F('logouts'))
+        .values_list('day', 'total')
+    )
+
+    return StatistiquesDashboard(
+        structures_count=structures['total'],
+        menus_count=structures['menus'],
+        plats_count=plats['total'],
+        plats_disponibles=plats['disponibles'],
+        plats_indisponibles=plats['indisponibles'],
+        promotions_count=plats['promotions'],
+        plats_par_categorie={nom: plats[code] for code, nom in Plats.CATEGORIES},
+        connexions_par_jour={jour.strftime('%d/%m'): connexions.get(jour, 0) for jour in jours},
+    )
+
+
+def _colonne_cumul(evenement):
+    if evenement.action == 'LOGOUT':
+        return 'logouts'
+    if evenement.action == 'LOGIN' and evenement.login_success:
+        return 'successes'
+    return 'failures'
+
+
+def cumuler_connexions(evenements):
+    """Reporte des UserLoginHistory nouvellement écrits dans les cumuls LoginDailyStats"""
+    deltas = Counter(
+        (e.user_id, timezone.localdate(e.login_time), _colonne_cumul(e)) for e in evenements
+    )
+    par_jour = {}
+    for (user_id, day, colonne), total in deltas.items():
+        par_jour.setdefault((user_id, day), {})[colonne] = total
+
+    for (user_id, day), compteurs in par_jour.items():
+        increments = {colonne: F(colonne) + total for colonne, total in compteurs.items()}
+        if LoginDailyStats.objects.filter(user_id=user_id, day=day).update(**increments):
+            continue
+        try:
+            with transaction.atomic():
+                LoginDailyStats.objects.create(user_id=user_id, day=day, **compteurs)
+        except IntegrityError:
+            # Ligne créée entre-temps par un autre processus
+            LoginDailyStats.objects.filter(user_id=user_id, day=day).update(**increments)
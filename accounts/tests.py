@@ -1,3 +1,162 @@
-from django.test import TestCase
+import os
+import re
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.audit import JournalConnexions
+from accounts.models import LoginDailyStats, UserLoginHistory
+from accounts.statistiques import cumuler_connexions, statistiques_dashboard
+from avis.models import Avis
+from menus.models import Menus
+from plats.models import Plats
+from structures.testing import StructureTestMixin, creer_structure, creer_utilisateur
+
+
+class StatistiquesDashboardTests(TestCase):
+    def setUp(self):
+        self.user = creer_utilisateur()
+        structure = creer_structure(self.user)
+        Menus.objects.create(nom='Midi', createur=self.user, structure=structure)
+        for categorie, disponibilite, en_promotion in (
+            ('plat', True, True), ('plat', False, False), ('dessert', True, False),
+        ):
+            Plats.objects.create(
+                nom=categorie, description='d', prix=1000, categorie=categorie, createur=self.user,
+                structure=structure, disponibilite=disponibilite, en_promotion=en_promotion,
+            )
+        cumuler_connexions([
+            UserLoginHistory.objects.create(user=self.user, action='LOGIN'),
+            UserLoginHistory.objects.create(user=self.user, action='LOGOUT'),
+        ])
+
+    def test_compteurs(self):
+        stats = statistiques_dashboard(self.user)
+        self.assertEqual(stats.structures_count, 1)
+        self.assertEqual(stats.menus_count, 1)
+        self.assertEqual(stats.plats_count, 3)
+        self.assertEqual((stats.plats_disponibles, stats.plats_indisponibles), (2, 1))
+        self.assertEqual(stats.promotions_count, 1)
+        self.assertEqual(stats.plats_par_categorie['Plat principal'], 2)
+        self.assertEqual(stats.plats_par_categorie['Dessert'], 1)
+        self.assertEqual(len(stats.connexions_par_jour), 7)
+        self.assertEqual(list(stats.connexions_par_jour.values())[0], 2)
+
+    def test_nombre_de_requetes_constant(self):
+        with self.assertNumQueries(3):
+            statistiques_dashboard(self.user)
+
+    def test_nombre_de_requetes_de_la_vue(self):
+        self.client.force_login(self.user)
+        # session + utilisateur, statistiques (3), structures, historique, puis les
+        # requêtes user.structure des templates (navigation et carte structure)
+        with self.assertNumQueries(12):
+            response = self.client.get(reverse('accounts:dashboard'))
+        self.assertEqual(response.status_code, 200)
+
+
+class ContexteUtilisateurTests(StructureTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('accounts:contexte-utilisateur')
+
+    def test_visiteur_anonyme(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'structure': self.structure.pk})
+        self.assertEqual(response.json(), {'connecte': False})
+
+    def test_proprietaire_avec_avis_en_une_requete(self):
+        avis = Avis.objects.create(user=self.user, structure=self.structure, note=4, commentaire='Bon')
+        self.client.force_login(self.user)
+        # session + utilisateur, puis une seule requête pour la structure
+        with self.assertNumQueries(3):
+            contexte = self.client.get(self.url, {'structure': self.structure.pk}).json()
+        self.assertTrue(contexte['proprietaire'])
+        self.assertEqual(contexte['avis'], avis.pk)
+        self.assertEqual(contexte['liens']['modifier_avis'], reverse('avis:avis-update', args=[avis.pk]))
+        self.assertIn('Mes plats', contexte['navigation'])
+
+
+class JournalConnexionsTests(TestCase):
+    def setUp(self):
+        self.user = creer_utilisateur('client@emenu.tg', password='secret123', first_name='C', last_name='D')
+        self.request = RequestFactory().post('/login/', REMOTE_ADDR='10.0.0.1', HTTP_USER_AGENT='test')
+
+    @override_settings(LOGIN_AUDIT={'SYNCHRONE': True})
+    def test_mode_synchrone_ecrit_dans_la_requete(self):
+        response = self.client.post(reverse('accounts:login'), {'username': self.user.email, 'password': 'faux'})
+        self.assertEqual(response.status_code, 302)
+        evenement = UserLoginHistory.objects.get(user=self.user)
+        self.assertEqual((evenement.action, evenement.login_success), ('FAILED_ATTEMPT', False))
+
+    @override_settings(LOGIN_AUDIT={'SYNCHRONE': False, 'TAILLE_LOT': 1000, 'INTERVALLE': 3600})
+    def test_evenements_ecrits_par_lot(self):
+        journal = JournalConnexions()
+        journal.enregistrer(self.request, 'LOGIN', True, user=self.user)
+        journal.enregistrer(self.request, 'FAILED_ATTEMPT', False, email=self.user.email)
+        journal.enregistrer(self.request, 'FAILED_ATTEMPT', False, email='inconnu@emenu.tg')
+        self.assertFalse(UserLoginHistory.objects.exists())
+
+        # résolution des emails, bulk_create, puis UPDATE et INSERT de la ligne du jour,
+        # points de sauvegarde compris
+        with self.assertNumQueries(8):
+            journal.vider()
+        self.assertEqual(
+            sorted(UserLoginHistory.objects.filter(user=self.user).values_list('action', flat=True)),
+            ['FAILED_ATTEMPT', 'LOGIN'],
+        )
+        cumul = LoginDailyStats.objects.get(user=self.user, day=timezone.localdate())
+        self.assertEqual((cumul.successes, cumul.failures, cumul.logouts), (1, 1, 0))
+
+    def test_cumuls_incrementes_par_lots_successifs(self):
+        evenements = [UserLoginHistory(user=self.user, action='LOGIN', login_time=timezone.now())]
+        cumuler_connexions(evenements)
+        with self.assertNumQueries(1):  # la ligne du jour existe : un seul UPDATE
+            cumuler_connexions(evenements)
+        self.assertEqual(LoginDailyStats.objects.get(user=self.user).successes, 2)
+
+
+class PruneLoginHistoryTests(TestCase):
+    def test_supprime_uniquement_les_evenements_anciens(self):
+        user = creer_utilisateur('ancien@emenu.tg', first_name='E', last_name='F')
+        maintenant = timezone.now()
+        for jours in (200, 120, 10):
+            UserLoginHistory.objects.create(user=user, action='LOGIN', login_time=maintenant - timedelta(days=jours))
+
+        call_command('prune_login_history', days=90, batch_size=1, stdout=StringIO())
+        self.assertEqual(UserLoginHistory.objects.count(), 1)
+
+
+class FichiersStatiquesTests(TestCase):
+    def setUp(self):
+        self.racine = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.racine, ignore_errors=True)
+        reglages = override_settings(
+            STATIC_ROOT=self.racine,
+            STORAGES={
+                'default': {'BACKEND': 'medias.stockage.StockageContenu'},
+                'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+            },
+        )
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_base_reference_les_noms_empreintes(self):
+        html = self.client.get(reverse('accounts:home')).content.decode()
+        css = re.search(r'/static/(css/site\.[0-9a-f]{12}\.css)"', html)
+        self.assertIsNotNone(css)
+        self.assertRegex(html, r'/static/js/site\.[0-9a-f]{12}\.js"')
+        self.assertNotIn("/static/css/base.css", html)
+        self.assertTrue(os.path.exists(os.path.join(self.racine, css[1] + '.gz')))
+
+        reponse = self.client.get('/static/' + css[1], headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', reponse['Cache-Control'])
@@ -1,5 +1,3 @@
-from django.conf import settings
-from django.conf.urls.static import static
 from django.urls import path
 from . import views  # Importez vos vues depuis accounts/views.py
 
@@ -17,9 +15,12 @@ urlpatterns = [
     # Dashboard
     path('dashboard/', views.dashboard, name='dashboard'),
 
+    # Parties propres à l'utilisateur des pages publiques en cache
+    path('contexte/', views.contexte_utilisateur_json, name='contexte-utilisateur'),
+
     # URLs de profil utilisateur
     path('profile_form', views.profile_update, name='profile-update'),
     path('change_password', views.change_password, name='password-change'),
     path('account_delete', views.account_delete, name='account-delete'),
 
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+]
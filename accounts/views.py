@@ -1,15 +1,18 @@
 from django.contrib import messages
 from django.contrib.auth import get_user_model, authenticate, login, logout, update_session_auth_hash
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 from django.shortcuts import render, redirect
 from django.utils import timezone
 from django.db.models import Q
 
 from accounts.forms import UserLoginForm, UserRegistrationForm, UserUpdateForm, CustomPasswordChangeForm, UserDeleteForm
+from accounts.audit import journal_connexions
+from accounts.contexte import contexte_utilisateur
 from accounts.models import UserLoginHistory
+from accounts.statistiques import statistiques_dashboard
 from plats.models import Plats
 from structures.models import Structures
-from menus.models import Menus
 
 # Récupère le modèle User personnalisé
 User = get_user_model()
@@ -31,37 +34,16 @@ def login_view(request):
 
             if user is not None:
                 # Enregistrement de la tentative de connexion
-                x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-                ip_address = x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR')
-
-                UserLoginHistory.objects.create(
-                    user=user,
-                    ip_address=ip_address,
-                    user_agent=request.META.get('HTTP_USER_AGENT', '')[:255],
-                    login_success=True
-                )
+                journal_connexions.enregistrer(request, 'LOGIN', True, user=user)
 
                 login(request, user)
                 messages.success(request, f"Bienvenue {user.first_name}!")
                 return redirect('accounts:home')
 
-        # Gestion des échecs de connexion
+        # Gestion des échecs de connexion (l'utilisateur est retrouvé par email à l'écriture du journal)
         email = request.POST.get('username', '')
-        try:
-            user = User.objects.get(email=email) if email else None
-        except User.DoesNotExist:
-            user = None
-
-        if user:
-            x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-            ip_address = x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR')
-
-            UserLoginHistory.objects.create(
-                user=user,
-                ip_address=ip_address,
-                user_agent=request.META.get('HTTP_USER_AGENT', '')[:255],
-                login_success=False
-            )
+        if email:
+            journal_connexions.enregistrer(request, 'FAILED_ATTEMPT', False, email=email)
 
         messages.error(request, "Email ou mot de passe incorrect.")
         return redirect('accounts:login')
@@ -91,44 +73,26 @@ def register_user(request):
 
 @login_required
 def dashboard(request):
-    structures = Structures.objects.filter(user=request.user)
-    plats = Plats.objects.filter(createur=request.user)
-    plats_promotion = [plat for plat in plats if plat.est_en_promotion()]
-    menus = Menus.objects.filter(createur=request.user)
-    
-    # Statistiques avancées
-    plats_disponibles = plats.filter(disponibilite=True).count()
-    plats_indisponibles = plats.filter(disponibilite=False).count()
-    plats_par_categorie = {}
-    for code, nom in Plats.CATEGORIES:
-        plats_par_categorie[nom] = plats.filter(categorie=code).count()
-    
+    stats = statistiques_dashboard(request.user)
+    structures = list(Structures.objects.filter(user=request.user))
+
     # Historique des connexions
-    login_history = UserLoginHistory.objects.filter(
+    login_history = list(UserLoginHistory.objects.filter(
         user=request.user,
         login_time__gte=timezone.now() - timezone.timedelta(days=10)
-    ).order_by('-login_time')
-    
-    # Connexions par jour (7 derniers jours)
-    from datetime import timedelta
-    connexions_par_jour = {}
-    for i in range(7):
-        date = timezone.now().date() - timedelta(days=i)
-        connexions_par_jour[date.strftime('%d/%m')] = login_history.filter(
-            login_time__date=date
-        ).count()
+    ).order_by('-login_time'))
 
     context = {
         'structures': structures,
-        'structures_count': structures.count(),
-        'plats_count': plats.count(),
-        'plats_disponibles': plats_disponibles,
-        'plats_indisponibles': plats_indisponibles,
-        'plats_par_categorie': plats_par_categorie,
-        'promotions_count': len(plats_promotion),
-        'menus_count': menus.count(),
+        'structures_count': stats.structures_count,
+        'plats_count': stats.plats_count,
+        'plats_disponibles': stats.plats_disponibles,
+        'plats_indisponibles': stats.plats_indisponibles,
+        'plats_par_categorie': stats.plats_par_categorie,
+        'promotions_count': stats.promotions_count,
+        'menus_count': stats.menus_count,
         'login_history': login_history,
-        'connexions_par_jour': connexions_par_jour,
+        'connexions_par_jour': stats.connexions_par_jour,
     }
 
     # Chemin du template: accounts/templates/accounts/dashboard.html
@@ -150,10 +114,7 @@ def home_view(request):
     plat_categories = [(code, label_map.get(code, code)) for code in unique_codes]
     
     # Plats en promotion
-    plats = Plats.objects.filter(disponibilite=True)
-    plats_promotion = [plat for plat in plats if plat.est_en_promotion()]
-    plats_promotion.sort(key=lambda x: (x.date_modification or x.date_creation), reverse=True)
-    plats_promotion = plats_promotion[:6]
+    plats_promotion = Plats.objects.promotions_actives(limit=6)
 
     context = {
         # Structures
@@ -172,21 +133,30 @@ def home_view(request):
     return render(request, 'index.html', context)
 
 
+def contexte_utilisateur_json(request):
+    """Parties propres à l'utilisateur d'une page publique en cache (?structure=, ?plat= ou ?menu=<id>)"""
+    def identifiant(nom):
+        valeur = request.GET.get(nom, '')
+        return int(valeur) if valeur.isdigit() else None
+
+    contexte = contexte_utilisateur(
+        request,
+        structure_id=identifiant('structure'),
+        plat_id=identifiant('plat'),
+        menu_id=identifiant('menu'),
+        chemin=request.GET.get('chemin', ''),
+    )
+    response = JsonResponse(contexte)
+    response['Cache-Control'] = 'private, no-store'
+    return response
+
+
 @login_required
 def logout_view(request):
     """Déconnexion de l'utilisateur"""
     if request.user.is_authenticated:
         # Enregistrement de la déconnexion dans l'historique
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        ip_address = x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR')
-
-        UserLoginHistory.objects.create(
-            user=request.user,
-            ip_address=ip_address,
-            user_agent=request.META.get('HTTP_USER_AGENT', '')[:255],
-            login_success=True,
-            action='LOGOUT'  # Champ optionnel pour différencier connexion/déconnexion
-        )
+        journal_connexions.enregistrer(request, 'LOGOUT', True, user=request.user)
 
     logout(request)
     return redirect('accounts:login')
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import Suppression
+from api.synchro import RETENTION
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprime par lots les traces de suppression plus anciennes que la rétention de la "
+        "synchronisation (un client dont le curseur est plus ancien repart d'une synchronisation complète)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true', help="Compter les lignes sans rien supprimer")
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - RETENTION
+        anciennes = Suppression.objects.filter(date_suppression__lt=limite)
+
+        if options['dry_run']:
+            self.stdout.write(f"{anciennes.count()} trace(s) antérieure(s) au {limite:%d/%m/%Y} à supprimer.")
+            return
+
+        total = 0
+        while True:
+            ids = list(anciennes.order_by('id').values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            supprimees, _ = Suppression.objects.filter(id__in=ids).delete()
+            total += supprimees
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} trace(s) antérieure(s) au {limite:%d/%m/%Y} supprimée(s)."
+        ))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Suppression',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modele', models.CharField(choices=[('structures', 'Structure'), ('plats', 'Plat'), ('menus', 'Menu'), ('liaisons', 'Liaison menu/plat')], max_length=20)),
+                ('objet_id', models.BigIntegerField()),
+                ('structure_id', models.BigIntegerField(blank=True, null=True)),
+                ('date_suppression', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Suppression',
+                'verbose_name_plural': 'Suppressions',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import models
+from django.utils import timezone
+
+
+class SuppressionQuerySet(models.QuerySet):
+    def noter(self, modele, objets):
+        """Enregistre la suppression des objets `modele` donnés en (objet_id, structure_id)"""
+        maintenant = timezone.now()
+        return self.bulk_create([
+            self.model(modele=modele, objet_id=objet_id, structure_id=structure_id, date_suppression=maintenant)
+            for objet_id, structure_id in objets
+        ])
+
+
+class Suppression(models.Model):
+    """Trace d'un objet supprimé, lue par la synchronisation incrémentale (voir api.synchro)"""
+    MODELES = (
+        ('structures', 'Structure'),
+        ('plats', 'Plat'),
+        ('menus', 'Menu'),
+        ('liaisons', 'Liaison menu/plat'),
+    )
+
+    modele = models.CharField(max_length=20, choices=MODELES)
+    objet_id = models.BigIntegerField()
+    # Pas de clé étrangère : la structure est souvent supprimée avec l'objet
+    structure_id = models.BigIntegerField(null=True, blank=True)
+    date_suppression = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects = SuppressionQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Suppression'
+        verbose_name_plural = 'Suppressions'
+
+    def __str__(self):
+        return f"{self.modele} #{self.objet_id} supprimé le {self.date_suppression:%d/%m/%Y %H:%M}"
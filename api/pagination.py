@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class PaginationCurseur(CursorPagination):
+    """Pagination par curseur opaque : pas d'OFFSET, pages stables pendant les insertions"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-id'
@@ -0,0 +1,149 @@
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+from avis.models import Avis
+from medias.renditions import url_rendition
+from menus.models import MenuPlat, Menus
+from menus.snapshot import contexte_affichage
+from plats.models import Plats
+from structures.models import Structures
+
+# Le prix calculé d'une réduction en pourcentage a plus de deux décimales
+PRIX = serializers.DecimalField(max_digits=8, decimal_places=2)
+
+# Champs des plats d'un menu repris de contexte_affichage, la photo en plus
+CHAMPS_PLAT_MENU = ('id', 'nom', 'description', 'prix', 'prix_effectif', 'promotion_active', 'temps_preparation')
+
+
+def champs_demandes(request):
+    """Champs de `?fields=a,b` (sparse fieldsets), None pour tous les champs"""
+    valeur = request.query_params.get('fields', '') if request is not None else ''
+    champs = {champ.strip() for champ in valeur.split(',') if champ.strip()}
+    return champs or None
+
+
+class ChampsDemandesMixin:
+    """Ne sérialise que les champs demandés par `?fields=` (l'id est toujours inclus).
+
+    `exclure` retire en plus des champs, quelle que soit la demande.
+    """
+
+    def __init__(self, *args, exclure=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        champs = champs_demandes(self.context.get('request'))
+        for nom in set(self.fields):
+            if nom in exclure or (champs is not None and nom not in champs | {'id'}):
+                self.fields.pop(nom)
+
+
+class PhotoMixin:
+    def url_photo(self, fichier):
+        url = url_rendition(fichier, 'card')
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if url and request is not None else url
+
+
+def avec_menus_actifs(structures):
+    """Précharge les menus actifs lus par StructureSerializer"""
+    return structures.prefetch_related(Prefetch(
+        'menus', queryset=Menus.objects.filter(status='actif').only('id', 'structure_id'),
+        to_attr='menus_actifs',
+    ))
+
+
+class StructureSerializer(ChampsDemandesMixin, PhotoMixin, serializers.ModelSerializer):
+    type_libelle = serializers.CharField(source='get_type_display', read_only=True)
+    photo = serializers.SerializerMethodField()
+    menus = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Structures
+        fields = [
+            'id', 'nom', 'type', 'type_libelle', 'ville', 'adresse', 'telephone', 'description',
+            'heure_ouverture', 'heure_fermeture', 'photo', 'note_moyenne', 'nombre_avis',
+            'date_creation', 'menus',
+        ]
+
+    def get_photo(self, structure):
+        return self.url_photo(structure.photo)
+
+    def get_menus(self, structure):
+        # Menus actifs préchargés (`avec_menus_actifs`)
+        return [menu.pk for menu in structure.menus_actifs]
+
+
+class PlatSerializer(ChampsDemandesMixin, PhotoMixin, serializers.ModelSerializer):
+    categorie_libelle = serializers.CharField(source='get_categorie_display', read_only=True)
+    photo = serializers.SerializerMethodField()
+    promotion_active = serializers.SerializerMethodField()
+    prix_effectif = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Plats
+        fields = [
+            'id', 'nom', 'description', 'categorie', 'categorie_libelle', 'structure', 'prix',
+            'prix_effectif', 'promotion_active', 'debut_promotion', 'fin_promotion', 'disponibilite',
+            'temps_preparation', 'ingredients', 'allergenes', 'photo', 'note_moyenne', 'nombre_avis',
+            'date_modification',
+        ]
+
+    def get_photo(self, plat):
+        return self.url_photo(plat.photo)
+
+    def get_promotion_active(self, plat):
+        return plat.promotion_est_active(self.context.get('now'))
+
+    def get_prix_effectif(self, plat):
+        if hasattr(plat, 'prix_effectif'):
+            # Calculé en SQL (PlatsQuerySet.avec_prix_effectif)
+            return PRIX.to_representation(plat.prix_effectif)
+        if plat.promotion_est_active(self.context.get('now')):
+            return PRIX.to_representation(plat.get_prix_promotionnel())
+        return PRIX.to_representation(plat.prix)
+
+
+class MenuSerializer(ChampsDemandesMixin, PhotoMixin, serializers.ModelSerializer):
+    """Menu lu depuis son snapshot : aucune requête pour les plats"""
+    nombre_plats = serializers.SerializerMethodField()
+    categories = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Menus
+        fields = ['id', 'nom', 'structure', 'version', 'nombre_plats', 'categories']
+
+    def get_nombre_plats(self, menu):
+        return menu.snapshot['nombre_plats']
+
+    def get_categories(self, menu):
+        # Même regroupement et mêmes prix effectifs que la page du menu
+        contexte = contexte_affichage(menu.snapshot, self.context.get('now'))
+        return [
+            {
+                'code': categorie['code'],
+                'libelle': categorie['libelle'],
+                'plats': [
+                    {**{champ: plat[champ] for champ in CHAMPS_PLAT_MENU}, 'photo': self.url_photo(plat['photo'])}
+                    for plat in categorie['plats']
+                ],
+            }
+            for categorie in contexte['categories']
+        ]
+
+
+class LiaisonSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MenuPlat
+        fields = ['id', 'menu', 'plat', 'position']
+
+
+class AvisSerializer(ChampsDemandesMixin, serializers.ModelSerializer):
+    auteur = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Avis
+        fields = ['id', 'note', 'commentaire', 'auteur', 'type_avis', 'structure', 'plat', 'date_publication']
+
+    def get_auteur(self, avis):
+        # Prénom et initiale du nom seulement : l'API est publique
+        nom = avis.user.last_name[:1]
+        return f"{avis.user.first_name} {nom}." if nom else avis.user.first_name
@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from api.models import Suppression
+from menus.models import MenuPlat, Menus
+from plats.models import Plats
+from structures.models import Structures
+
+# Les suppressions en cascade (structure, menu) passent aussi par ces signaux, objet par objet
+
+
+@receiver(post_delete, sender=Structures)
+def suppression_structure(sender, instance, **kwargs):
+    Suppression.objects.noter('structures', [(instance.pk, instance.pk)])
+
+
+@receiver(post_delete, sender=Plats)
+def suppression_plat(sender, instance, **kwargs):
+    Suppression.objects.noter('plats', [(instance.pk, instance.structure_id)])
+
+
+@receiver(post_delete, sender=Menus)
+def suppression_menu(sender, instance, **kwargs):
+    Suppression.objects.noter('menus', [(instance.pk, instance.structure_id)])
+
+
+@receiver(post_delete, sender=MenuPlat)
+def suppression_liaison(sender, instance, **kwargs):
+    # Menu déjà supprimé (cascade) : sa propre trace suffit au client pour retirer ses liaisons
+    structure_id = Menus.objects.filter(pk=instance.menu_id).values_list('structure_id', flat=True).first()
+    Suppression.objects.noter('liaisons', [(instance.pk, structure_id)])
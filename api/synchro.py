@@ -0,0 +1,144 @@
+"""Synchronisation incrémentale (« changements depuis ») des clients hors ligne.
+
+Le client envoie le curseur reçu à l'appel précédent (aucun : synchronisation complète) et
+reçoit les structures, plats, menus actifs et liaisons menu/plat modifiés depuis, ainsi que
+les identifiants supprimés (table `Suppression`, alimentée par les signaux post_delete). Il
+rappelle avec le nouveau curseur tant que la réponse n'est pas complète.
+
+Le curseur (opaque, base64) contient pour chaque source la position (date_modification, id)
+où reprendre : chaque source est lue par une plage sur l'index de date_modification, vide
+pour un client à jour. Les dates étant fixées avant le commit, une transaction en cours peut
+rendre visible plus tard une ligne datée d'avant la position : une source lue jusqu'au bout
+reprend donc `MARGE` avant l'appel, et ces dernières secondes sont relues (le client met à
+jour par id).
+
+Les champs de notation, mis à jour sans toucher date_modification, ne sont pas synchronisés.
+L'activité des promotions dépend de l'heure : le client l'évalue à partir des dates de début
+et de fin des plats.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from api import serializers
+from api.models import Suppression
+from menus.models import MenuPlat, Menus
+from menus.snapshot import snapshot_du_menu
+from plats.models import Plats
+from structures.models import Structures
+
+LIMITE = 500
+MARGE = timedelta(seconds=30)
+# Traces de suppression conservées (commande prune_sync_tombstones) ; au-delà, resynchronisation complète
+RETENTION = timedelta(days=90)
+
+CHAMPS_NOTATION = ('note_moyenne', 'nombre_avis')
+
+
+class CurseurInvalide(ValueError):
+    pass
+
+
+def encoder_curseur(etat):
+    return base64.urlsafe_b64encode(json.dumps(etat, separators=(',', ':')).encode()).decode()
+
+
+def decoder_curseur(valeur):
+    try:
+        etat = json.loads(base64.urlsafe_b64decode(valeur.encode()))
+        positions = {
+            source: (datetime.fromisoformat(position[0]), int(position[1])) if position else None
+            for source, position in etat['p'].items()
+        }
+        return etat.get('s'), positions
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError, IndexError, AttributeError):
+        raise CurseurInvalide("Curseur de synchronisation invalide.")
+
+
+def _sources(structure_id):
+    """{source: (queryset, champ de date)}, filtrés sur la structure si elle est donnée"""
+    sources = {
+        'structures': (serializers.avec_menus_actifs(Structures.objects.all()), 'date_modification', 'pk'),
+        'plats': (Plats.objects.all(), 'date_modification', 'structure_id'),
+        'menus': (
+            Menus.objects.only('id', 'nom', 'status', 'structure_id', 'snapshot', 'version', 'date_modification'),
+            'date_modification', 'structure_id',
+        ),
+        'liaisons': (MenuPlat.objects.all(), 'date_modification', 'menu__structure_id'),
+        'suppressions': (Suppression.objects.all(), 'date_suppression', 'structure_id'),
+    }
+    return {
+        source: (qs.filter(**{filtre: structure_id}) if structure_id is not None else qs, champ)
+        for source, (qs, champ, filtre) in sources.items()
+    }
+
+
+def _lire(qs, champ, position, borne):
+    """(objets, nouvelle position, reste-t-il des objets) pour une source"""
+    if position is not None:
+        date, pk = position
+        # Plage sur l'index de date ; seuls les ex aequo de la position sont écartés par id
+        qs = qs.filter(**{f'{champ}__gte': date}).exclude(**{champ: date, 'pk__lte': pk})
+    objets = list(qs.order_by(champ, 'pk')[:LIMITE + 1])
+    if len(objets) > LIMITE:
+        objets = objets[:LIMITE]
+        return objets, (getattr(objets[-1], champ), objets[-1].pk), True
+    # Source lue jusqu'au bout : reprise à `borne`, les dernières secondes seront relues
+    return objets, (borne, 0), False
+
+
+def synchroniser(request, curseur=None, structure_id=None):
+    """Contenu de la réponse de synchronisation"""
+    maintenant = timezone.now()
+    positions = {}
+    reinitialiser = False
+    if curseur:
+        structure_curseur, positions = decoder_curseur(curseur)
+        if structure_curseur != structure_id:
+            raise CurseurInvalide("Le curseur a été obtenu pour une autre structure.")
+        if any(position and position[0] < maintenant - RETENTION for position in positions.values()):
+            # Des traces de suppression ont pu être purgées : on repart de zéro
+            positions, reinitialiser = {}, True
+
+    lus, nouvelles, complet = {}, {}, True
+    for source, (qs, champ) in _sources(structure_id).items():
+        lus[source], nouvelles[source], encore = _lire(qs, champ, positions.get(source), maintenant - MARGE)
+        complet = complet and not encore
+
+    contexte = {'request': request, 'now': maintenant}
+    supprimes = {modele: [] for modele, _ in Suppression.MODELES}
+    for suppression in lus['suppressions']:
+        supprimes[suppression.modele].append(suppression.objet_id)
+
+    menus = []
+    for menu in lus['menus']:
+        if menu.status != 'actif':
+            # Un menu désactivé disparaît des clients comme un menu supprimé
+            supprimes['menus'].append(menu.pk)
+            continue
+        if not menu.version:
+            menu.snapshot, menu.version = snapshot_du_menu(menu)
+        menus.append(menu)
+
+    return {
+        'reinitialiser': reinitialiser,
+        'structures': serializers.StructureSerializer(
+            lus['structures'], many=True, context=contexte, exclure=CHAMPS_NOTATION
+        ).data,
+        'plats': serializers.PlatSerializer(
+            lus['plats'], many=True, context=contexte, exclure=CHAMPS_NOTATION
+        ).data,
+        'menus': serializers.MenuSerializer(menus, many=True, context=contexte).data,
+        'liaisons': serializers.LiaisonSerializer(lus['liaisons'], many=True).data,
+        'supprimes': supprimes,
+        'cursor': encoder_curseur({
+            's': structure_id,
+            'p': {
+                source: [date.isoformat(), pk] for source, (date, pk) in nouvelles.items()
+            },
+        }),
+        'complet': complet,
+    }
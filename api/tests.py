@@ -0,0 +1,147 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from avis.models import Avis
+from menus.models import Menus
+from plats.models import Plats
+from structures.testing import StructureTestMixin, creer_utilisateur
+
+
+class ApiCatalogueTests(StructureTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.plats = [
+            Plats.objects.create(
+                nom=f'Plat {i}', description='d', prix=1000 + i, categorie='plat',
+                createur=self.user, structure=self.structure,
+            )
+            for i in range(3)
+        ]
+        self.menu = Menus.objects.create(nom='Midi', status='actif', createur=self.user, structure=self.structure)
+        self.menu.plats.add(*self.plats)
+
+    def test_pagination_par_curseur_et_champs_demandes(self):
+        response = self.client.get(reverse('api:plats-list'), {'page_size': 2, 'fields': 'nom,prix_effectif'})
+        self.assertEqual(response.status_code, 200)
+        donnees = response.json()
+        self.assertEqual(donnees['results'], [
+            {'id': self.plats[2].pk, 'nom': 'Plat 2', 'prix_effectif': '1002.00'},
+            {'id': self.plats[1].pk, 'nom': 'Plat 1', 'prix_effectif': '1001.00'},
+        ])
+        suite = self.client.get(donnees['next']).json()
+        self.assertEqual([plat['id'] for plat in suite['results']], [self.plats[0].pk])
+        self.assertIsNone(suite['next'])
+
+    def test_etag_304_sans_serialisation_puis_200_apres_modification(self):
+        url = reverse('api:plats-detail', args=[self.plats[0].pk])
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.plats[0].prix = 1500
+        self.plats[0].save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_des_structures_suit_la_generation(self):
+        url = reverse('api:structures-list')
+        donnees = self.client.get(url)
+        self.assertEqual(donnees.json()['results'][0]['menus'], [self.menu.pk])
+        etag = donnees['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Menus.objects.create(nom='Soir', status='actif', createur=self.user, structure=self.structure)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_menus_actifs_et_avis_publics(self):
+        Menus.objects.create(nom='Brouillon', createur=self.user, structure=self.structure)
+        menus = self.client.get(reverse('api:menus-list')).json()['results']
+        self.assertEqual([menu['nom'] for menu in menus], ['Midi'])
+        self.assertEqual(menus[0]['nombre_plats'], 3)
+        # Regroupement de la page du menu (menus.snapshot.contexte_affichage)
+        (categorie,) = menus[0]['categories']
+        self.assertEqual((categorie['code'], categorie['libelle']), ('plat', 'Plat principal'))
+        self.assertEqual(
+            {plat['nom']: (plat['prix_effectif'], plat['promotion_active']) for plat in categorie['plats']},
+            {f'Plat {i}': (f'{1000 + i}.00', False) for i in range(3)},
+        )
+
+        client = creer_utilisateur('client@emenu.tg', first_name='Kofi', last_name='Mensah')
+        Avis.objects.create(user=client, structure=self.structure, note=4, commentaire='Bon')
+        Avis.objects.create(user=self.user, structure=self.structure, note=1, commentaire='Spam', signale=True)
+        avis = self.client.get(reverse('api:avis-list'), {'structure': self.structure.pk}).json()['results']
+        self.assertEqual([(a['auteur'], a['note']) for a in avis], [('Kofi M.', 4)])
+        self.assertEqual(self.client.get(reverse('api:avis-list'), {'structure': 'x'}).status_code, 400)
+
+
+@mock.patch('api.synchro.MARGE', timedelta(0))
+class SynchronisationTests(StructureTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.plats = [
+            Plats.objects.create(
+                nom=f'Plat {i}', description='d', prix=1000, categorie='plat', createur=self.user, structure=self.structure,
+            )
+            for i in range(3)
+        ]
+        self.menu = Menus.objects.create(nom='Midi', status='actif', createur=self.user, structure=self.structure)
+        self.menu.plats.add(*self.plats[:2])
+        self.url = reverse('api:sync')
+
+    def synchroniser(self, cursor=None, **params):
+        if cursor:
+            params['cursor'] = cursor
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_synchronisation_complete_puis_client_a_jour(self):
+        donnees = self.synchroniser(structure=self.structure.pk)
+        self.assertTrue(donnees['complet'])
+        self.assertEqual(len(donnees['plats']), 3)
+        self.assertEqual([menu['id'] for menu in donnees['menus']], [self.menu.pk])
+        self.assertEqual(len(donnees['liaisons']), 2)
+        self.assertNotIn('note_moyenne', donnees['plats'][0])
+
+        # Client à jour : une plage vide par source
+        with self.assertNumQueries(5):
+            a_jour = self.synchroniser(donnees['cursor'], structure=self.structure.pk)
+        self.assertEqual([a_jour[cle] for cle in ('structures', 'plats', 'menus', 'liaisons')], [[], [], [], []])
+
+    def test_modifications_et_suppressions_depuis_le_curseur(self):
+        cursor = self.synchroniser()['cursor']
+        self.plats[2].prix = 1200
+        self.plats[2].save()
+        self.menu.plats.remove(self.plats[1])
+        supprime = self.plats[0].pk
+        self.plats[0].delete()
+
+        donnees = self.synchroniser(cursor)
+        self.assertEqual([plat['id'] for plat in donnees['plats']], [self.plats[2].pk])
+        self.assertEqual(donnees['supprimes']['plats'], [supprime])
+        self.assertEqual(len(donnees['supprimes']['liaisons']), 2)
+        self.assertEqual([menu['nombre_plats'] for menu in donnees['menus']], [0])
+
+        self.menu.status = 'inactif'
+        self.menu.save()
+        self.assertEqual(self.synchroniser(donnees['cursor'])['supprimes']['menus'], [self.menu.pk])
+
+    def test_pages_successives_et_curseur_invalide(self):
+        with mock.patch('api.synchro.LIMITE', 2):
+            premiere = self.synchroniser()
+            self.assertFalse(premiere['complet'])
+            suite = self.synchroniser(premiere['cursor'])
+        self.assertTrue(suite['complet'])
+        self.assertEqual(len(premiere['plats']) + len(suite['plats']), 3)
+
+        self.assertEqual(self.client.get(self.url, {'cursor': 'nimporte'}).status_code, 400)
+        cursor = self.synchroniser()['cursor']
+        self.assertEqual(self.client.get(self.url, {'cursor': cursor, 'structure': self.structure.pk}).status_code, 400)
@@ -0,0 +1,16 @@
+from django.urls import path
+from rest_framework.routers import DefaultRouter
+
+from api import views
+
+app_name = 'api'
+
+router = DefaultRouter()
+router.register('structures', views.StructuresViewSet, basename='structures')
+router.register('plats', views.PlatsViewSet, basename='plats')
+router.register('menus', views.MenusViewSet, basename='menus')
+router.register('avis', views.AvisViewSet, basename='avis')
+
+urlpatterns = [
+    path('sync/', views.SynchronisationView.as_view(), name='sync'),
+] + router.urls
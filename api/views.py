@@ -0,0 +1,171 @@
+"""API JSON publique en lecture seule (/api/v1/) pour les clients mobiles.
+
+La synchronisation incrémentale des clients hors ligne (/api/v1/sync/) est décrite dans api.synchro.
+
+Chaque réponse porte un ETag fort calculé à partir de l'URL complète et d'un jeton de
+version par objet (date de modification, version du snapshot, génération de la structure).
+Le jeton est obtenu des objets déjà chargés pour la page ou le détail : quand il correspond
+à If-None-Match, la réponse est un 304 et rien n'est sérialisé.
+"""
+import hashlib
+
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework import viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api import serializers, synchro
+from avis.models import Avis
+from menus.models import Menus
+from menus.snapshot import promotion_active, snapshot_du_menu
+from structures import catalogue
+from structures.cache import generations
+
+
+def _identifiant(params, cle):
+    """Valeur entière du paramètre `cle`, None s'il est absent"""
+    valeur = params.get(cle)
+    if valeur in (None, ''):
+        return None
+    try:
+        return int(valeur)
+    except ValueError:
+        raise ValidationError({cle: "Identifiant invalide."})
+
+
+class ConditionnelMixin:
+    """list/retrieve avec ETag fort et réponse 304 sans sérialisation.
+
+    Les vues définissent `versions(objets)` : les jetons de version des objets, dans l'ordre.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Même instant pour le jeton de version et la sérialisation (promotions)
+        self.now = timezone.now()
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'now': self.now}
+
+    def _reponse_conditionnelle(self, objets, serialiser):
+        empreinte = hashlib.sha1(
+            repr((self.request.get_full_path(), self.versions(objets))).encode()
+        ).hexdigest()
+        etag = f'"{empreinte}"'
+        response = get_conditional_response(self.request, etag=etag)
+        if response is None:
+            response = serialiser()
+        response['ETag'] = etag
+        # Le client garde la réponse mais la revalide à chaque fois
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        return self._reponse_conditionnelle(
+            page, lambda: self.get_paginated_response(self.get_serializer(page, many=True).data)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        objet = self.get_object()
+        return self._reponse_conditionnelle(
+            [objet], lambda: Response(self.get_serializer(objet).data)
+        )
+
+
+class StructuresViewSet(ConditionnelMixin, viewsets.ReadOnlyModelViewSet):
+    """Structures ; filtres `q`, `ville`, `type` (ceux de la recherche du site)"""
+    serializer_class = serializers.StructureSerializer
+
+    def get_queryset(self):
+        return serializers.avec_menus_actifs(
+            catalogue.filtrer_structures(catalogue.criteres_structures(self.request.query_params))
+        )
+
+    def versions(self, objets):
+        # La génération change avec la structure, ses plats, ses menus et ses avis
+        courantes = generations(structure.pk for structure in objets)
+        return [(structure.pk, courantes[structure.pk]) for structure in objets]
+
+
+class PlatsViewSet(ConditionnelMixin, viewsets.ReadOnlyModelViewSet):
+    """Plats ; filtres `q`, `categorie`, `disponibilite`, `promotion` et `structure`"""
+    serializer_class = serializers.PlatSerializer
+
+    def get_queryset(self):
+        params = self.request.query_params
+        qs = catalogue.filtrer_plats(catalogue.criteres_plats(params))
+        structure_id = _identifiant(params, 'structure')
+        if structure_id is not None:
+            qs = qs.filter(structure_id=structure_id)
+        return qs.avec_prix_effectif(self.now)
+
+    def versions(self, objets):
+        # La note et la photo sont mises à jour par update() : date_modification ne suffit pas
+        return [
+            (
+                plat.pk, plat.date_modification.isoformat(), str(plat.note_moyenne), plat.nombre_avis,
+                plat.photo.name, plat.etat_photo, plat.promotion_est_active(self.now),
+            )
+            for plat in objets
+        ]
+
+
+class MenusViewSet(ConditionnelMixin, viewsets.ReadOnlyModelViewSet):
+    """Menus actifs, lus depuis leur snapshot ; filtre `structure`"""
+    serializer_class = serializers.MenuSerializer
+
+    def get_queryset(self):
+        qs = Menus.objects.filter(status='actif').only('id', 'nom', 'structure_id', 'snapshot', 'version')
+        structure_id = _identifiant(self.request.query_params, 'structure')
+        if structure_id is not None:
+            qs = qs.filter(structure_id=structure_id)
+        return qs
+
+    def versions(self, objets):
+        jetons = []
+        for menu in objets:
+            if not menu.version:
+                menu.snapshot, menu.version = snapshot_du_menu(menu)
+            actives = [
+                plat['id']
+                for categorie in menu.snapshot['categories'] for plat in categorie['plats']
+                if promotion_active(plat['promotion'], self.now)
+            ]
+            jetons.append((menu.pk, menu.version, actives))
+        return jetons
+
+
+class AvisViewSet(ConditionnelMixin, viewsets.ReadOnlyModelViewSet):
+    """Avis publics (non signalés) ; filtres `structure` et `plat`"""
+    serializer_class = serializers.AvisSerializer
+
+    def get_queryset(self):
+        qs = Avis.objects.filter(signale=False).select_related('user')
+        for cle in ('structure', 'plat'):
+            valeur = _identifiant(self.request.query_params, cle)
+            if valeur is not None:
+                qs = qs.filter(**{f'{cle}_id': valeur})
+        return qs
+
+    def versions(self, objets):
+        return [
+            (avis.pk, avis.date_edited.isoformat(), avis.user.first_name, avis.user.last_name)
+            for avis in objets
+        ]
+
+
+class SynchronisationView(APIView):
+    """Changements depuis `cursor` pour les clients hors ligne (voir api.synchro) ; filtre `structure`"""
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            contenu = synchro.synchroniser(request, params.get('cursor'), _identifiant(params, 'structure'))
+        except synchro.CurseurInvalide as erreur:
+            raise ValidationError({'cursor': str(erreur)})
+        response = Response(contenu)
+        patch_cache_control(response, no_store=True)
+        return response
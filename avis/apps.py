@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AvisConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'avis'
+
+    def ready(self):
+        from avis import signals  # noqa: F401
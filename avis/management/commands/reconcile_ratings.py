@@ -0,0 +1,92 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from avis.models import expression_note_moyenne
+from plats.models import Plats
+from structures.models import Structures
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule note_moyenne, nombre_avis et somme_notes des structures et des plats "
+        "à partir des avis (une agrégation GROUP BY par modèle) et corrige les écarts, "
+        "par lots verrouillés pour ne pas écraser les mises à jour par delta concurrentes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Afficher les écarts sans rien modifier")
+
+    def handle(self, *args, **options):
+        for modele, relation in ((Structures, 'avis_structure'), (Plats, 'avis_plat')):
+            self.reconcilier(modele, relation, options['batch_size'], options['dry_run'])
+
+    @staticmethod
+    def lignes(modele, relation):
+        """Une ligne par cible avec les valeurs stockées et les valeurs réelles.
+
+        La note de référence est arrondie par la même expression que les mises à jour par delta.
+        """
+        valides = Q(**{f'{relation}__signale': False})
+        somme_reelle = Sum(f'{relation}__note', filter=valides)
+        nombre_reel = Count(f'{relation}__id', filter=valides)
+        return (
+            modele.objects.order_by()
+            .values('pk', 'somme_notes', 'nombre_avis', 'note_moyenne')
+            .annotate(
+                somme_reelle=somme_reelle,
+                nombre_reel=nombre_reel,
+                note_reelle=expression_note_moyenne(somme_reelle, nombre_reel),
+            )
+        )
+
+    def reconcilier(self, modele, relation, batch_size, dry_run):
+        examines = corriges = ecart_avis = 0
+        ecart_note_max = Decimal('0')
+        batch = []
+        # Lecture en flux : ne sert qu'à repérer les cibles en écart
+        for ligne in self.lignes(modele, relation).iterator(chunk_size=batch_size):
+            examines += 1
+            somme = ligne['somme_reelle'] or 0
+            nombre = ligne['nombre_reel']
+            note = ligne['note_reelle']
+            if (ligne['somme_notes'], ligne['nombre_avis'], ligne['note_moyenne']) == (somme, nombre, note):
+                continue
+
+            corriges += 1
+            ecart_avis += abs(ligne['nombre_avis'] - nombre)
+            ecart_note_max = max(ecart_note_max, abs(ligne['note_moyenne'] - note))
+            batch.append(ligne['pk'])
+            if len(batch) >= batch_size:
+                self.corriger(modele, relation, batch, dry_run)
+                batch = []
+        if batch:
+            self.corriger(modele, relation, batch, dry_run)
+
+        self.stdout.write(
+            f"{modele.__name__} : {examines} examiné(s), {corriges} en écart"
+            f"{' (non corrigés, --dry-run)' if dry_run else ' corrigé(s)'}, "
+            f"{ecart_avis} avis d'écart au total, écart de note maximal {ecart_note_max}"
+        )
+
+    def corriger(self, modele, relation, pks, dry_run):
+        """Réécrit les totaux des cibles `pks`, recalculés sous verrou.
+
+        Un delta validé avant le verrou est compté dans les totaux relus ; un delta qui attend
+        le verrou s'ajoute ensuite aux totaux corrigés. Aucun n'est perdu.
+        """
+        if dry_run:
+            return
+        with transaction.atomic():
+            list(modele.objects.select_for_update().filter(pk__in=pks).order_by('pk').values_list('pk', flat=True))
+            corrections = [
+                modele(
+                    pk=ligne['pk'], somme_notes=ligne['somme_reelle'] or 0,
+                    nombre_avis=ligne['nombre_reel'], note_moyenne=ligne['note_reelle'],
+                )
+                for ligne in self.lignes(modele, relation).filter(pk__in=pks)
+            ]
+            modele.objects.bulk_update(corrections, ['somme_notes', 'nombre_avis', 'note_moyenne'])
@@ -0,0 +1,51 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Case, Count, DecimalField, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast, Round
+
+
+def note_moyenne(somme, nombre):
+    # Copie figée de avis.models.expression_note_moyenne : même arrondi que les mises à jour par delta
+    return Case(
+        When(**{f'{nombre}__gt': 0},
+             then=Round(Cast(Cast(F(somme), FloatField()) / F(nombre),
+                             DecimalField(max_digits=7, decimal_places=4)), 2)),
+        default=Value(Decimal('0.00')),
+        output_field=DecimalField(max_digits=3, decimal_places=2),
+    )
+
+
+def recalculer_notes(apps, schema_editor):
+    Avis = apps.get_model('avis', 'Avis')
+    cibles = (
+        ('structure', apps.get_model('structures', 'Structures')),
+        ('plat', apps.get_model('plats', 'Plats')),
+    )
+    for champ, modele in cibles:
+        lignes = (
+            Avis.objects.filter(signale=False, **{f'{champ}__isnull': False})
+            .order_by()
+            .values(champ)
+            .annotate(somme=Sum('note'), nombre=Count('id'))
+        )
+        modele.objects.update(somme_notes=0, nombre_avis=0, note_moyenne=0)
+        for ligne in lignes.iterator():
+            modele.objects.filter(pk=ligne[champ]).update(
+                somme_notes=ligne['somme'],
+                nombre_avis=ligne['nombre'],
+            )
+        modele.objects.update(note_moyenne=note_moyenne('somme_notes', 'nombre_avis'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avis', '0001_initial'),
+        ('plats', '0004_somme_notes'),
+        ('structures', '0002_somme_notes'),
+    ]
+
+    operations = [
+        migrations.RunPython(recalculer_notes, migrations.RunPython.noop),
+    ]
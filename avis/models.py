@@ -1,9 +1,49 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
-from django.db.models import Avg
+from django.db.models import Case, DecimalField, F, FloatField, Value, When
+from django.db.models.functions import Cast, Round
+from django.db.models.lookups import GreaterThan
 from accounts.models import User
 
+
+def expression_note_moyenne(somme, nombre):
+    """Note moyenne somme / nombre arrondie au centième, en SQL (0 sans avis).
+
+    Seule définition de l'arrondi : reconcile_ratings compare les notes stockées à cette
+    même expression.
+    """
+    return Case(
+        When(GreaterThan(nombre, 0),
+             then=Round(Cast(Cast(somme, FloatField()) / nombre,
+                             DecimalField(max_digits=7, decimal_places=4)), 2)),
+        default=Value(Decimal('0.00')),
+        output_field=DecimalField(max_digits=3, decimal_places=2),
+    )
+
+
+def appliquer_delta_notation(modele, pk, delta_somme, delta_nombre):
+    """Met à jour atomiquement somme_notes, nombre_avis et note_moyenne d'une structure ou d'un plat.
+
+    Un seul UPDATE ne touchant que les colonnes de notation (date_modification inchangée).
+    """
+    nouvelle_somme = F('somme_notes') + delta_somme
+    nouveau_nombre = F('nombre_avis') + delta_nombre
+    modele.objects.filter(pk=pk).update(
+        somme_notes=nouvelle_somme,
+        nombre_avis=nouveau_nombre,
+        note_moyenne=expression_note_moyenne(nouvelle_somme, nouveau_nombre),
+    )
+
+
+# Champs dont dépend la contribution d'un avis à la note de sa cible
+CHAMPS_NOTATION = ('note', 'signale', 'structure_id', 'plat_id')
+# Contribution initiale pas encore lue (avis chargé sans tous les CHAMPS_NOTATION)
+A_LIRE = object()
+
+
 # Create your models here.
 class Avis(models.Model):
     NOTE_CHOICES = [
@@ -71,41 +111,62 @@ class Avis(models.Model):
         elif self.plat:
             self.type_avis = 'plat'
 
+    # Contribution déjà comptée dans la note de la cible (None pour un nouvel avis)
+    _contribution_initiale = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if instance.get_deferred_fields() & set(CHAMPS_NOTATION):
+            # Chargement partiel (.only/.defer) : lue seulement avant une écriture
+            instance._contribution_initiale = A_LIRE
+        else:
+            instance._contribution_initiale = instance.contribution_notation()
+        return instance
+
+    def contribution_enregistree(self):
+        """Contribution de la ligne en base, lue au besoin (une requête après un chargement partiel)"""
+        if self._contribution_initiale is A_LIRE:
+            etat = type(self)._base_manager.using(self._state.db).filter(pk=self.pk).values(*CHAMPS_NOTATION).first()
+            self._contribution_initiale = None
+            if etat:
+                self._contribution_initiale = type(self)(**etat).contribution_notation()
+                # Complète les champs différés (les récepteurs post_delete les lisent)
+                for champ in self.get_deferred_fields() & set(CHAMPS_NOTATION):
+                    setattr(self, champ, etat[champ])
+        return self._contribution_initiale
+
+    def contribution_notation(self):
+        """(modèle cible, pk cible, note) pris en compte dans la note moyenne, ou None"""
+        if self.signale:
+            return None
+        if self.structure_id:
+            from structures.models import Structures
+            return Structures, self.structure_id, self.note
+        if self.plat_id:
+            from plats.models import Plats
+            return Plats, self.plat_id, self.note
+        return None
+
     def save(self, *args, **kwargs):
         self.clean()
-        super().save(*args, **kwargs)
-        
-        # Mettre à jour la note moyenne de la structure ou du plat
-        if self.structure:
-            self.update_structure_rating()
-        elif self.plat:
-            self.update_plat_rating()
-
-    def update_structure_rating(self):
-        """Met à jour la note moyenne de la structure"""
-        from structures.models import Structures
-        avis_structure = Avis.objects.filter(structure=self.structure, signale=False)
-        if avis_structure.exists():
-            note_moyenne = avis_structure.aggregate(Avg('note'))['note__avg']
-            nombre_avis = avis_structure.count()
-            
-            # Mettre à jour la structure
-            self.structure.note_moyenne = round(note_moyenne, 2)
-            self.structure.nombre_avis = nombre_avis
-            self.structure.save()
-
-    def update_plat_rating(self):
-        """Met à jour la note moyenne du plat"""
-        from plats.models import Plats
-        avis_plat = Avis.objects.filter(plat=self.plat, signale=False)
-        if avis_plat.exists():
-            note_moyenne = avis_plat.aggregate(Avg('note'))['note__avg']
-            nombre_avis = avis_plat.count()
-            
-            # Mettre à jour le plat
-            self.plat.note_moyenne = round(note_moyenne, 2)
-            self.plat.nombre_avis = nombre_avis
-            self.plat.save()
+        with transaction.atomic():
+            initiale = self.contribution_enregistree()
+            super().save(*args, **kwargs)
+            # Mettre à jour la note moyenne de la structure ou du plat par différence
+            nouvelle = self.contribution_notation()
+            if nouvelle != initiale:
+                self.retirer_contribution(initiale)
+                if nouvelle is not None:
+                    modele, pk, note = nouvelle
+                    appliquer_delta_notation(modele, pk, note, 1)
+        self._contribution_initiale = nouvelle
+
+    @staticmethod
+    def retirer_contribution(contribution):
+        if contribution is not None:
+            modele, pk, note = contribution
+            appliquer_delta_notation(modele, pk, -note, -1)
 
     def get_note_etoiles(self):
         """Retourne le nombre d'étoiles pour l'affichage"""
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+from avis.models import Avis
+
+
+@receiver(pre_delete, sender=Avis)
+def lire_contribution_avis_supprime(sender, instance, **kwargs):
+    # Avis chargé partiellement : sa contribution doit être lue tant que la ligne existe
+    instance.contribution_enregistree()
+
+
+@receiver(post_delete, sender=Avis)
+def retirer_note_avis_supprime(sender, instance, **kwargs):
+    # Couvre aussi les suppressions en cascade (compte utilisateur, queryset.delete())
+    Avis.retirer_contribution(instance._contribution_initiale)
@@ -1,3 +1,103 @@
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from avis.management.commands.reconcile_ratings import Command
+from avis.models import Avis
+from plats.models import Plats
+from structures.testing import creer_structure, creer_utilisateur
+
+
+class NotationIncrementaleTests(TestCase):
+    def setUp(self):
+        self.proprietaire = creer_utilisateur()
+        self.clients = [
+            creer_utilisateur(f'client{i}@emenu.tg', first_name='C', last_name=str(i))
+            for i in range(3)
+        ]
+        self.structure = creer_structure(self.proprietaire)
+        self.plat = Plats.objects.create(
+            nom='Fufu', description='d', prix=1500, categorie='plat', createur=self.proprietaire
+        )
+
+    def assertNotation(self, objet, somme, nombre, moyenne):
+        objet.refresh_from_db()
+        self.assertEqual((objet.somme_notes, objet.nombre_avis, objet.note_moyenne), (somme, nombre, Decimal(moyenne)))
+
+    def test_creation_modification_signalement_suppression(self):
+        a = Avis.objects.create(user=self.clients[0], plat=self.plat, note=5, commentaire='Top')
+        b = Avis.objects.create(user=self.clients[1], plat=self.plat, note=2, commentaire='Bof')
+        self.assertNotation(self.plat, 7, 2, '3.50')
+
+        b.note = 4
+        b.save()
+        self.assertNotation(self.plat, 9, 2, '4.50')
+
+        a.signale = True
+        a.save()
+        self.assertNotation(self.plat, 4, 1, '4.00')
+
+        Avis.objects.get(pk=b.pk).delete()
+        self.assertNotation(self.plat, 0, 0, '0.00')
+
+    def test_suppression_en_cascade_du_compte(self):
+        Avis.objects.create(user=self.clients[0], structure=self.structure, note=3, commentaire='Correct')
+        Avis.objects.create(user=self.clients[1], structure=self.structure, note=4, commentaire='Bien')
+        self.clients[0].delete()
+        self.assertNotation(self.structure, 4, 1, '4.00')
+
+    def test_date_modification_inchangee(self):
+        avant = Plats.objects.get(pk=self.plat.pk).date_modification
+        Avis.objects.create(user=self.clients[2], plat=self.plat, note=1, commentaire='Froid')
+        self.assertEqual(Plats.objects.get(pk=self.plat.pk).date_modification, avant)
+
+    def test_chargement_partiel_sans_requete_supplementaire(self):
+        for i, client in enumerate(self.clients):
+            Avis.objects.create(user=client, plat=self.plat, note=i + 1, commentaire='ok')
+        with self.assertNumQueries(1):
+            avis = list(Avis.objects.only('id', 'commentaire').order_by('pk'))
+
+        # La contribution est lue à l'écriture : la note de la cible reste exacte
+        avis[0].note = 5
+        avis[0].save()
+        self.assertNotation(self.plat, 10, 3, '3.33')
+        avis[1].delete()
+        self.assertNotation(self.plat, 8, 2, '4.00')
+
+
+class ReconciliationNotesTests(TestCase):
+    def test_aucun_ecart_apres_mises_a_jour_par_delta(self):
+        proprietaire = creer_utilisateur()
+        plat = Plats.objects.create(nom='Fufu', description='d', prix=1500, categorie='plat', createur=proprietaire)
+        # 13 / 8 = 1.625 : arrondi à 1.63 par les mises à jour par delta
+        for i, note in enumerate([1, 1, 1, 2, 2, 2, 2, 2]):
+            client = creer_utilisateur(f'client{i}@emenu.tg', first_name='C', last_name=str(i))
+            Avis.objects.create(user=client, plat=plat, note=note, commentaire='ok')
+        plat.refresh_from_db()
+        self.assertEqual(plat.note_moyenne, Decimal('1.63'))
+
+        sortie = StringIO()
+        call_command('reconcile_ratings', stdout=sortie)
+        self.assertIn('Plats : 1 examiné(s), 0 en écart', sortie.getvalue())
+
+        Plats.objects.filter(pk=plat.pk).update(nombre_avis=3, note_moyenne=5)
+        call_command('reconcile_ratings', stdout=StringIO())
+        plat.refresh_from_db()
+        self.assertEqual((plat.somme_notes, plat.nombre_avis, plat.note_moyenne), (13, 8, Decimal('1.63')))
+
+        # Avis publié entre le repérage de l'écart et la correction : pris en compte
+        Plats.objects.filter(pk=plat.pk).update(nombre_avis=3, note_moyenne=5)
+        corriger = Command.corriger
+
+        def corriger_apres_un_avis(commande, *args):
+            client = creer_utilisateur('tardif@emenu.tg')
+            Avis.objects.create(user=client, plat=plat, note=5, commentaire='ok')
+            corriger(commande, *args)
+
+        with mock.patch.object(Command, 'corriger', corriger_apres_un_avis):
+            call_command('reconcile_ratings', stdout=StringIO())
+        plat.refresh_from_db()
+        self.assertEqual((plat.somme_notes, plat.nombre_avis, plat.note_moyenne), (18, 9, Decimal('2.00')))
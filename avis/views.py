@@ -10,6 +10,7 @@ from .models import Avis
 from .forms import AvisForm
 from structures.models import Structures
 from plats.models import Plats
+from structures.cache import cache_page_structure
 
 @login_required
 def avis_list(request):
@@ -185,18 +186,12 @@ def avis_signal(request, avis_id):
     elif avis.plat:
         return redirect('plats:plat-detail', pk=avis.plat.pk)
 
+@cache_page_structure(lambda structure_id: structure_id, parametres=('page',))
 def avis_structure_public(request, structure_id):
     """Afficher les avis publics d'une structure"""
     structure = get_object_or_404(Structures, pk=structure_id)
     avis_structure = Avis.objects.filter(structure=structure, signale=False).order_by('-date_publication')
     
-    # Vérifier si l'utilisateur connecté a déjà laissé un avis
-    user_has_avis = False
-    user_avis = None
-    if request.user.is_authenticated:
-        user_avis = Avis.objects.filter(user=request.user, structure=structure).first()
-        user_has_avis = user_avis is not None
-    
     # Pagination
     paginator = Paginator(avis_structure, 10)
     page_number = request.GET.get('page')
@@ -206,23 +201,18 @@ def avis_structure_public(request, structure_id):
         'structure': structure,
         'page_obj': page_obj,
         'avis_count': avis_structure.count(),
-        'user_has_avis': user_has_avis,
-        'user_avis': user_avis,
     }
     return render(request, 'avis/avis_structure_public.html', context)
 
+@cache_page_structure(
+    lambda plat_id: Plats.objects.filter(pk=plat_id).values_list('structure_id', flat=True).first(),
+    parametres=('page',),
+)
 def avis_plat_public(request, plat_id):
     """Afficher les avis publics d'un plat"""
     plat = get_object_or_404(Plats, pk=plat_id)
     avis_plat = Avis.objects.filter(plat=plat, signale=False).order_by('-date_publication')
     
-    # Vérifier si l'utilisateur connecté a déjà laissé un avis
-    user_has_avis = False
-    user_avis = None
-    if request.user.is_authenticated:
-        user_avis = Avis.objects.filter(user=request.user, plat=plat).first()
-        user_has_avis = user_avis is not None
-    
     # Pagination
     paginator = Paginator(avis_plat, 10)
     page_number = request.GET.get('page')
@@ -232,7 +222,5 @@ def avis_plat_public(request, plat_id):
         'plat': plat,
         'page_obj': page_obj,
         'avis_count': avis_plat.count(),
-        'user_has_avis': user_has_avis,
-        'user_avis': user_avis,
     }
     return render(request, 'avis/avis_plat_public.html', context)
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class MediasConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'medias'
+
+    def ready(self):
+        # Génération des renditions à l'enregistrement des photos
+        from medias import signals  # noqa: F401
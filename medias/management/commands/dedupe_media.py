@@ -0,0 +1,68 @@
+import os
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from medias.models import EtatPhoto
+from medias.renditions import noms_renditions
+from medias.stockage import StockageContenu, est_adresse, empreinte_contenu, nom_adresse
+from plats.models import Plats
+from structures.models import Structures
+
+
+class Command(BaseCommand):
+    help = (
+        "Range les photos existantes sous l'empreinte de leur contenu : les doublons sont fusionnés "
+        "en un seul fichier compté par références. Lancer ensuite generate_renditions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Afficher le résultat sans rien modifier")
+
+    def handle(self, *args, **options):
+        stockage = default_storage
+        if not isinstance(stockage, StockageContenu):
+            raise CommandError("Le stockage par défaut doit être medias.stockage.StockageContenu.")
+        simulation = options['dry_run']
+        # Empreintes déjà rangées pendant cette exécution (utile en simulation, où rien n'est écrit)
+        ranges = set()
+        fichiers = doublons = octets_gagnes = 0
+
+        for modele in (Plats, Structures, User):
+            noms = (
+                modele.objects.exclude(photo='').exclude(photo__isnull=True)
+                .order_by('photo').values_list('photo', flat=True).distinct()
+            )
+            for ancien in noms.iterator():
+                if est_adresse(ancien) or not stockage.exists(ancien):
+                    continue
+                with stockage.open(ancien, 'rb') as contenu:
+                    empreinte = empreinte_contenu(contenu)
+                taille = stockage.size(ancien)
+                extension = os.path.splitext(ancien)[1].lower()
+                nouveau = nom_adresse(os.path.dirname(ancien), empreinte, extension)
+                fichiers += 1
+                if nouveau in ranges or stockage.exists(nouveau):
+                    doublons += 1
+                    octets_gagnes += taille
+                ranges.add(nouveau)
+                if simulation:
+                    continue
+
+                if stockage.exists(nouveau):
+                    stockage.delete(ancien)
+                else:
+                    chemin = stockage.path(nouveau)
+                    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+                    os.replace(stockage.path(ancien), chemin)
+                for derive in noms_renditions(ancien):
+                    stockage.delete(derive)
+                lignes = modele.objects.filter(photo=ancien).update(photo=nouveau, etat_photo=EtatPhoto.AUCUN)
+                stockage.referencer(nouveau, taille, lignes)
+
+        prefixe = "[simulation] " if simulation else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefixe}{fichiers} fichier(s) rangé(s) par contenu, dont {doublons} doublon(s) : "
+            f"{octets_gagnes} octet(s) libéré(s)."
+        ))
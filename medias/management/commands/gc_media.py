@@ -0,0 +1,168 @@
+import os
+import posixpath
+import shutil
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, FileField
+
+from medias.models import FichierMedia
+from medias.renditions import racine_rendition
+
+
+def champs_fichiers():
+    """(modèle, nom du champ) de tous les FileField/ImageField du projet"""
+    return [
+        (modele, champ.name)
+        for modele in apps.get_models()
+        for champ in modele._meta.concrete_fields
+        if isinstance(champ, FileField)
+    ]
+
+
+def compter_references(noms, champs):
+    """Nombre d'enregistrements pointant vers chacun des `noms` (absents : non référencés)"""
+    references = Counter()
+    for modele, champ in champs:
+        lignes = (
+            modele._default_manager.filter(**{f'{champ}__in': noms})
+            .order_by().values(champ).annotate(nombre=Count('pk')).values_list(champ, 'nombre')
+        )
+        for nom, nombre in lignes.iterator():
+            references[nom] += nombre
+    return references
+
+
+def parcourir(racine, exclus=None):
+    """Dossiers sous `racine` (chemin absolu, nom relatif), avec la liste des fichiers de chacun.
+
+    Seuls les dossiers en attente et le contenu du dossier courant sont en mémoire ; avec le
+    stockage adressé par contenu (`aa/bb/`), chaque dossier ne contient que quelques fichiers.
+    """
+    a_visiter = [racine]
+    while a_visiter:
+        dossier = a_visiter.pop()
+        fichiers = []
+        with os.scandir(dossier) as entrees:
+            for entree in entrees:
+                if entree.is_dir(follow_symlinks=False):
+                    if entree.path != exclus:
+                        a_visiter.append(entree.path)
+                elif entree.is_file(follow_symlinks=False):
+                    fichiers.append(entree)
+        relatif = os.path.relpath(dossier, racine)
+        yield ('' if relatif == '.' else relatif.replace(os.sep, '/')), fichiers
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprime (ou met en quarantaine) les fichiers de MEDIA_ROOT qu'aucun enregistrement ne "
+        "référence : photos de plats, structures et comptes supprimés ou remplacés, et leurs renditions"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Lister les fichiers orphelins sans rien modifier")
+        parser.add_argument('--quarantine', metavar='DOSSIER', help="Déplacer les orphelins dans ce dossier au lieu de les supprimer")
+        parser.add_argument(
+            '--min-age', type=float, default=24,
+            help="Ignorer les fichiers modifiés depuis moins de N heures (téléversements en cours, défaut : 24)",
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.0, help="Pause entre deux lots (secondes)")
+
+    def handle(self, *args, **options):
+        self.racine = os.path.abspath(settings.MEDIA_ROOT)
+        self.quarantaine = options['quarantine'] and os.path.abspath(options['quarantine'])
+        self.simulation = options['dry_run']
+        self.verbosity = options['verbosity']
+        self.taille_lot = options['batch_size']
+        self.pause = options['pause']
+        self.champs = champs_fichiers()
+        if self.quarantaine == self.racine:
+            raise CommandError("Le dossier de quarantaine doit être différent de MEDIA_ROOT.")
+        if not os.path.isdir(self.racine):
+            raise CommandError(f"MEDIA_ROOT introuvable : {self.racine}")
+
+        limite = time.time() - options['min_age'] * 3600
+        self.lot = []
+        self.orphelins = self.octets = self.analyses = self.compteurs_corriges = 0
+
+        for dossier, entrees in parcourir(self.racine, exclus=self.quarantaine):
+            for debut in range(0, len(entrees), self.taille_lot):
+                self.examiner(dossier, entrees[debut:debut + self.taille_lot], limite)
+        self.vider_lot()
+
+        prefixe = "[simulation] " if self.simulation else ""
+        action = "mis en quarantaine" if self.quarantaine else "supprimé(s)"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefixe}{self.analyses} fichier(s) analysé(s), {self.orphelins} orphelin(s) {action} "
+            f"({self.octets} octet(s)), {self.compteurs_corriges} compteur(s) de références corrigé(s)."
+        ))
+
+    def examiner(self, dossier, entrees, limite):
+        noms = {posixpath.join(dossier, entree.name): entree for entree in entrees}
+        self.analyses += len(noms)
+        references = compter_references(list(noms), self.champs)
+        self.corriger_compteurs(references, noms)
+
+        # Un fichier récent est conservé : son enregistrement n'est peut-être pas encore écrit
+        gardes = {nom for nom, entree in noms.items() if references[nom] or entree.stat().st_mtime > limite}
+        racines_gardees = {posixpath.splitext(nom)[0] for nom in gardes}
+        for nom, entree in noms.items():
+            if nom in gardes:
+                continue
+            # Une rendition suit son original
+            racine = racine_rendition(nom)
+            if racine is not None and (racine in racines_gardees or self.original_reference(racine)):
+                continue
+            self.lot.append((nom, entree.stat().st_size))
+            if len(self.lot) >= self.taille_lot:
+                self.vider_lot()
+
+    def original_reference(self, racine):
+        # Original hors du lot courant (dossier de plus de --batch-size fichiers) : on vérifie en base
+        return any(
+            modele._default_manager.filter(**{f'{champ}__startswith': f'{racine}.'}).exists()
+            for modele, champ in self.champs
+        )
+
+    def corriger_compteurs(self, references, noms):
+        # Les update() ne passent pas par les signaux de medias.signals : on réaligne les compteurs
+        for fichier in FichierMedia.objects.filter(nom__in=list(noms)).only('pk', 'nom', 'references'):
+            if references[fichier.nom] and fichier.references != references[fichier.nom]:
+                self.compteurs_corriges += 1
+                if not self.simulation:
+                    FichierMedia.objects.filter(pk=fichier.pk).update(references=references[fichier.nom])
+
+    def vider_lot(self):
+        if not self.lot:
+            return
+        # Dernière vérification juste avant d'agir : une photo identique a pu être téléversée entre-temps
+        references = compter_references([nom for nom, _ in self.lot], self.champs)
+        lot = [(nom, taille) for nom, taille in self.lot if not references[nom]]
+        self.lot = []
+
+        for nom, taille in lot:
+            self.orphelins += 1
+            self.octets += taille
+            if self.verbosity >= 2 or self.simulation:
+                self.stdout.write(f"  {nom} ({taille} octets)")
+            if self.simulation:
+                continue
+            chemin = os.path.join(self.racine, *nom.split('/'))
+            try:
+                if self.quarantaine:
+                    destination = os.path.join(self.quarantaine, *nom.split('/'))
+                    os.makedirs(os.path.dirname(destination), exist_ok=True)
+                    shutil.move(chemin, destination)
+                else:
+                    os.remove(chemin)
+            except FileNotFoundError:
+                pass
+        if not self.simulation:
+            FichierMedia.objects.filter(nom__in=[nom for nom, _ in lot]).delete()
+        if self.pause:
+            time.sleep(self.pause)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import User
+from medias.models import EtatPhoto
+from medias.traitement import traiter_photo
+from plats.models import Plats
+from structures.models import Structures
+
+
+class Command(BaseCommand):
+    help = (
+        "Traite les photos existantes (orientation, métadonnées, renditions card/detail/hero en WebP et JPEG) "
+        "dont le traitement n'est pas terminé"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Retraiter aussi les photos déjà prêtes")
+
+    def handle(self, *args, **options):
+        for modele in (Plats, Structures, User):
+            photos = modele.objects.exclude(photo='').exclude(photo__isnull=True)
+            if not options['force']:
+                photos = photos.exclude(etat_photo=EtatPhoto.PRETE)
+            traitees = 0
+            for pk, nom in photos.order_by('pk').values_list('pk', 'photo').iterator():
+                traiter_photo(modele, pk, nom)
+                traitees += 1
+            echecs = modele.objects.filter(etat_photo=EtatPhoto.ECHEC).count()
+            self.stdout.write(self.style.SUCCESS(
+                f"{modele.__name__} : {traitees} photo(s) traitée(s), {echecs} en échec."
+            ))
@@ -0,0 +1,28 @@
+from django.db import models
+
+
+class EtatPhoto(models.TextChoices):
+    """État du traitement d'arrière-plan d'une photo (renditions, voir `medias.traitement`)"""
+    AUCUN = '', 'Non traitée'
+    EN_ATTENTE = 'en_attente', 'En attente'
+    PRETE = 'prete', 'Prête'
+    ECHEC = 'echec', 'Échec'
+
+
+class FichierMedia(models.Model):
+    """Fichier stocké par empreinte de contenu (`medias.stockage.StockageContenu`).
+
+    `references` compte les enregistrements qui pointent vers le fichier : un même contenu
+    téléversé plusieurs fois n'est écrit qu'une fois, et n'est effacé qu'à la dernière suppression.
+    """
+    nom = models.CharField(max_length=255, unique=True)
+    taille = models.PositiveBigIntegerField(default=0)
+    references = models.PositiveIntegerField(default=0)
+    date_creation = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Fichier média"
+        verbose_name_plural = "Fichiers médias"
+
+    def __str__(self):
+        return f"{self.nom} ({self.references})"
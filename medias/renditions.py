@@ -0,0 +1,123 @@
+"""Renditions redimensionnées des photos (plats, structures, utilisateurs).
+
+Chaque photo est déclinée en tailles fixes (`TAILLES`), en WebP et en JPEG, en 1x et 2x
+(sauf si l'original est trop petit). Les fichiers sont rangés à côté de l'original :
+`plats/poulet.jpg` donne `plats/poulet.card.webp`, `plats/poulet.card.2x.jpg`, etc.
+"""
+import io
+import posixpath
+import re
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from medias.models import EtatPhoto
+
+# nom -> (largeur, hauteur, recadrage) ; sans recadrage l'image tient dans le cadre
+TAILLES = {
+    'card': (400, 300, True),
+    'detail': (800, 800, False),
+    'hero': (1600, 900, True),
+}
+DENSITES = (1, 2)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def nom_rendition(nom_original, taille, extension, densite=1):
+    """Chemin (relatif au stockage) d'une rendition de `nom_original`"""
+    racine, _ = posixpath.splitext(nom_original)
+    suffixe = '' if densite == 1 else f'.{densite}x'
+    return f'{racine}.{taille}{suffixe}.{extension}'
+
+
+def noms_renditions(nom_original):
+    """Tous les chemins de renditions possibles pour un original"""
+    return [
+        nom_rendition(nom_original, taille, extension, densite)
+        for taille in TAILLES for densite in DENSITES for extension in FORMATS
+    ]
+
+
+_RENDITION = re.compile(
+    r'(?P<racine>.+)\.(?:%s)(?:\.\d+x)?\.(?:%s)' % ('|'.join(TAILLES), '|'.join(FORMATS))
+)
+
+
+def racine_rendition(nom):
+    """Racine de l'original si `nom` a la forme d'une rendition, sinon None"""
+    correspondance = _RENDITION.fullmatch(nom)
+    return correspondance['racine'] if correspondance else None
+
+
+def ecrire_derive(stockage, nom, donnees):
+    """Écrit un fichier dérivé exactement sous `nom`, en remplaçant l'existant"""
+    if hasattr(stockage, 'ecrire_derive'):
+        stockage.ecrire_derive(nom, donnees)
+    else:
+        stockage.delete(nom)
+        stockage.save(nom, ContentFile(donnees))
+
+
+def _redimensionner(image, largeur, hauteur, recadrage):
+    if recadrage:
+        return ImageOps.fit(image, (largeur, hauteur), Image.Resampling.LANCZOS)
+    copie = image.copy()
+    copie.thumbnail((largeur, hauteur), Image.Resampling.LANCZOS)
+    return copie
+
+
+def generer_renditions(fichier, forcer=False):
+    """Génère les renditions d'un FieldFile ; retourne le nombre de fichiers écrits"""
+    if not fichier:
+        return 0
+    stockage = fichier.storage
+    if not forcer and stockage.exists(nom_rendition(fichier.name, 'card', 'jpg')):
+        return 0
+
+    with stockage.open(fichier.name, 'rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    image = image.convert('RGB')
+
+    ecrits = 0
+    for taille, (largeur, hauteur, recadrage) in TAILLES.items():
+        for densite in DENSITES:
+            # Pas d'agrandissement : le 2x n'est produit que si l'original est assez grand
+            if densite > 1 and image.width < largeur * densite:
+                continue
+            rendu = _redimensionner(image, largeur * densite, hauteur * densite, recadrage)
+            for extension, (format_pil, options) in FORMATS.items():
+                tampon = io.BytesIO()
+                rendu.save(tampon, format_pil, **options)
+                ecrire_derive(stockage, nom_rendition(fichier.name, taille, extension, densite), tampon.getvalue())
+                ecrits += 1
+    return ecrits
+
+
+def renditions_pretes(fichier):
+    """Vrai si le traitement de la photo est terminé (`etat_photo` de l'objet propriétaire)"""
+    return bool(fichier) and getattr(fichier.instance, 'etat_photo', None) == EtatPhoto.PRETE
+
+
+def renditions_disponibles(fichier, taille):
+    """Densités disponibles pour une taille (vide tant que le traitement n'est pas terminé)"""
+    if not renditions_pretes(fichier):
+        return []
+    # Le 1x existe toujours une fois la photo prête ; le 2x dépend de la taille de l'original
+    return [1] + [
+        densite for densite in DENSITES[1:]
+        if fichier.storage.exists(nom_rendition(fichier.name, taille, 'jpg', densite))
+    ]
+
+
+def url_rendition(fichier, taille, extension='jpg'):
+    """URL de la rendition 1x, ou de l'original tant qu'elle n'est pas prête"""
+    if not fichier:
+        return ''
+    if renditions_pretes(fichier):
+        return fichier.storage.url(nom_rendition(fichier.name, taille, extension))
+    return fichier.url
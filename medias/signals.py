@@ -0,0 +1,131 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models import FileField
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from accounts.models import User
+from medias.models import EtatPhoto
+from medias.renditions import nom_rendition
+from medias.stockage import StockageContenu
+from medias.traitement import configuration, pool_images, traiter_photo
+from plats.models import Plats
+from structures.models import Structures
+
+
+# Références des fichiers adressés par contenu : chaque enregistrement supprimé, ou dont le
+# fichier est remplacé, libère après le commit la référence qu'il détenait (storage.delete)
+
+def champs_contenu(modele):
+    return [
+        champ for champ in modele._meta.concrete_fields
+        if isinstance(champ, FileField) and isinstance(champ.storage, StockageContenu)
+    ]
+
+
+def suivre_fichiers(instance, champs=None):
+    """Mémorise les noms de fichiers enregistrés de l'instance (champs chargés uniquement)"""
+    champs = champs_contenu(type(instance)) if champs is None else champs
+    fichiers = {
+        champ.attname: getattr(instance, champ.attname) for champ in champs if champ.attname in instance.__dict__
+    }
+    # Un fichier pas encore enregistré (téléversement en attente) ne détient aucune référence
+    instance._fichiers_enregistres = {
+        attname: (fichier.name or '') if fichier._committed else '' for attname, fichier in fichiers.items()
+    }
+
+
+def _liberer(champ, nom):
+    transaction.on_commit(lambda: champ.storage.delete(nom))
+
+
+def _enregistre(instance, champ):
+    """Nom du fichier en base ; lu si le champ était différé au chargement"""
+    suivis = instance.__dict__.get('_fichiers_enregistres', {})
+    if champ.attname in suivis:
+        return suivis[champ.attname]
+    if instance._state.adding or instance.pk is None:
+        return ''
+    nom = type(instance)._base_manager.filter(pk=instance.pk).values_list(champ.attname, flat=True).first()
+    return nom or ''
+
+
+def _apres_chargement(sender, instance, **kwargs):
+    suivre_fichiers(instance, CHAMPS_CONTENU[sender])
+
+
+def _avant_enregistrement(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    a_liberer = []
+    for champ in CHAMPS_CONTENU[sender]:
+        if champ.attname not in instance.__dict__ or (update_fields is not None and champ.name not in update_fields):
+            continue
+        fichier = getattr(instance, champ.attname)
+        ancien = _enregistre(instance, champ)
+        # Nouveau contenu (même identique, le stockage ajoute une référence) ou autre nom
+        if ancien and (ancien != fichier.name or not fichier._committed):
+            a_liberer.append((champ, ancien))
+    instance._fichiers_a_liberer = a_liberer
+
+
+def _apres_enregistrement(sender, instance, raw=False, **kwargs):
+    for champ, nom in instance.__dict__.pop('_fichiers_a_liberer', ()):
+        _liberer(champ, nom)
+    suivre_fichiers(instance, CHAMPS_CONTENU[sender])
+
+
+def _avant_suppression(sender, instance, **kwargs):
+    # Champ différé : le nom doit être lu tant que la ligne existe
+    differes = [champ.attname for champ in CHAMPS_CONTENU[sender] if champ.attname not in instance.__dict__]
+    if differes:
+        instance.refresh_from_db(fields=differes)
+        suivre_fichiers(instance, CHAMPS_CONTENU[sender])
+
+
+def _apres_suppression(sender, instance, **kwargs):
+    suivis = instance.__dict__.get('_fichiers_enregistres', {})
+    for champ in CHAMPS_CONTENU[sender]:
+        if suivis.get(champ.attname):
+            _liberer(champ, suivis[champ.attname])
+
+
+CHAMPS_CONTENU = {modele: champs_contenu(modele) for modele in apps.get_models()}
+for modele, champs in CHAMPS_CONTENU.items():
+    if champs:
+        post_init.connect(_apres_chargement, sender=modele, weak=False)
+        pre_save.connect(_avant_enregistrement, sender=modele, weak=False)
+        post_save.connect(_apres_enregistrement, sender=modele, weak=False)
+        pre_delete.connect(_avant_suppression, sender=modele, weak=False)
+        post_delete.connect(_apres_suppression, sender=modele, weak=False)
+
+
+@receiver(post_save, sender=Plats)
+@receiver(post_save, sender=Structures)
+@receiver(post_save, sender=User)
+def planifier_traitement_photo(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'photo' not in update_fields):
+        return
+    courant = sender.objects.filter(pk=instance.pk)
+    if not instance.photo:
+        if instance.etat_photo != EtatPhoto.AUCUN:
+            courant.update(etat_photo=EtatPhoto.AUCUN)
+            instance.etat_photo = EtatPhoto.AUCUN
+        return
+    # Les noms dépendant du contenu, des renditions existantes signifient photo inchangée
+    if instance.etat_photo == EtatPhoto.PRETE and instance.photo.storage.exists(
+        nom_rendition(instance.photo.name, 'card', 'jpg')
+    ):
+        return
+
+    courant.update(etat_photo=EtatPhoto.EN_ATTENTE)
+    instance.etat_photo = EtatPhoto.EN_ATTENTE
+    nom = instance.photo.name
+    if configuration()['SYNCHRONE']:
+        instance.etat_photo = traiter_photo(sender, instance.pk, nom) or instance.etat_photo
+        # Le nettoyage change le contenu, donc le nom adressé par contenu
+        instance.photo.name = courant.values_list('photo', flat=True).first() or nom
+        suivre_fichiers(instance)
+    else:
+        # Le thread doit voir la ligne enregistrée
+        transaction.on_commit(lambda: pool_images.soumettre(sender, instance.pk, nom))
@@ -0,0 +1,132 @@
+"""Stockage des médias adressé par contenu, avec déduplication.
+
+Un fichier téléversé est rangé sous l'empreinte SHA-256 de son contenu, dans une
+arborescence répartie : `plats/photo.jpg` devient `plats/3f/a2/3fa2…e9.jpg`. Téléverser
+à nouveau les mêmes octets ne réécrit rien et incrémente le compteur de références
+(`FichierMedia`) ; `delete()` le décrémente et n'efface le fichier (et ses renditions)
+qu'à la dernière référence. Les deux opérations verrouillent la ligne du compteur : un
+fichier ne peut pas être effacé entre le moment où un téléversement le trouve et celui où
+il le référence. Les suppressions et remplacements d'enregistrements libèrent leurs
+références par les signaux de `medias.signals`.
+
+Les fichiers dérivés (renditions) ont un nom imposé : ils passent par `ecrire_derive()`.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from medias.models import FichierMedia
+from medias.renditions import noms_renditions
+
+_EMPREINTE = re.compile(r'[0-9a-f]{64}')
+
+
+def empreinte_contenu(contenu):
+    """SHA-256 hexadécimal d'un File, lu par morceaux"""
+    if hasattr(contenu, 'seek'):
+        contenu.seek(0)
+    sha = hashlib.sha256()
+    for morceau in contenu.chunks():
+        sha.update(morceau)
+    if hasattr(contenu, 'seek'):
+        contenu.seek(0)
+    return sha.hexdigest()
+
+
+def est_adresse(nom):
+    """Vrai si `nom` est déjà un nom adressé par contenu (`dossier/aa/bb/<empreinte>.ext`)"""
+    parties = nom.split('/')
+    racine = posixpath.splitext(parties[-1])[0]
+    return (
+        len(parties) >= 3 and bool(_EMPREINTE.fullmatch(racine))
+        and parties[-3] == racine[:2] and parties[-2] == racine[2:4]
+    )
+
+
+def dossier_upload(nom):
+    """Dossier d'upload d'un nom, sans les niveaux de répartition d'un nom adressé par contenu"""
+    if est_adresse(nom):
+        return '/'.join(nom.split('/')[:-3])
+    return posixpath.dirname(nom)
+
+
+def nom_adresse(dossier, empreinte, extension):
+    return posixpath.join(dossier, empreinte[:2], empreinte[2:4], f'{empreinte}{extension}')
+
+
+class StockageContenu(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # Le nom définitif dépend du contenu : il est choisi dans _save()
+        return name
+
+    def _save(self, name, content):
+        extension = posixpath.splitext(name)[1].lower()
+        nom = nom_adresse(dossier_upload(name), empreinte_contenu(content), extension)
+        with transaction.atomic():
+            # Référence prise sous le verrou avant de décider d'écrire : un delete() concurrent
+            # attend la fin de la transaction, ou a déjà effacé le fichier, qui est alors réécrit
+            fichier, cree = FichierMedia.objects.select_for_update().get_or_create(
+                nom=nom, defaults={'taille': content.size, 'references': 1},
+            )
+            if not cree:
+                FichierMedia.objects.filter(pk=fichier.pk).update(references=F('references') + 1)
+            if cree or not self.exists(nom):
+                self._ecrire(nom, content.chunks())
+        return nom
+
+    def delete(self, name):
+        with transaction.atomic():
+            fichier = FichierMedia.objects.select_for_update().filter(nom=name).first()
+            if fichier is not None and fichier.references > 1:
+                FichierMedia.objects.filter(pk=fichier.pk).update(references=F('references') - 1)
+                return
+            if fichier is not None:
+                fichier.delete()
+            # Effacé sous le verrou : aucun téléversement ne peut le référencer entre-temps
+            super().delete(name)
+            if fichier is not None:
+                # Dernière référence : les renditions de l'original n'ont plus d'usage
+                for derive in noms_renditions(name):
+                    super().delete(derive)
+
+    def ecrire_derive(self, name, donnees):
+        """Écrit (ou remplace) un fichier dérivé sous exactement ce nom, sans comptage"""
+        self._ecrire(name, [donnees])
+
+    def _ecrire(self, nom, morceaux):
+        # Écriture dans un fichier temporaire puis renommage atomique : deux écritures
+        # concurrentes du même contenu produisent le même fichier
+        chemin = self.path(nom)
+        dossier = os.path.dirname(chemin)
+        os.makedirs(dossier, exist_ok=True)
+        descripteur, temporaire = tempfile.mkstemp(dir=dossier, prefix='.tmp-')
+        try:
+            with os.fdopen(descripteur, 'wb') as sortie:
+                for morceau in morceaux:
+                    sortie.write(morceau)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporaire, self.file_permissions_mode)
+            os.replace(temporaire, chemin)
+        except BaseException:
+            if os.path.exists(temporaire):
+                os.remove(temporaire)
+            raise
+
+    @staticmethod
+    def referencer(nom, taille, nombre=1):
+        """Ajoute `nombre` références au fichier `nom` (créé au besoin)"""
+        if FichierMedia.objects.filter(nom=nom).update(references=F('references') + nombre):
+            return
+        try:
+            with transaction.atomic():
+                FichierMedia.objects.create(nom=nom, taille=taille, references=nombre)
+        except IntegrityError:
+            # Ligne créée entre-temps par un autre processus
+            FichierMedia.objects.filter(nom=nom).update(references=F('references') + nombre)
@@ -0,0 +1,53 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+
+from medias.renditions import FORMATS, TAILLES, nom_rendition, renditions_disponibles, url_rendition
+
+register = template.Library()
+
+
+def _srcset(fichier, taille, extension, densites):
+    return ', '.join(
+        f'{fichier.storage.url(nom_rendition(fichier.name, taille, extension, densite))} {densite}x'
+        for densite in densites
+    )
+
+
+@register.simple_tag
+def rendition(fichier, taille, **attributs):
+    """Balise <picture> (WebP puis JPEG, srcset 1x/2x) pour une photo.
+
+    Usage : {% rendition plat.photo "card" alt=plat.nom class="uniform-image" %}
+    Tant que les renditions n'existent pas, l'original est servi dans un simple <img>.
+    """
+    if not fichier:
+        return ''
+    attributs.setdefault('alt', '')
+    attributs.setdefault('loading', 'lazy')
+    densites = renditions_disponibles(fichier, taille)
+    if not densites:
+        return format_html('<img src="{}"{}>', fichier.url, flatatt(attributs))
+
+    largeur, hauteur, recadrage = TAILLES[taille]
+    if recadrage:
+        attributs.setdefault('width', largeur)
+        attributs.setdefault('height', hauteur)
+    # Formats modernes d'abord ; le JPEG de l'<img> sert de repli
+    sources = format_html_join(
+        '', '<source type="image/{}" srcset="{}">',
+        ((extension, _srcset(fichier, taille, extension, densites)) for extension in FORMATS if extension != 'jpg'),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}"{}></picture>',
+        sources,
+        fichier.storage.url(nom_rendition(fichier.name, taille, 'jpg')),
+        _srcset(fichier, taille, 'jpg', densites),
+        flatatt(attributs),
+    )
+
+
+@register.simple_tag
+def rendition_url(fichier, taille, extension='jpg'):
+    """URL d'une rendition 1x (ou de l'original), par exemple pour une image de fond CSS"""
+    return url_rendition(fichier, taille, extension)
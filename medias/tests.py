@@ -0,0 +1,211 @@
+import io
+import os
+import shutil
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from medias.models import EtatPhoto, FichierMedia
+from medias.renditions import nom_rendition
+from medias.stockage import est_adresse
+from plats.models import Plats
+from structures.testing import creer_utilisateur
+
+MEDIA_TEST = tempfile.mkdtemp()
+
+
+def image_jpeg(largeur=1200, hauteur=900):
+    tampon = io.BytesIO()
+    Image.new('RGB', (largeur, hauteur), (200, 80, 40)).save(tampon, 'JPEG')
+    return SimpleUploadedFile('poulet.jpg', tampon.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST, IMAGE_PROCESSING={'SYNCHRONE': True})
+class RenditionsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_TEST, ignore_errors=True)
+
+    def setUp(self):
+        self.user = creer_utilisateur()
+
+    def creer_plat(self, photo):
+        return Plats.objects.create(
+            nom='Poulet', description='d', prix=1000, categorie='plat', createur=self.user, photo=photo,
+        )
+
+    def test_renditions_generees_a_l_enregistrement(self):
+        plat = self.creer_plat(image_jpeg())
+        self.assertEqual(Plats.objects.get(pk=plat.pk).etat_photo, EtatPhoto.PRETE)
+        stockage = plat.photo.storage
+        for extension in ('webp', 'jpg'):
+            self.assertTrue(stockage.exists(nom_rendition(plat.photo.name, 'card', extension)))
+            self.assertTrue(stockage.exists(nom_rendition(plat.photo.name, 'card', extension, 2)))
+        with stockage.open(nom_rendition(plat.photo.name, 'card', 'jpg')) as fichier:
+            self.assertEqual(Image.open(fichier).size, (400, 300))
+        # Original trop petit pour un hero 2x : pas d'agrandissement
+        self.assertFalse(stockage.exists(nom_rendition(plat.photo.name, 'hero', 'jpg', 2)))
+
+    def test_balise_rendition(self):
+        plat = self.creer_plat(image_jpeg())
+        html = Template('{% load renditions %}{% rendition plat.photo "card" alt=plat.nom %}').render(
+            Context({'plat': plat})
+        )
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn(f'/photos/{nom_rendition(plat.photo.name, "card", "jpg", 2)} 2x', html)
+        self.assertIn('alt="Poulet"', html)
+
+    def test_metadonnees_supprimees(self):
+        tampon = io.BytesIO()
+        exif = Image.Exif()
+        exif[0x0110] = 'Appareil'  # Model
+        Image.new('RGB', (640, 480)).save(tampon, 'JPEG', exif=exif)
+        plat = self.creer_plat(SimpleUploadedFile('exif.jpg', tampon.getvalue(), content_type='image/jpeg'))
+        with plat.photo.storage.open(plat.photo.name) as fichier:
+            self.assertFalse(Image.open(fichier).getexif())
+
+    @override_settings(IMAGE_PROCESSING={'SYNCHRONE': False})
+    def test_traitement_differe_original_servi_en_attendant(self):
+        with self.captureOnCommitCallbacks() as taches:
+            plat = self.creer_plat(image_jpeg())
+        self.assertEqual(len(taches), 1)
+        self.assertEqual(plat.etat_photo, EtatPhoto.EN_ATTENTE)
+        html = Template('{% load renditions %}{% rendition plat.photo "card" %}').render(Context({'plat': plat}))
+        self.assertEqual(html, f'<img src="{plat.photo.url}" alt="" loading="lazy">')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST, IMAGE_PROCESSING={'SYNCHRONE': True})
+class StockageContenuTests(TestCase):
+    def setUp(self):
+        self.user = creer_utilisateur()
+
+    def creer_plat(self, photo):
+        return Plats.objects.create(
+            nom='Poulet', description='d', prix=1000, categorie='plat', createur=self.user, photo=photo,
+        )
+
+    def test_meme_contenu_stocke_une_fois(self):
+        premier = self.creer_plat(image_jpeg())
+        second = self.creer_plat(image_jpeg())
+        self.assertTrue(est_adresse(premier.photo.name))
+        self.assertTrue(premier.photo.name.startswith('plats/'))
+        self.assertEqual(premier.photo.name, second.photo.name)
+        self.assertEqual(Plats.objects.get(pk=second.pk).photo.name, second.photo.name)
+        self.assertEqual(FichierMedia.objects.get(nom=premier.photo.name).references, 2)
+
+    def test_suppression_a_la_derniere_reference(self):
+        premier = self.creer_plat(image_jpeg())
+        self.creer_plat(image_jpeg())
+        nom, stockage = premier.photo.name, premier.photo.storage
+        stockage.delete(nom)
+        self.assertEqual(FichierMedia.objects.get(nom=nom).references, 1)
+        self.assertTrue(stockage.exists(nom))
+        stockage.delete(nom)
+        self.assertFalse(FichierMedia.objects.filter(nom=nom).exists())
+        self.assertFalse(stockage.exists(nom))
+        self.assertFalse(stockage.exists(nom_rendition(nom, 'card', 'jpg')))
+
+    def test_references_liberees_a_la_suppression_et_au_remplacement(self):
+        premier = self.creer_plat(image_jpeg())
+        second = self.creer_plat(image_jpeg())
+        nom, stockage = premier.photo.name, premier.photo.storage
+
+        # Même contenu téléversé à nouveau : une seule référence pour le plat
+        with self.captureOnCommitCallbacks(execute=True):
+            premier.photo = image_jpeg()
+            premier.save()
+        self.assertEqual(FichierMedia.objects.get(nom=nom).references, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            premier.photo = image_jpeg(800, 600)
+            premier.save()
+        self.assertEqual(FichierMedia.objects.get(nom=nom).references, 1)
+        self.assertEqual(FichierMedia.objects.get(nom=premier.photo.name).references, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Plats.objects.get(pk=second.pk).delete()
+        self.assertFalse(FichierMedia.objects.filter(nom=nom).exists())
+        self.assertFalse(stockage.exists(nom))
+        self.assertTrue(stockage.exists(premier.photo.name))
+
+    def test_gc_media_supprime_les_orphelins(self):
+        garde = self.creer_plat(image_jpeg())
+        supprime = self.creer_plat(image_jpeg(800, 600))
+        stockage, nom = supprime.photo.storage, supprime.photo.name
+        # Un update() ne libère pas la référence : le fichier devient orphelin
+        Plats.objects.filter(pk=supprime.pk).update(photo='')
+        self.assertTrue(stockage.exists(nom))
+
+        call_command('gc_media', '--min-age', '0', '--dry-run', stdout=io.StringIO())
+        self.assertTrue(stockage.exists(nom))
+        call_command('gc_media', '--min-age', '0', stdout=io.StringIO())
+        self.assertFalse(stockage.exists(nom))
+        self.assertFalse(stockage.exists(nom_rendition(nom, 'card', 'webp')))
+        self.assertFalse(FichierMedia.objects.filter(nom=nom).exists())
+        self.assertTrue(stockage.exists(garde.photo.name))
+        self.assertTrue(stockage.exists(nom_rendition(garde.photo.name, 'card', 'webp')))
+
+    def test_gc_media_ignore_les_fichiers_recents(self):
+        chemin = os.path.join(MEDIA_TEST, 'plats', 'en-cours.jpg')
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        with open(chemin, 'wb') as fichier:
+            fichier.write(b'x')
+        call_command('gc_media', stdout=io.StringIO())
+        self.assertTrue(os.path.exists(chemin))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST)
+class ServiceMediasTests(TestCase):
+    def setUp(self):
+        self.chemin = os.path.join(MEDIA_TEST, 'plats', 'menu.jpg')
+        os.makedirs(os.path.dirname(self.chemin), exist_ok=True)
+        with open(self.chemin, 'wb') as fichier:
+            fichier.write(bytes(range(100)))
+
+    def test_fichier_servi_avec_validateurs(self):
+        reponse = self.client.get('/photos/plats/menu.jpg')
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(b''.join(reponse.streaming_content), bytes(range(100)))
+        self.assertEqual(reponse['Content-Type'], 'image/jpeg')
+        self.assertEqual(reponse['Accept-Ranges'], 'bytes')
+        self.assertIn('max-age=', reponse['Cache-Control'])
+
+        reponse_304 = self.client.get('/photos/plats/menu.jpg', headers={'If-None-Match': reponse['ETag']})
+        self.assertEqual(reponse_304.status_code, 304)
+        reponse_304 = self.client.get(
+            '/photos/plats/menu.jpg', headers={'If-Modified-Since': reponse['Last-Modified']}
+        )
+        self.assertEqual(reponse_304.status_code, 304)
+
+    def test_plages(self):
+        reponse = self.client.get('/photos/plats/menu.jpg', headers={'Range': 'bytes=10-19'})
+        self.assertEqual(reponse.status_code, 206)
+        self.assertEqual(reponse['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(b''.join(reponse.streaming_content), bytes(range(10, 20)))
+
+        reponse = self.client.get('/photos/plats/menu.jpg', headers={'Range': 'bytes=-5'})
+        self.assertEqual(b''.join(reponse.streaming_content), bytes(range(95, 100)))
+
+        reponse = self.client.get('/photos/plats/menu.jpg', headers={'Range': 'bytes=200-'})
+        self.assertEqual(reponse.status_code, 416)
+        self.assertEqual(reponse['Content-Range'], 'bytes */100')
+
+        # Version différente de celle du client : fichier entier
+        reponse = self.client.get('/photos/plats/menu.jpg', headers={'Range': 'bytes=0-9', 'If-Range': '"autre"'})
+        self.assertEqual(reponse.status_code, 200)
+
+    def test_chemins_refuses(self):
+        self.assertEqual(self.client.get('/photos/../manage.py').status_code, 404)
+        self.assertEqual(self.client.get('/photos/plats/absent.jpg').status_code, 404)
+        self.assertEqual(self.client.get('/photos/plats/').status_code, 404)
+
+    @override_settings(MEDIA_SERVING={'ACCEL_REDIRECT': '/_photos/'})
+    def test_mode_x_accel_redirect(self):
+        reponse = self.client.get('/photos/plats/menu.jpg')
+        self.assertEqual(reponse['X-Accel-Redirect'], '/_photos/plats/menu.jpg')
+        self.assertEqual(reponse.content, b'')
@@ -0,0 +1,121 @@
+"""Traitement des photos hors requête par un pool de threads.
+
+Après l'enregistrement d'une photo, la vue rend la main immédiatement : la tâche (décodage,
+orientation EXIF, suppression des métadonnées, renditions) est confiée au pool. L'état est
+suivi dans `etat_photo` ; tant qu'il ne vaut pas `PRETE`, les pages servent l'original.
+
+Configuration (settings.IMAGE_PROCESSING) :
+    SYNCHRONE  traitement immédiat dans la requête (tests)
+    WORKERS    nombre de threads du pool
+"""
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from medias.models import EtatPhoto
+from medias.renditions import generer_renditions
+
+logger = logging.getLogger(__name__)
+
+CONFIGURATION_PAR_DEFAUT = {
+    'SYNCHRONE': False,
+    'WORKERS': 2,
+}
+
+# Formats réencodés sans métadonnées ; les autres (GIF animé...) sont laissés tels quels
+FORMATS_NETTOYES = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+
+# Envoyé quand l'état d'une photo change hors save() (sender : le modèle, instance : l'objet)
+photo_traitee = Signal()
+
+
+def configuration():
+    return {**CONFIGURATION_PAR_DEFAUT, **getattr(settings, 'IMAGE_PROCESSING', {})}
+
+
+def nettoyer_original(fichier):
+    """Réenregistre l'original orienté selon l'EXIF et sans métadonnées (EXIF, GPS...).
+
+    Retourne le nom du fichier obtenu : avec le stockage adressé par contenu, il change.
+    """
+    with fichier.storage.open(fichier.name, 'rb') as source:
+        image = Image.open(source)
+        format_pil = image.format
+        if format_pil not in FORMATS_NETTOYES:
+            return fichier.name
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if format_pil == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    tampon = io.BytesIO()
+    image.save(tampon, format_pil, **FORMATS_NETTOYES[format_pil])
+    fichier.storage.delete(fichier.name)
+    return fichier.storage.save(fichier.name, ContentFile(tampon.getvalue()))
+
+
+def _mettre_a_jour(courants, **valeurs):
+    # L'URL de la photo change : date_modification (suivie par api.synchro) aussi
+    if any(champ.name == 'date_modification' for champ in courants.model._meta.concrete_fields):
+        valeurs['date_modification'] = timezone.now()
+    return courants.update(**valeurs)
+
+
+def traiter_photo(modele, pk, nom):
+    """Tâche du pool : traite la photo `nom` de l'objet, enregistre et retourne l'état obtenu"""
+    # La photo a pu être remplacée (ou l'objet supprimé) depuis la mise en file
+    courants = modele.objects.filter(pk=pk, photo=nom)
+    instance = courants.first()
+    if instance is None:
+        return None
+    try:
+        nom_final = nettoyer_original(instance.photo)
+        if nom_final != nom:
+            _mettre_a_jour(courants, photo=nom_final)
+            courants = modele.objects.filter(pk=pk, photo=nom_final)
+            instance.photo.name = nom_final
+        generer_renditions(instance.photo, forcer=True)
+        etat = EtatPhoto.PRETE
+    except Exception:
+        logger.exception("Échec du traitement de la photo %s (%s #%s)", nom, modele.__name__, pk)
+        etat = EtatPhoto.ECHEC
+    if _mettre_a_jour(courants, etat_photo=etat):
+        instance.etat_photo = etat
+        photo_traitee.send(sender=modele, instance=instance)
+    return etat
+
+
+class PoolImages:
+    def __init__(self):
+        self._executor = None
+        self._verrou = threading.Lock()
+
+    def soumettre(self, modele, pk, nom):
+        with self._verrou:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=configuration()['WORKERS'], thread_name_prefix='medias-images'
+                )
+        self._executor.submit(self._executer, modele, pk, nom)
+
+    @staticmethod
+    def _executer(modele, pk, nom):
+        try:
+            traiter_photo(modele, pk, nom)
+        finally:
+            connection.close()
+
+
+pool_images = PoolImages()
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'medias'
+
+urlpatterns = [
+    # Photos et renditions (MEDIA_URL)
+    path('<path:chemin>', views.servir_media, name='fichier'),
+]
@@ -0,0 +1,141 @@
+"""Service des fichiers de MEDIA_ROOT (photos et renditions).
+
+Remplace la vue `static()` de développement : réponse `FileResponse` (sendfile via
+`wsgi.file_wrapper`), requêtes Range, ETag fort et Last-Modified avec réponses 304, et
+en-têtes de cache longs. Derrière nginx, le mode X-Accel-Redirect délègue l'envoi au proxy.
+
+Configuration (settings.MEDIA_SERVING) :
+    ACCEL_REDIRECT  préfixe de la location `internal` nginx (ex. '/_photos/'), None sinon
+    MAX_AGE         durée de cache (secondes) des fichiers à nom non adressé par contenu
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from medias.renditions import racine_rendition
+from medias.stockage import est_adresse
+
+CONFIGURATION_PAR_DEFAUT = {
+    'ACCEL_REDIRECT': None,
+    'MAX_AGE': 24 * 3600,
+}
+# Un nom adressé par contenu ne change jamais de contenu
+DUREE_IMMUABLE = 365 * 24 * 3600
+
+_PLAGE = re.compile(r'bytes=(\d*)-(\d*)')
+
+
+def configuration():
+    return {**CONFIGURATION_PAR_DEFAUT, **getattr(settings, 'MEDIA_SERVING', {})}
+
+
+def plage_demandee(request, taille, etag, date_modification):
+    """(début, fin incluse) de l'en-tête Range, None pour tout le fichier, ou 'invalide' (416)"""
+    entete = request.headers.get('Range')
+    if not entete:
+        return None
+    # If-Range : la plage n'a de sens que si le client a encore la même version
+    si_plage = request.headers.get('If-Range')
+    if si_plage and si_plage != etag and parse_http_date_safe(si_plage) != int(date_modification):
+        return None
+    # Plusieurs plages (multipart/byteranges) : on sert le fichier entier, ce que la RFC permet
+    correspondance = _PLAGE.fullmatch(entete.strip())
+    if correspondance is None:
+        return None
+    debut, fin = correspondance.groups()
+    if not debut:
+        if not fin or int(fin) == 0:
+            return 'invalide'
+        return max(taille - int(fin), 0), taille - 1
+    debut = int(debut)
+    fin = min(int(fin), taille - 1) if fin else taille - 1
+    if debut >= taille or fin < debut:
+        return 'invalide'
+    return debut, fin
+
+
+class LecturePartielle:
+    """Lecteur limité à `longueur` octets (sans fileno : le serveur n'utilise pas sendfile)"""
+
+    def __init__(self, fichier, longueur):
+        self.fichier = fichier
+        self.reste = longueur
+
+    def read(self, taille=-1):
+        if self.reste <= 0:
+            return b''
+        if taille < 0 or taille > self.reste:
+            taille = self.reste
+        donnees = self.fichier.read(taille)
+        self.reste -= len(donnees)
+        return donnees
+
+    def close(self):
+        self.fichier.close()
+
+
+@require_safe
+def servir_media(request, chemin):
+    try:
+        chemin_complet = safe_join(settings.MEDIA_ROOT, chemin)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        infos = os.stat(chemin_complet)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404
+    if not os.path.isfile(chemin_complet) or os.path.basename(chemin).startswith('.'):
+        raise Http404
+
+    config = configuration()
+    etag = f'"{infos.st_mtime_ns:x}-{infos.st_size:x}"'
+    immuable = est_adresse(racine_rendition(chemin) or chemin)
+    entetes = {
+        'ETag': etag,
+        'Last-Modified': http_date(infos.st_mtime),
+        'Cache-Control': (
+            f'public, max-age={DUREE_IMMUABLE}, immutable' if immuable
+            else f'public, max-age={config["MAX_AGE"]}'
+        ),
+    }
+    type_contenu, encodage = mimetypes.guess_type(chemin)
+    type_contenu = type_contenu or 'application/octet-stream'
+
+    if config['ACCEL_REDIRECT']:
+        # nginx gère lui-même Range et les requêtes conditionnelles sur la location interne
+        reponse = HttpResponse(content_type=type_contenu)
+        reponse['X-Accel-Redirect'] = config['ACCEL_REDIRECT'] + quote(chemin)
+        for nom, valeur in entetes.items():
+            reponse[nom] = valeur
+        return reponse
+
+    reponse = get_conditional_response(request, etag=etag, last_modified=int(infos.st_mtime))
+    if reponse is None:
+        plage = plage_demandee(request, infos.st_size, etag, infos.st_mtime)
+        if plage == 'invalide':
+            reponse = HttpResponse(status=416)
+            reponse['Content-Range'] = f'bytes */{infos.st_size}'
+        elif plage is None:
+            reponse = FileResponse(open(chemin_complet, 'rb'), content_type=type_contenu)
+        else:
+            debut, fin = plage
+            fichier = open(chemin_complet, 'rb')
+            fichier.seek(debut)
+            reponse = FileResponse(LecturePartielle(fichier, fin - debut + 1), status=206, content_type=type_contenu)
+            reponse['Content-Length'] = fin - debut + 1
+            reponse['Content-Range'] = f'bytes {debut}-{fin}/{infos.st_size}'
+        if encodage:
+            reponse['Content-Encoding'] = encodage
+        reponse['Accept-Ranges'] = 'bytes'
+    for nom, valeur in entetes.items():
+        reponse[nom] = valeur
+    return reponse
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MenusConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'menus'
+
+    def ready(self):
+        # Reconstruction des snapshots de menus
+        from menus import signals  # noqa: F401
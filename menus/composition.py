@@ -0,0 +1,165 @@
+"""Modification en masse de la composition des menus (plats de un ou plusieurs menus).
+
+Chaque opération porte sur un ensemble de menus :
+    {'menus': [1, 2], 'plats': [...]}    composition exacte (les plats conservés gardent leur rang)
+    {'menus': [1, 2], 'ajouter': [...]}  ajout en fin de menu (sans effet si déjà présent)
+    {'menus': [1], 'retirer': [...]}
+    {'menus': [1], 'ordre': [...]}       ces plats en tête dans cet ordre, les autres à la suite
+
+`modifier_compositions` valide la propriété de tous les menus et plats en une requête, lit
+les liaisons actuelles en une requête, calcule la différence puis l'écrit en quelques ordres
+groupés : un DELETE et l'insertion de ses traces de suppression (`api.models.Suppression`),
+un bulk_create et un bulk_update des positions. Aucun de ces ordres n'émet de signal : les
+snapshots et le cache des pages sont mis à jour une fois par menu modifié.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Value
+from django.utils import timezone
+
+from api.models import Suppression
+from menus.models import MenuPlat, Menus
+from menus.snapshot import reconstruire_snapshots
+from plats.models import Plats
+from structures.signals import invalider_apres_commit
+
+OPERATIONS = ('plats', 'ajouter', 'retirer', 'ordre')
+
+
+def _identifiants(valeurs, cle):
+    if not isinstance(valeurs, (list, tuple, set)):
+        raise ValidationError(f"« {cle} » doit être une liste d'identifiants.")
+    try:
+        return [int(valeur) for valeur in valeurs]
+    except (TypeError, ValueError):
+        raise ValidationError(f"« {cle} » doit être une liste d'identifiants.")
+
+
+def _normaliser(operation):
+    if not isinstance(operation, dict):
+        raise ValidationError("Chaque opération doit être un objet.")
+    inconnues = set(operation) - {'menus', *OPERATIONS}
+    if inconnues:
+        raise ValidationError(f"Clés inconnues : {', '.join(sorted(inconnues))}.")
+    if not any(cle in operation for cle in OPERATIONS):
+        raise ValidationError(f"Chaque opération doit contenir l'une des clés : {', '.join(OPERATIONS)}.")
+    normalisee = {cle: _identifiants(operation[cle], cle) for cle in operation}
+    if not normalisee.get('menus'):
+        raise ValidationError("Chaque opération doit désigner au moins un menu.")
+    return normalisee
+
+
+def _verifier_proprietaire(user, menu_ids, plat_ids):
+    """{menu: structure}, {plat: structure} ; une seule requête pour les menus et les plats"""
+    menus = Menus.objects.filter(pk__in=menu_ids, createur=user).annotate(type=Value('menu'))
+    plats = Plats.objects.filter(pk__in=plat_ids, createur=user).annotate(type=Value('plat'))
+    lignes = menus.order_by().values_list('type', 'pk', 'structure_id').union(
+        plats.order_by().values_list('type', 'pk', 'structure_id'), all=True
+    )
+    structures = {'menu': {}, 'plat': {}}
+    for type_objet, pk, structure_id in lignes:
+        structures[type_objet][pk] = structure_id
+
+    for type_objet, demandes, libelle in (('menu', menu_ids, "Menus"), ('plat', plat_ids, "Plats")):
+        manquants = sorted(set(demandes) - set(structures[type_objet]))
+        if manquants:
+            raise ValidationError(
+                f"{libelle} introuvables ou appartenant à un autre utilisateur : {', '.join(map(str, manquants))}."
+            )
+    return structures['menu'], structures['plat']
+
+
+def _appliquer(plats, operation):
+    """Nouvelle liste ordonnée des plats d'un menu après `operation`"""
+    if 'plats' in operation:
+        voulus = list(dict.fromkeys(operation['plats']))
+        presents = set(plats)
+        plats = [plat for plat in plats if plat in set(voulus)] + [plat for plat in voulus if plat not in presents]
+    if 'retirer' in operation:
+        retires = set(operation['retirer'])
+        plats = [plat for plat in plats if plat not in retires]
+    if 'ajouter' in operation:
+        presents = set(plats)
+        plats = plats + [plat for plat in dict.fromkeys(operation['ajouter']) if plat not in presents]
+    if 'ordre' in operation:
+        # Les plats absents du menu sont ignorés
+        presents = set(plats)
+        tete = [plat for plat in dict.fromkeys(operation['ordre']) if plat in presents]
+        plats = tete + [plat for plat in plats if plat not in set(tete)]
+    return plats
+
+
+def _supprimer_liaisons(liaisons, structures_menus):
+    """Supprime les liaisons (lien_id, menu_id) en un DELETE et note leurs traces en un INSERT.
+
+    Contourne volontairement delete() et ses post_delete ligne par ligne (snapshot, trace,
+    cache) : l'appelant reconstruit les snapshots et invalide le cache une fois par menu.
+    """
+    MenuPlat.objects.filter(pk__in=[lien_id for lien_id, _ in liaisons])._raw_delete(MenuPlat.objects.db)
+    Suppression.objects.noter('liaisons', [
+        (lien_id, structures_menus[menu_id]) for lien_id, menu_id in liaisons
+    ])
+
+
+def modifier_compositions(user, operations):
+    """Applique les opérations aux menus de `user` ; lève ValidationError sans rien écrire en cas d'erreur"""
+    operations = [_normaliser(operation) for operation in operations]
+    menu_ids = {menu for operation in operations for menu in operation['menus']}
+    plat_ids = {plat for operation in operations for cle in OPERATIONS for plat in operation.get(cle, ())}
+    structures_menus, structures_plats = _verifier_proprietaire(user, menu_ids, plat_ids)
+
+    with transaction.atomic():
+        # État actuel, dans l'ordre d'affichage (les liaisons anciennes ont toutes la position 0)
+        actuel = {menu: {} for menu in menu_ids}
+        liens = (
+            MenuPlat.objects.select_for_update().filter(menu_id__in=menu_ids)
+            .order_by('menu_id', 'position', 'plat__nom', 'id')
+            .values_list('id', 'menu_id', 'plat_id', 'position')
+        )
+        for lien_id, menu_id, plat_id, position in liens:
+            actuel[menu_id][plat_id] = (lien_id, position)
+
+        a_supprimer, a_creer, a_deplacer, modifies = [], [], [], set()
+        maintenant = timezone.now()
+        for menu_id in menu_ids:
+            cible = list(actuel[menu_id])
+            for operation in operations:
+                if menu_id in operation['menus']:
+                    cible = _appliquer(cible, operation)
+
+            for plat_id in cible:
+                structure_plat = structures_plats.get(plat_id)
+                if plat_id not in actuel[menu_id] and structure_plat not in (None, structures_menus[menu_id]):
+                    raise ValidationError(
+                        f"Le plat {plat_id} ne peut pas être associé au menu {menu_id} d'une autre structure."
+                    )
+            gardes = set(cible)
+            for plat_id, (lien_id, _) in actuel[menu_id].items():
+                if plat_id not in gardes:
+                    a_supprimer.append((lien_id, menu_id))
+                    modifies.add(menu_id)
+            for position, plat_id in enumerate(cible):
+                if plat_id not in actuel[menu_id]:
+                    a_creer.append(MenuPlat(menu_id=menu_id, plat_id=plat_id, position=position))
+                    modifies.add(menu_id)
+                elif actuel[menu_id][plat_id][1] != position:
+                    a_deplacer.append(MenuPlat(
+                        pk=actuel[menu_id][plat_id][0], position=position, date_modification=maintenant
+                    ))
+                    modifies.add(menu_id)
+
+        if a_supprimer:
+            _supprimer_liaisons(a_supprimer, structures_menus)
+        MenuPlat.objects.bulk_create(a_creer)
+        MenuPlat.objects.bulk_update(a_deplacer, ['position', 'date_modification'], batch_size=500)
+
+        # Ni le DELETE ni bulk_create/bulk_update n'émettent de signal : une mise à jour par menu
+        reconstruire_snapshots(modifies)
+        invalider_apres_commit(*(structures_menus[menu_id] for menu_id in modifies))
+
+    return {
+        'ajoutes': len(a_creer),
+        'retires': len(a_supprimer),
+        'deplaces': len(a_deplacer),
+        'menus': sorted(modifies),
+    }
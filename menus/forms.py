@@ -36,10 +36,10 @@ class MenuForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         # Restreindre les plats au propriétaire
         if user is not None:
-            self.fields['plats'].queryset = Plats.objects.filter(createur=user)
+            self.fields['plats'].queryset = Plats.objects.filter(createur=user).only('id', 'nom')
         else:
             self.fields['plats'].queryset = Plats.objects.none()
         # Pré-sélectionner les plats déjà associés lors d'une édition
         if getattr(self, 'instance', None) and getattr(self.instance, 'pk', None):
-            self.initial['plats'] = self.instance.plats.all()
+            self.initial['plats'] = list(self.instance.plats.values_list('pk', flat=True))
 
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from menus.models import Menus
+from menus.qrcodes import FORMATS, qr_menu
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère à l'avance les QR codes (PNG et SVG) de tous les menus actifs dans le cache partagé "
+        "(Redis) : le premier scan d'une table n'attend pas la génération"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formats', default=','.join(FORMATS), help="Formats séparés par des virgules (défaut : png,svg)")
+        parser.add_argument('--force', action='store_true', help="Régénérer aussi les QR codes déjà en cache")
+
+    def handle(self, *args, **options):
+        formats = [format_qr.strip() for format_qr in options['formats'].split(',') if format_qr.strip()]
+        inconnus = set(formats) - set(FORMATS)
+        if inconnus:
+            raise CommandError(f"Formats inconnus : {', '.join(sorted(inconnus))}")
+
+        menus = generes = 0
+        for menu_id, version in Menus.objects.filter(status='actif').order_by('pk').values_list('pk', 'version').iterator():
+            menus += 1
+            for format_qr in formats:
+                _, genere = qr_menu(menu_id, version, format_qr, forcer=options['force'])
+                generes += genere
+        self.stdout.write(self.style.SUCCESS(
+            f"{menus} menu(s) actif(s) : {generes} QR code(s) généré(s), les autres étaient déjà en cache."
+        ))
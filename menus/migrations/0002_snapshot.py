@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menus', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menus',
+            name='snapshot',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='menus',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menus', '0002_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuplat',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
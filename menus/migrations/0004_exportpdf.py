@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menus', '0003_menuplat_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportPdf',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fichier', models.FileField(blank=True, upload_to='menus/pdf/')),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('version_demandee', models.PositiveIntegerField(default=0)),
+                ('date_demande', models.DateTimeField(blank=True, null=True)),
+                ('date_generation', models.DateTimeField(blank=True, null=True)),
+                ('menu', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='export_pdf', to='menus.menus')),
+            ],
+            options={
+                'verbose_name': 'Export PDF de menu',
+                'verbose_name_plural': 'Exports PDF de menus',
+            },
+        ),
+    ]
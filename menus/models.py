@@ -16,11 +16,15 @@ class Menus(models.Model):
 
     nom = models.CharField(max_length=100)
     date_creation = models.DateTimeField(default=timezone.now)
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='brouillon')
     # Relation ManyToMany avec les plats (un plat peut appartenir à 0..n menus)
     plats = models.ManyToManyField('plats.Plats', through='MenuPlat', related_name='menus', blank=True)
     createur = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="Créateur")
     structure = models.ForeignKey(Structures, on_delete=models.CASCADE, related_name='menus')
+    # Document dénormalisé (plats par catégorie, prix) reconstruit à chaque modification, voir menus.snapshot
+    snapshot = models.JSONField(default=dict, blank=True, editable=False)
+    version = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ['date_creation']
@@ -39,6 +43,9 @@ class MenuPlat(models.Model):
     menu = models.ForeignKey('menus.Menus', on_delete=models.CASCADE)
     plat = models.ForeignKey('plats.Plats', on_delete=models.CASCADE)
     date_ajout = models.DateTimeField(default=timezone.now)
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
+    # Ordre d'affichage du plat dans sa catégorie (voir menus.composition)
+    position = models.PositiveIntegerField(default=0)
 
     class Meta:
         unique_together = ('menu', 'plat')
@@ -56,3 +63,21 @@ class MenuPlat(models.Model):
 
     def __str__(self):
         return f"{self.menu} ↔ {self.plat}"
+
+
+class ExportPdf(models.Model):
+    """PDF imprimable d'un menu, généré hors requête pour une version du snapshot (voir menus.pdf)"""
+    menu = models.OneToOneField(Menus, on_delete=models.CASCADE, related_name='export_pdf')
+    fichier = models.FileField(upload_to='menus/pdf/', blank=True)
+    # Version du snapshot rendue dans `fichier`, et dernière version confiée au pool
+    version = models.PositiveIntegerField(default=0)
+    version_demandee = models.PositiveIntegerField(default=0)
+    date_demande = models.DateTimeField(null=True, blank=True)
+    date_generation = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Export PDF de menu"
+        verbose_name_plural = "Exports PDF de menus"
+
+    def __str__(self):
+        return f"{self.menu} (v{self.version})"
@@ -0,0 +1,180 @@
+"""Export PDF imprimable des menus, généré hors requête par un pool de threads.
+
+Le PDF est rendu (reportlab) à partir du snapshot du menu, photos comprises, puis enregistré
+dans le stockage des médias et suivi par `ExportPdf`. Il est indexé par la version du
+snapshot : tant que le contenu du menu ne change pas, le même fichier est servi ; après une
+modification, la première demande planifie un nouveau rendu.
+
+Configuration (settings.MENU_PDF) :
+    SYNCHRONE  rendu immédiat dans la requête (tests)
+    WORKERS    nombre de threads du pool
+"""
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.html import escape
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from medias.models import EtatPhoto
+from medias.renditions import nom_rendition
+from menus.models import ExportPdf, Menus
+
+logger = logging.getLogger(__name__)
+
+CONFIGURATION_PAR_DEFAUT = {
+    'SYNCHRONE': False,
+    'WORKERS': 1,
+}
+# Une demande restée sans résultat (processus arrêté...) est replanifiée après ce délai
+DELAI_RELANCE = timedelta(minutes=5)
+
+
+def configuration():
+    return {**CONFIGURATION_PAR_DEFAUT, **getattr(settings, 'MENU_PDF', {})}
+
+
+def _vignette(plat):
+    """Image reportlab de la photo du plat (rendition « card » si prête), None sans photo lisible"""
+    if not plat['photo']:
+        return None
+    nom = plat['photo']
+    if plat['etat_photo'] == EtatPhoto.PRETE:
+        nom = nom_rendition(nom, 'card', 'jpg')
+    try:
+        with default_storage.open(nom, 'rb') as fichier:
+            return Image(io.BytesIO(fichier.read()), width=32 * mm, height=24 * mm)
+    except OSError:
+        return None
+
+
+def rendre_pdf(snapshot):
+    """Octets du PDF d'un snapshot de menu"""
+    styles = getSampleStyleSheet()
+    menu = snapshot['menu']
+    tampon = io.BytesIO()
+    document = SimpleDocTemplate(
+        tampon, pagesize=A4, title=menu['nom'], author=menu['structure']['nom'],
+        leftMargin=15 * mm, rightMargin=15 * mm, topMargin=15 * mm, bottomMargin=15 * mm,
+    )
+    elements = [
+        Paragraph(escape(menu['nom']), styles['Title']),
+        Paragraph(escape(menu['structure']['nom']), styles['Heading3']),
+        Spacer(0, 6 * mm),
+    ]
+    for categorie in snapshot['categories']:
+        elements.append(Paragraph(escape(categorie['libelle']), styles['Heading2']))
+        lignes = []
+        for plat in categorie['plats']:
+            prix = f"{plat['prix']} FCFA"
+            promotion = plat['promotion']
+            if promotion:
+                # Le PDF est imprimé : la fenêtre de promotion est écrite, pas évaluée
+                prix += f"<br/><font color='#c0392b'>Promo : {promotion['prix']} FCFA"
+                if promotion['fin']:
+                    prix += f" jusqu'au {datetime.fromisoformat(promotion['fin']):%d/%m}"
+                prix += "</font>"
+            lignes.append([
+                _vignette(plat) or '',
+                [
+                    Paragraph(f"<b>{escape(plat['nom'])}</b>", styles['Normal']),
+                    Paragraph(escape(plat['description'][:300]), styles['BodyText']),
+                ],
+                Paragraph(prix, styles['Normal']),
+            ])
+        if lignes:
+            table = Table(lignes, colWidths=[36 * mm, None, 38 * mm])
+            table.setStyle(TableStyle([
+                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+                ('LINEBELOW', (0, 0), (-1, -1), 0.25, colors.lightgrey),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ]))
+            elements.append(table)
+    if not snapshot['categories']:
+        elements.append(Paragraph("Aucun plat dans ce menu.", styles['Normal']))
+    document.build(elements)
+    return tampon.getvalue()
+
+
+def generer_pdf(menu_id, version):
+    """Tâche du pool : rend et enregistre le PDF de la version `version` du menu"""
+    menu = Menus.objects.filter(pk=menu_id).only('snapshot', 'version').first()
+    # Menu supprimé ou modifié depuis la demande : la nouvelle version aura sa propre demande
+    if menu is None or menu.version != version:
+        return None
+    try:
+        donnees = rendre_pdf(menu.snapshot)
+    except Exception:
+        logger.exception("Échec du rendu PDF du menu #%s (version %s)", menu_id, version)
+        return None
+    nom = default_storage.save(f'menus/pdf/menu-{menu_id}.pdf', ContentFile(donnees))
+    with transaction.atomic():
+        export = ExportPdf.objects.select_for_update().get(menu_id=menu_id)
+        ancien = export.fichier.name
+        export.fichier.name = nom
+        export.version = version
+        export.date_generation = timezone.now()
+        # L'ancien fichier est libéré par medias.signals ; un contenu identique garde son nom
+        # mais save() lui a ajouté une référence
+        export.save(update_fields=['fichier', 'version', 'date_generation'])
+    if ancien == nom:
+        default_storage.delete(nom)
+    return export
+
+
+def demander_pdf(menu_id, version):
+    """Export prêt pour cette version du menu ; sinon planifie son rendu et retourne None"""
+    export, _ = ExportPdf.objects.get_or_create(menu_id=menu_id)
+    if export.version == version and export.fichier:
+        return export
+    maintenant = timezone.now()
+    deja_demande = (
+        export.version_demandee == version
+        and export.date_demande and maintenant - export.date_demande < DELAI_RELANCE
+    )
+    if deja_demande:
+        return None
+    # Un seul processus obtient la demande pour cette version
+    if not ExportPdf.objects.filter(
+        pk=export.pk, version_demandee=export.version_demandee, date_demande=export.date_demande
+    ).update(version_demandee=version, date_demande=maintenant):
+        return None
+    if configuration()['SYNCHRONE']:
+        return generer_pdf(menu_id, version)
+    transaction.on_commit(lambda: pool_pdf.soumettre(menu_id, version))
+    return None
+
+
+class PoolPdf:
+    def __init__(self):
+        self._executor = None
+        self._verrou = threading.Lock()
+
+    def soumettre(self, menu_id, version):
+        with self._verrou:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=configuration()['WORKERS'], thread_name_prefix='menus-pdf'
+                )
+        self._executor.submit(self._executer, menu_id, version)
+
+    @staticmethod
+    def _executer(menu_id, version):
+        try:
+            generer_pdf(menu_id, version)
+        finally:
+            connection.close()
+
+
+pool_pdf = PoolPdf()
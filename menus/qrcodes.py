@@ -0,0 +1,49 @@
+"""QR codes des menus, à poser sur les tables.
+
+Le QR code pointe vers la page mobile du menu (`menus:menu-mobile`), dont l'URL ne change
+jamais : un QR code imprimé reste valable. L'image (PNG ou SVG) est générée une fois puis
+conservée dans le cache, par menu et par version du snapshot (voir `menus.snapshot`).
+"""
+import io
+
+import qrcode
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+from qrcode.image.svg import SvgPathImage
+
+# format -> (type MIME, fabrique d'image qrcode ; None : PNG via Pillow)
+FORMATS = {
+    'png': ('image/png', None),
+    'svg': ('image/svg+xml', SvgPathImage),
+}
+DUREE_QR = 30 * 24 * 3600
+
+
+def url_menu_mobile(menu_id):
+    return settings.SITE_URL.rstrip('/') + reverse('menus:menu-mobile', args=[menu_id])
+
+
+def cle_qr(menu_id, version, format_qr):
+    return f'menu:{menu_id}:qr:{version}:{format_qr}'
+
+
+def generer_qr(menu_id, format_qr):
+    """Octets de l'image du QR code"""
+    code = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=10, border=4)
+    code.add_data(url_menu_mobile(menu_id))
+    code.make(fit=True)
+    tampon = io.BytesIO()
+    code.make_image(image_factory=FORMATS[format_qr][1]).save(tampon)
+    return tampon.getvalue()
+
+
+def qr_menu(menu_id, version, format_qr='png', forcer=False):
+    """(octets, généré) : image en cache, générée au besoin"""
+    cle = cle_qr(menu_id, version, format_qr)
+    donnees = None if forcer else cache.get(cle)
+    if donnees is not None:
+        return donnees, False
+    donnees = generer_qr(menu_id, format_qr)
+    cache.set(cle, donnees, DUREE_QR)
+    return donnees, True
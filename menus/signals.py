@@ -0,0 +1,54 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from medias.traitement import photo_traitee
+from menus.models import MenuPlat, Menus
+from menus.snapshot import CHAMPS_SOURCES_PLAT, reconstruire_snapshots
+from plats.models import Plats
+from structures.models import Structures
+
+# Reconstruction dans la transaction de la modification : le snapshot est toujours cohérent
+
+
+@receiver(post_save, sender=Menus)
+def snapshot_menu(sender, instance, raw=False, **kwargs):
+    if not raw:
+        reconstruire_snapshots([instance.pk])
+
+
+@receiver(post_save, sender=MenuPlat)
+@receiver(post_delete, sender=MenuPlat)
+def snapshot_menu_plat(sender, instance, raw=False, **kwargs):
+    if not raw:
+        reconstruire_snapshots([instance.menu_id])
+
+
+@receiver(m2m_changed, sender=MenuPlat)
+def snapshot_plats_du_menu(sender, instance, action, reverse, pk_set, **kwargs):
+    # menu.plats.set()/add()/remove() passent par bulk_create/delete, sans post_save/post_delete
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            reconstruire_snapshots([instance.pk])
+        return
+    # plat.menus.add(...) : instance est le plat, pk_set les menus ; clear() est traité avant coup
+    if action in ('post_add', 'post_remove') and pk_set:
+        reconstruire_snapshots(pk_set)
+    elif action == 'pre_clear':
+        instance._menus_avant_clear = list(MenuPlat.objects.filter(plat=instance).values_list('menu_id', flat=True))
+    elif action == 'post_clear':
+        reconstruire_snapshots(getattr(instance, '_menus_avant_clear', []))
+
+
+@receiver(post_save, sender=Plats)
+@receiver(photo_traitee, sender=Plats)
+def snapshot_plat(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not CHAMPS_SOURCES_PLAT.intersection(update_fields)):
+        return
+    reconstruire_snapshots(MenuPlat.objects.filter(plat_id=instance.pk).values_list('menu_id', flat=True))
+
+
+@receiver(post_save, sender=Structures)
+def snapshot_structure(sender, instance, raw=False, **kwargs):
+    # Le nom de la structure figure dans le snapshot
+    if not raw:
+        reconstruire_snapshots(Menus.objects.filter(structure_id=instance.pk).values_list('pk', flat=True))
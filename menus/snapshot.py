@@ -0,0 +1,142 @@
+"""Document dénormalisé (JSON) de chaque menu, lu par menu_detail et par l'API JSON.
+
+`Menus.snapshot` contient le menu, sa structure et ses plats regroupés par catégorie avec
+leurs prix. Il est reconstruit (`reconstruire_snapshots`) à chaque modification du menu, de
+ses liaisons MenuPlat ou d'un de ses plats (voir `menus.signals`) ; `Menus.version` augmente
+quand son contenu change. Une version 0 signifie « jamais construit » : la lecture le construit.
+
+La fenêtre de promotion est stockée telle quelle : son activité dépend de l'heure et est
+évaluée à l'affichage (`contexte_affichage`).
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from django.db.models import F
+from django.utils import timezone
+
+from menus.models import MenuPlat, Menus
+from plats.models import Plats
+
+# Champs de Plats repris dans le snapshot (et champs sources des fenêtres de promotion)
+CHAMPS_PLAT = {
+    'nom', 'description', 'prix', 'categorie', 'photo', 'etat_photo', 'temps_preparation',
+    'en_promotion', 'prix_promotionnel', 'pourcentage_reduction', 'debut_promotion', 'fin_promotion',
+}
+CHAMPS_SOURCES_PLAT = CHAMPS_PLAT | {
+    'date_debut_promotion', 'heure_debut_promotion', 'date_fin_promotion', 'heure_fin_promotion',
+}
+
+
+def _date(valeur):
+    return valeur.isoformat() if valeur else None
+
+
+def _decimal(valeur):
+    return str(valeur) if valeur is not None else None
+
+
+def _prix(valeur):
+    # Le prix calculé d'une réduction en pourcentage a plus de deux décimales
+    return str(Decimal(valeur).quantize(Decimal('0.01')))
+
+
+def construire_snapshot(menu):
+    """Document du menu (structure chargée) ; une requête pour les plats, dans l'ordre des positions"""
+    categories = {}
+    nombre_plats = 0
+    liens = (
+        MenuPlat.objects.filter(menu=menu).select_related('plat')
+        .order_by('plat__categorie', 'position', 'plat__nom')
+        .only('position', 'plat__id', *(f'plat__{champ}' for champ in CHAMPS_PLAT))
+    )
+    for plat in (lien.plat for lien in liens):
+        categorie = categories.setdefault(plat.categorie, {
+            'code': plat.categorie,
+            'libelle': plat.get_categorie_display(),
+            'plats': [],
+        })
+        categorie['plats'].append({
+            'id': plat.pk,
+            'nom': plat.nom,
+            'description': plat.description,
+            'prix': _prix(plat.prix),
+            'temps_preparation': plat.temps_preparation,
+            'photo': plat.photo.name or '',
+            'etat_photo': plat.etat_photo,
+            'promotion': {
+                'prix': _prix(plat.get_prix_promotionnel()),
+                'pourcentage_reduction': _decimal(plat.pourcentage_reduction),
+                'debut': _date(plat.debut_promotion),
+                'fin': _date(plat.fin_promotion),
+            } if plat.en_promotion else None,
+        })
+        nombre_plats += 1
+    return {
+        'menu': {
+            'id': menu.pk,
+            'nom': menu.nom,
+            'status': menu.status,
+            'status_libelle': menu.get_status_display(),
+            'date_creation': _date(menu.date_creation),
+            'structure': {'id': menu.structure_id, 'nom': menu.structure.nom},
+        },
+        'nombre_plats': nombre_plats,
+        'categories': list(categories.values()),
+    }
+
+
+def reconstruire_snapshots(menu_ids):
+    """Reconstruit le snapshot des menus donnés (update() : aucun signal post_save).
+
+    La version n'augmente que si le contenu change : les artefacts indexés par version
+    (QR codes, PDF) ne sont pas régénérés pour rien.
+    """
+    for menu in Menus.objects.filter(pk__in=set(menu_ids)).select_related('structure'):
+        snapshot = construire_snapshot(menu)
+        if menu.version and snapshot == menu.snapshot:
+            continue
+        Menus.objects.filter(pk=menu.pk).update(
+            snapshot=snapshot, version=F('version') + 1, date_modification=timezone.now()
+        )
+
+
+def snapshot_du_menu(menu):
+    """(snapshot, version) d'un menu chargé avec au moins `snapshot` et `version`"""
+    if not menu.version:
+        reconstruire_snapshots([menu.pk])
+        menu = Menus.objects.only('snapshot', 'version').get(pk=menu.pk)
+    return menu.snapshot, menu.version
+
+
+def promotion_active(promotion, now):
+    if promotion is None:
+        return False
+    if promotion['debut'] and now < datetime.fromisoformat(promotion['debut']):
+        return False
+    if promotion['fin'] and now > datetime.fromisoformat(promotion['fin']):
+        return False
+    return True
+
+
+def contexte_affichage(snapshot, now=None):
+    """Contexte de gabarit : dates et photos reconstituées, prix effectifs à l'heure `now`"""
+    now = now or timezone.now()
+    categories = []
+    for categorie in snapshot['categories']:
+        plats = []
+        for plat in categorie['plats']:
+            active = promotion_active(plat['promotion'], now)
+            plats.append({
+                **plat,
+                # FieldFile sans requête, pour la balise {% rendition %}
+                'photo': Plats(pk=plat['id'], photo=plat['photo'], etat_photo=plat['etat_photo']).photo,
+                'promotion_active': active,
+                'prix_effectif': plat['promotion']['prix'] if active else plat['prix'],
+            })
+        categories.append({**categorie, 'plats': plats})
+    menu = snapshot['menu']
+    return {
+        'menu': {**menu, 'date_creation': datetime.fromisoformat(menu['date_creation'])},
+        'nombre_plats': snapshot['nombre_plats'],
+        'categories': categories,
+    }
@@ -1,3 +1,263 @@
-from django.test import TestCase
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from api.models import Suppression
+from menus.composition import modifier_compositions
+from menus.models import ExportPdf, MenuPlat, Menus
+from menus.qrcodes import cle_qr
+from menus.snapshot import contexte_affichage
+from plats.models import Plats
+from structures.testing import StructureTestMixin, creer_utilisateur
+
+MEDIA_TEST = tempfile.mkdtemp()
+
+
+def image_jpeg():
+    tampon = io.BytesIO()
+    Image.new('RGB', (800, 600), (200, 80, 40)).save(tampon, 'JPEG')
+    return SimpleUploadedFile('fufu.jpg', tampon.getvalue(), content_type='image/jpeg')
+
+
+class SnapshotMenuTests(StructureTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.fufu = Plats.objects.create(
+            nom='Fufu', description='d', prix=1000, categorie='plat', createur=self.user, structure=self.structure,
+        )
+        self.bissap = Plats.objects.create(
+            nom='Bissap', description='d', prix=300, categorie='boisson', createur=self.user, structure=self.structure,
+        )
+        self.menu = Menus.objects.create(nom='Midi', createur=self.user, structure=self.structure)
+
+    def snapshot(self):
+        self.menu.refresh_from_db()
+        return self.menu.snapshot
+
+    def test_snapshot_suit_les_liaisons_et_les_plats(self):
+        self.menu.plats.add(self.fufu, self.bissap)
+        snapshot = self.snapshot()
+        self.assertEqual(snapshot['nombre_plats'], 2)
+        self.assertEqual([c['code'] for c in snapshot['categories']], ['boisson', 'plat'])
+        self.assertEqual(snapshot['categories'][1]['libelle'], 'Plat principal')
+
+        version = self.menu.version
+        self.fufu.prix = 1200
+        self.fufu.save()
+        self.assertEqual(self.snapshot()['categories'][1]['plats'][0]['prix'], '1200.00')
+        self.assertGreater(self.menu.version, version)
+
+        self.menu.plats.remove(self.bissap)
+        self.assertEqual(self.snapshot()['nombre_plats'], 1)
+        self.fufu.delete()
+        self.assertEqual(self.snapshot()['categories'], [])
+
+    def test_prix_effectif_selon_la_fenetre_de_promotion(self):
+        self.fufu.en_promotion = True
+        self.fufu.pourcentage_reduction = 10
+        self.fufu.date_debut_promotion = timezone.now() + timedelta(days=1)
+        self.fufu.save()
+        self.menu.plats.add(self.fufu)
+        plat = contexte_affichage(self.snapshot())['categories'][0]['plats'][0]
+        self.assertFalse(plat['promotion_active'])
+        self.assertEqual(plat['prix_effectif'], '1000.00')
+
+        plat = contexte_affichage(self.snapshot(), now=timezone.now() + timedelta(days=2))['categories'][0]['plats'][0]
+        self.assertTrue(plat['promotion_active'])
+        self.assertEqual(plat['prix_effectif'], '900.00')
+
+    def test_page_et_json_servis_depuis_le_snapshot(self):
+        self.menu.plats.add(self.fufu)
+        reponse = self.client.get(reverse('menus:menu-detail', args=[self.menu.pk]))
+        self.assertContains(reponse, 'Fufu')
+        self.assertContains(reponse, '1 plat')
+
+        reponse = self.client.get(reverse('menus:menu-json', args=[self.menu.pk]))
+        self.assertEqual(reponse.json()['categories'][0]['plats'][0]['nom'], 'Fufu')
+        reponse = self.client.get(
+            reverse('menus:menu-json', args=[self.menu.pk]), headers={'If-None-Match': reponse['ETag']}
+        )
+        self.assertEqual(reponse.status_code, 304)
+
+    def test_snapshot_construit_a_la_premiere_lecture(self):
+        Menus.objects.filter(pk=self.menu.pk).update(snapshot={}, version=0)
+        reponse = self.client.get(reverse('menus:menu-json', args=[self.menu.pk]))
+        self.assertEqual(reponse.json()['menu']['nom'], 'Midi')
+        self.assertEqual(reponse.json()['version'], 1)
+
+
+class CompositionsMenusTests(StructureTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.plats = [
+            Plats.objects.create(
+                nom=nom, description='d', prix=1000, categorie='plat', createur=self.user, structure=self.structure,
+            )
+            for nom in ('Ablo', 'Fufu', 'Gboma', 'Riz')
+        ]
+        self.midi = Menus.objects.create(nom='Midi', createur=self.user, structure=self.structure)
+        self.soir = Menus.objects.create(nom='Soir', createur=self.user, structure=self.structure)
+
+    def composition(self, menu):
+        return list(MenuPlat.objects.filter(menu=menu).order_by('position').values_list('plat__nom', flat=True))
+
+    def test_ajout_retrait_et_ordre_sur_plusieurs_menus(self):
+        ablo, fufu, gboma, riz = (plat.pk for plat in self.plats)
+        resultat = modifier_compositions(self.user, [{'menus': [self.midi.pk, self.soir.pk], 'ajouter': [riz, ablo]}])
+        self.assertEqual(resultat['ajoutes'], 4)
+        self.assertEqual(self.composition(self.midi), ['Riz', 'Ablo'])
+
+        resultat = modifier_compositions(self.user, [
+            {'menus': [self.midi.pk], 'retirer': [riz], 'ajouter': [fufu, gboma]},
+            {'menus': [self.midi.pk], 'ordre': [gboma]},
+        ])
+        self.assertEqual(self.composition(self.midi), ['Gboma', 'Ablo', 'Fufu'])
+        self.assertEqual(self.composition(self.soir), ['Riz', 'Ablo'])
+        self.assertEqual(resultat['menus'], [self.midi.pk])
+        # Liaison retirée : trace pour la synchronisation des clients
+        self.assertEqual(
+            list(Suppression.objects.filter(modele='liaisons').values_list('structure_id', flat=True)),
+            [self.structure.pk],
+        )
+        self.midi.refresh_from_db()
+        self.assertEqual([p['nom'] for p in self.midi.snapshot['categories'][0]['plats']], ['Gboma', 'Ablo', 'Fufu'])
+
+        # Composition exacte : seule la différence est écrite
+        resultat = modifier_compositions(self.user, [{'menus': [self.midi.pk], 'plats': [fufu, gboma, ablo]}])
+        self.assertEqual((resultat['ajoutes'], resultat['retires'], resultat['deplaces']), (0, 0, 0))
+
+    def test_requetes_constantes_par_liaison_retiree(self):
+        plats = Plats.objects.bulk_create([
+            Plats(nom=f'Plat {i}', description='d', prix=1000, categorie='plat', createur=self.user,
+                  structure=self.structure)
+            for i in range(40)
+        ])
+        ids = [plat.pk for plat in plats]
+        modifier_compositions(self.user, [{'menus': [self.midi.pk, self.soir.pk], 'ajouter': ids}])
+
+        # Même nombre de requêtes pour 5 et 35 liaisons retirées (les suivantes remontent)
+        with self.assertNumQueries(10):
+            modifier_compositions(self.user, [{'menus': [self.midi.pk], 'retirer': ids[:5]}])
+        with self.assertNumQueries(10):
+            modifier_compositions(self.user, [{'menus': [self.soir.pk], 'retirer': ids[:35]}])
+        self.assertEqual(Suppression.objects.filter(modele='liaisons').count(), 40)
+        self.assertEqual(len(self.composition(self.midi)), 35)
+        self.soir.refresh_from_db()
+        self.assertEqual(
+            [plat['nom'] for plat in self.soir.snapshot['categories'][0]['plats']], [f'Plat {i}' for i in range(35, 40)]
+        )
+
+    def test_plat_d_un_autre_utilisateur_refuse(self):
+        autre = creer_utilisateur('autre@emenu.tg', first_name='C', last_name='D')
+        plat = Plats.objects.create(nom='X', description='d', prix=1, categorie='plat', createur=autre)
+        with self.assertRaises(ValidationError):
+            modifier_compositions(self.user, [{'menus': [self.midi.pk], 'ajouter': [self.plats[0].pk, plat.pk]}])
+        self.assertFalse(MenuPlat.objects.exists())
+
+    def test_api_json(self):
+        self.client.force_login(self.user)
+        url = reverse('menus:menus-compositions')
+        corps = {'operations': [{'menus': [self.midi.pk], 'ajouter': [self.plats[1].pk]}]}
+        reponse = self.client.post(url, json.dumps(corps), content_type='application/json')
+        self.assertEqual(reponse.json()['ajoutes'], 1)
+        reponse = self.client.post(url, json.dumps({'operations': [{'menus': [0], 'ajouter': []}]}), content_type='application/json')
+        self.assertEqual(reponse.status_code, 400)
+
+
+class QrCodesMenusTests(StructureTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.menu = Menus.objects.create(nom='Midi', createur=self.user, structure=self.structure, status='actif')
+        self.menu.plats.add(Plats.objects.create(
+            nom='Fufu', description='d', prix=1000, categorie='plat', createur=self.user, structure=self.structure,
+        ))
+        self.menu.refresh_from_db()
+
+    def test_qr_genere_une_fois_par_version(self):
+        url = reverse('menus:menu-qr', args=[self.menu.pk, 'png'])
+        reponse = self.client.get(url)
+        self.assertEqual(reponse['Content-Type'], 'image/png')
+        self.assertTrue(reponse.content.startswith(b'\x89PNG'))
+        self.assertIsNotNone(cache.get(cle_qr(self.menu.pk, self.menu.version, 'png')))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).content, reponse.content)
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': reponse['ETag']}).status_code, 304)
+
+        svg = self.client.get(reverse('menus:menu-qr', args=[self.menu.pk, 'svg']))
+        self.assertIn(b'<svg', svg.content)
+        self.assertEqual(self.client.get(reverse('menus:menu-qr', args=[self.menu.pk, 'gif'])).status_code, 404)
+
+    def test_page_mobile(self):
+        reponse = self.client.get(reverse('menus:menu-mobile', args=[self.menu.pk]))
+        self.assertContains(reponse, 'Fufu')
+        self.assertIn('max-age=300', reponse['Cache-Control'])
+        self.assertTrue(reponse.has_header('ETag'))
+
+    def test_commande_de_pre_generation(self):
+        Menus.objects.create(nom='Brouillon', createur=self.user, structure=self.structure)
+        sortie = io.StringIO()
+        call_command('generate_menu_qrcodes', stdout=sortie)
+        self.assertIn('1 menu(s) actif(s) : 2 QR code(s)', sortie.getvalue())
+        self.assertIsNotNone(cache.get(cle_qr(self.menu.pk, self.menu.version, 'svg')))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST, MENU_PDF={'SYNCHRONE': True}, IMAGE_PROCESSING={'SYNCHRONE': True})
+class ExportPdfTests(StructureTestMixin, TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_TEST, ignore_errors=True)
+
+    def setUp(self):
+        super().setUp()
+        self.plat = Plats.objects.create(
+            nom='Fufu', description='d', prix=1000, categorie='plat', createur=self.user, structure=self.structure,
+            en_promotion=True, pourcentage_reduction=10, photo=image_jpeg(),
+        )
+        self.menu = Menus.objects.create(nom='Midi', createur=self.user, structure=self.structure)
+        self.menu.plats.add(self.plat)
+        self.url = reverse('menus:menu-pdf', args=[self.menu.pk])
+
+    def test_pdf_rendu_puis_reutilise_tant_que_le_menu_ne_change_pas(self):
+        reponse = self.client.get(self.url)
+        export = ExportPdf.objects.get(menu=self.menu)
+        self.assertRedirects(reponse, export.fichier.url, fetch_redirect_response=False)
+        with export.fichier.open('rb') as fichier:
+            self.assertTrue(fichier.read().startswith(b'%PDF'))
+
+        # Enregistrement sans changement de contenu : même version, même fichier
+        self.plat.save()
+        self.assertEqual(self.client.get(self.url)['Location'], export.fichier.url)
+
+        self.plat.prix = 1500
+        self.plat.save()
+        # L'ancien PDF est libéré après le commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(self.url)
+        nouvel_export = ExportPdf.objects.get(menu=self.menu)
+        self.assertGreater(nouvel_export.version, export.version)
+        self.assertNotEqual(nouvel_export.fichier.name, export.fichier.name)
+        self.assertFalse(default_storage.exists(export.fichier.name))
+
+    @override_settings(MENU_PDF={'SYNCHRONE': False})
+    def test_rendu_differe_page_d_attente(self):
+        with self.captureOnCommitCallbacks() as taches:
+            reponse = self.client.get(self.url)
+            self.client.get(self.url)
+        self.assertEqual(reponse.status_code, 202)
+        # Une seule tâche pour plusieurs demandes de la même version
+        self.assertEqual(len(taches), 1)
@@ -9,5 +9,10 @@ urlpatterns = [
     path('menus/nouveau/', views.menu_create, name='menus-create'),
     path('menus/<int:pk>/modifier/', views.menu_update, name='menus-update'),
     path('menus/<int:pk>/supprimer/', views.menu_delete, name='menus-delete'),
+    path('menus/compositions/', views.menus_compositions, name='menus-compositions'),
     path('<int:pk>/', views.menu_detail, name='menu-detail'),
+    path('<int:pk>/json/', views.menu_json, name='menu-json'),
+    path('<int:pk>/m/', views.menu_mobile, name='menu-mobile'),
+    path('<int:pk>/qr.<str:format_qr>', views.menu_qr, name='menu-qr'),
+    path('<int:pk>/pdf/', views.menu_pdf, name='menu-pdf'),
 ]
\ No newline at end of file
@@ -1,10 +1,23 @@
+import json
+
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import conditional_page, require_POST, require_safe
 
+from menus.composition import modifier_compositions
 from menus.forms import MenuForm
 from menus.models import Menus
+from menus.pdf import demander_pdf
+from menus.qrcodes import FORMATS, qr_menu
+from menus.snapshot import contexte_affichage, snapshot_du_menu
+from structures.cache import cache_page_structure
 
 User = get_user_model()
 
@@ -15,21 +28,72 @@ def menu_list(request):
     return render(request, 'menus/list.html', {'menus': menus})
 
 
+@cache_page_structure(lambda pk: Menus.objects.filter(pk=pk).values_list('structure_id', flat=True).first())
 def menu_detail(request, pk):
-    menu = get_object_or_404(Menus, pk=pk)  # Supprimez le filtre par createur
-    plats = menu.plats.all().order_by('categorie', 'nom')
-    
-    # Grouper les plats par catégorie
-    categories = {}
-    for plat in plats:
-        if plat.categorie not in categories:
-            categories[plat.categorie] = []
-        categories[plat.categorie].append(plat)
-    
-    return render(request, 'menus/menu_detail.html', {
-        'menu': menu,
-        'categories': categories,
-    })
+    # Tout vient du snapshot du menu : une seule ligne lue, aucun calcul par plat
+    menu = get_object_or_404(Menus.objects.only('snapshot', 'version'), pk=pk)
+    snapshot, _ = snapshot_du_menu(menu)
+    return render(request, 'menus/menu_detail.html', contexte_affichage(snapshot))
+
+
+@require_safe
+def menu_json(request, pk):
+    menu = get_object_or_404(Menus.objects.only('snapshot', 'version'), pk=pk)
+    snapshot, version = snapshot_du_menu(menu)
+    etag = f'"menu-{pk}-{version}"'
+    reponse = get_conditional_response(request, etag=etag) or JsonResponse({'version': version, **snapshot})
+    reponse['ETag'] = etag
+    # Les promotions s'activent à heure fixe : cache court côté client
+    reponse['Cache-Control'] = 'public, max-age=60'
+    return reponse
+
+
+@conditional_page
+@cache_control(public=True, max_age=300)
+@cache_page_structure(lambda pk: Menus.objects.filter(pk=pk).values_list('structure_id', flat=True).first())
+def menu_mobile(request, pk):
+    """Page minimale ouverte par le QR code d'une table : sans image, CSS ni script externes"""
+    menu = get_object_or_404(Menus.objects.only('snapshot', 'version'), pk=pk)
+    snapshot, _ = snapshot_du_menu(menu)
+    return render(request, 'menus/menu_mobile.html', contexte_affichage(snapshot))
+
+
+@require_safe
+def menu_qr(request, pk, format_qr):
+    if format_qr not in FORMATS:
+        raise Http404
+    version = Menus.objects.filter(pk=pk).values_list('version', flat=True).first()
+    if version is None:
+        raise Http404
+    etag = f'"menu-{pk}-qr-{version}-{format_qr}"'
+    reponse = get_conditional_response(request, etag=etag)
+    if reponse is None:
+        donnees, _ = qr_menu(pk, version, format_qr)
+        reponse = HttpResponse(donnees, content_type=FORMATS[format_qr][0])
+    reponse['ETag'] = etag
+    reponse['Cache-Control'] = 'public, max-age=86400'
+    return reponse
+
+
+@require_safe
+def menu_pdf(request, pk):
+    """PDF imprimable du menu : redirige vers le fichier s'il est à jour, sinon page d'attente"""
+    menu = get_object_or_404(Menus.objects.only('snapshot', 'version'), pk=pk)
+    _, version = snapshot_du_menu(menu)
+    export = demander_pdf(pk, version)
+    if export is not None:
+        # Nom adressé par contenu : le fichier est servi avec un cache immuable (medias.views)
+        return redirect(export.fichier.url)
+    reponse = render(request, 'menus/pdf_en_cours.html', {'menu_id': pk}, status=202)
+    reponse['Retry-After'] = '3'
+    reponse['Cache-Control'] = 'no-store'
+    return reponse
+
+
+def enregistrer_plats(user, menu, plats):
+    """Aligne les plats du menu sur la sélection du formulaire (seules les différences sont écrites)"""
+    if plats is not None:
+        modifier_compositions(user, [{'menus': [menu.pk], 'plats': [plat.pk for plat in plats]}])
 
 
 @login_required
@@ -45,13 +109,16 @@ def menu_create(request):
                 messages.error(request, "Vous devez d'abord créer votre structure avant de créer un menu.")
                 return redirect('structures:register-structure')
             menu.structure = user_structure
-            menu.save()
-            # Enregistrer les liaisons de plats si fournies
-            form_plats = form.cleaned_data.get('plats')
-            if form_plats is not None:
-                menu.plats.set(form_plats)
-            messages.success(request, 'Menu créé avec succès!')
-            return redirect('menus:menus-list')
+            try:
+                with transaction.atomic():
+                    menu.save()
+                    # Enregistrer les liaisons de plats si fournies
+                    enregistrer_plats(request.user, menu, form.cleaned_data.get('plats'))
+            except ValidationError as erreur:
+                form.add_error('plats', erreur)
+            else:
+                messages.success(request, 'Menu créé avec succès!')
+                return redirect('menus:menus-list')
     else:
         form = MenuForm(user=request.user)
 
@@ -66,13 +133,17 @@ def menu_update(request, pk):
     if request.method == 'POST':
         form = MenuForm(request.POST, instance=menu, user=request.user)
         if form.is_valid():
-            menu = form.save()  # Sauvegarde l'instance principale
-            # Mettre à jour les plats associés
-            form_plats = form.cleaned_data.get('plats')
-            if form_plats is not None:
-                menu.plats.set(form_plats)
-            messages.success(request, 'Le menu a été mis à jour avec succès.')
-            return redirect('menus:menus-list')
+            try:
+                with transaction.atomic():
+                    # Sauvegarde l'instance principale ; les plats passent par la différence ci-dessous
+                    menu = form.save(commit=False)
+                    menu.save()
+                    enregistrer_plats(request.user, menu, form.cleaned_data.get('plats'))
+            except ValidationError as erreur:
+                form.add_error('plats', erreur)
+            else:
+                messages.success(request, 'Le menu a été mis à jour avec succès.')
+                return redirect('menus:menus-list')
     else:
         form = MenuForm(instance=menu, user=request.user)
 
@@ -86,3 +157,23 @@ def menu_delete(request, pk):
         messages.success(request, 'Menu supprimé avec succès!')
         return redirect('menus:menus-list')
     return render(request, 'menus/confirm_delete.html', {'object': menu})
+
+
+@login_required
+@require_POST
+def menus_compositions(request):
+    """Ajout, retrait et réordonnancement en masse des plats de plusieurs menus (corps JSON)
+
+    {"operations": [{"menus": [1, 2], "ajouter": [5, 6]}, {"menus": [1], "ordre": [6, 5]}, ...]}
+    """
+    try:
+        operations = json.loads(request.body)['operations']
+        if not isinstance(operations, list):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'erreurs': ["Corps attendu : {\"operations\": [...]}"]}, status=400)
+    try:
+        resultat = modifier_compositions(request.user, operations)
+    except ValidationError as erreur:
+        return JsonResponse({'erreurs': erreur.messages}, status=400)
+    return JsonResponse(resultat)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Plats
+from .campagnes import annuler_campagne, appliquer_campagne
+from .models import CampagnePromotion, Plats
 
 @admin.register(Plats)
 class PlatsAdmin(admin.ModelAdmin):
@@ -22,3 +23,26 @@ class PlatsAdmin(admin.ModelAdmin):
             'fields': ('photo',)
         }),
     )
+
+
+@admin.register(CampagnePromotion)
+class CampagnePromotionAdmin(admin.ModelAdmin):
+    list_display = ('nom', 'structure', 'categorie', 'menu', 'debut', 'fin', 'date_application', 'date_annulation')
+    list_filter = ('categorie', 'structure')
+    search_fields = ('nom', 'structure__nom')
+    filter_horizontal = ('plats',)
+    actions = ['appliquer', 'annuler']
+
+    @admin.action(description="Appliquer les campagnes sélectionnées")
+    def appliquer(self, request, queryset):
+        resultats = [appliquer_campagne(campagne) for campagne in queryset]
+        self.message_user(
+            request,
+            f"{sum(nombre for nombre, _ in resultats)} plat(s) mis en promotion, "
+            f"{sum(ignores for _, ignores in resultats)} déjà en promotion laissé(s) tel(s) quel(s).",
+        )
+
+    @admin.action(description="Annuler les campagnes sélectionnées")
+    def annuler(self, request, queryset):
+        nombre = sum(annuler_campagne(campagne) for campagne in queryset)
+        self.message_user(request, f"Promotion retirée de {nombre} plat(s).")
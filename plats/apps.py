@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PlatsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'plats'
+
+    def ready(self):
+        # Diffusion des débuts et fins de promotion
+        from plats import signals  # noqa: F401
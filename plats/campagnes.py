@@ -0,0 +1,158 @@
+"""Campagnes de promotion : une remise posée ou retirée d'un coup sur un ensemble de plats.
+
+`appliquer_campagne` écrit la promotion de tous les plats visés par un seul UPDATE, le prix
+promotionnel et le pourcentage étant calculés en SQL à partir du prix de chaque plat ;
+`annuler_campagne` la retire de même. Le nombre de requêtes ne dépend pas du nombre de
+plats, seulement du nombre de menus dont le snapshot est à reconstruire.
+
+Une campagne ne remplace jamais une promotion qu'elle n'a pas posée : les plats déjà en
+promotion (promotion individuelle ou autre campagne) sont laissés tels quels et comptés à
+part, et l'annulation ne retire que ce que la campagne a posé.
+
+Les plats visés sont ensuite des plats en promotion comme les autres : le planificateur
+(plats.planificateur) bascule leur indicateur aux bornes de la fenêtre, et une promotion
+configurée plat par plat (promotion_form) détache le plat de la campagne.
+"""
+from datetime import datetime, time as dt_time
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Q, Value
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from menus.models import MenuPlat
+from menus.snapshot import reconstruire_snapshots
+from plats.evenements import publier_promotion
+from plats.models import Plats, combiner_date_heure
+from structures.models import Structures
+from structures.signals import invalider_apres_commit
+
+PRIX = DecimalField(max_digits=6, decimal_places=2)
+POURCENTAGE = DecimalField(max_digits=5, decimal_places=2)
+
+# Promotion retirée, comme toggle_promotion
+SANS_PROMOTION = {
+    'campagne': None,
+    'en_promotion': False,
+    'prix_promotionnel': None,
+    'pourcentage_reduction': None,
+    'date_debut_promotion': None,
+    'heure_debut_promotion': None,
+    'date_fin_promotion': None,
+    'heure_fin_promotion': None,
+    'description_promotion': '',
+    'debut_promotion': None,
+    'fin_promotion': None,
+    'promotion_active': False,
+}
+
+
+def plats_cibles(campagne):
+    """Plats de la structure visés par la campagne"""
+    qs = Plats.objects.filter(structure_id=campagne.structure_id)
+    if campagne.categorie:
+        qs = qs.filter(categorie=campagne.categorie)
+    elif campagne.menu_id:
+        qs = qs.filter(menus=campagne.menu_id)
+    else:
+        qs = qs.filter(campagnes_ciblees=campagne)
+    if campagne.prix_promotionnel is not None:
+        # Un plat déjà moins cher que le prix de la campagne n'est pas en promotion
+        qs = qs.filter(prix__gt=campagne.prix_promotionnel)
+    return qs
+
+
+def _remise(campagne):
+    """(prix promotionnel, pourcentage) de chaque plat, en expressions SQL"""
+    if campagne.prix_promotionnel is not None:
+        prix = Value(campagne.prix_promotionnel, output_field=PRIX)
+        return prix, Round((F('prix') - prix) * 100 / F('prix'), 2, output_field=POURCENTAGE)
+    facteur = (100 - campagne.pourcentage_reduction) / Decimal(100)
+    return (
+        Round(F('prix') * Value(facteur, output_field=POURCENTAGE), 2, output_field=PRIX),
+        Value(campagne.pourcentage_reduction, output_field=POURCENTAGE),
+    )
+
+
+def _fenetre(campagne):
+    """Champs date + heure de promotion des plats et fenêtre consolidée, comme Plats.save()"""
+    debut, fin = timezone.localtime(campagne.debut), timezone.localtime(campagne.fin)
+    champs = {
+        'date_debut_promotion': timezone.make_aware(datetime.combine(debut.date(), dt_time.min)),
+        'heure_debut_promotion': debut.strftime('%H:%M'),
+        'date_fin_promotion': timezone.make_aware(datetime.combine(fin.date(), dt_time.min)),
+        'heure_fin_promotion': fin.strftime('%H:%M'),
+    }
+    champs['debut_promotion'] = combiner_date_heure(debut.date(), champs['heure_debut_promotion'], dt_time.min)
+    champs['fin_promotion'] = combiner_date_heure(fin.date(), champs['heure_fin_promotion'], dt_time.max)
+    return champs
+
+
+def _etat(qs):
+    """(ids, ids visibles parmi les promotions actives)"""
+    lignes = list(qs.values_list('pk', 'disponibilite', 'promotion_active'))
+    return [pk for pk, _, _ in lignes], {pk for pk, disponible, active in lignes if disponible and active}
+
+
+def _propager(campagne, ids, visibles_avant, now):
+    """Snapshots des menus, cache des pages et événements après un UPDATE groupé"""
+    reconstruire_snapshots(
+        MenuPlat.objects.filter(plat_id__in=ids).values_list('menu_id', flat=True).distinct()
+    )
+    invalider_apres_commit(campagne.structure_id)
+    visibles = set(
+        Plats.objects.filter(pk__in=ids, disponibilite=True, promotion_active=True).values_list('pk', flat=True)
+    )
+    if visibles != visibles_avant:
+        ville = Structures.objects.filter(pk=campagne.structure_id).values_list('ville', flat=True).first()
+        for plat in Plats.objects.filter(pk__in=visibles ^ visibles_avant):
+            publier_promotion(plat, plat.pk in visibles, now, ville=ville)
+
+
+def appliquer_campagne(campagne, now=None):
+    """Met en promotion les plats visés ; retourne (nombre mis en promotion, nombre ignorés).
+
+    Les plats ignorés sont ceux déjà en promotion hors de cette campagne. Réappliquer met à
+    jour les plats de la campagne.
+    """
+    now = now or timezone.now()
+    fenetre = _fenetre(campagne)
+    prix_promotionnel, pourcentage = _remise(campagne)
+    with transaction.atomic():
+        visees = plats_cibles(campagne)
+        deja_en_promotion = Q(en_promotion=True) & ~Q(campagne=campagne)
+        ignores = visees.filter(deja_en_promotion).count()
+        cibles = visees.exclude(deja_en_promotion)
+        ids, visibles_avant = _etat(Plats.objects.filter(Q(pk__in=cibles) | Q(campagne=campagne)))
+        # Plats sortis de la cible depuis la dernière application
+        Plats.objects.filter(campagne=campagne).exclude(pk__in=cibles).update(
+            **SANS_PROMOTION, date_modification=now
+        )
+        nombre = cibles.update(
+            campagne=campagne,
+            en_promotion=True,
+            prix_promotionnel=prix_promotionnel,
+            pourcentage_reduction=pourcentage,
+            description_promotion=campagne.description or campagne.nom,
+            promotion_active=fenetre['debut_promotion'] <= now <= fenetre['fin_promotion'],
+            date_modification=now,
+            **fenetre,
+        )
+        campagne.date_application, campagne.date_annulation = now, None
+        campagne.save(update_fields=['date_application', 'date_annulation'])
+        _propager(campagne, ids, visibles_avant, now)
+    return nombre, ignores
+
+
+def annuler_campagne(campagne, now=None):
+    """Retire la promotion des plats de la campagne ; retourne leur nombre"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        membres = Plats.objects.filter(campagne=campagne)
+        ids, visibles_avant = _etat(membres)
+        nombre = membres.update(**SANS_PROMOTION, date_modification=now)
+        campagne.date_annulation = now
+        campagne.save(update_fields=['date_annulation'])
+        _propager(campagne, ids, visibles_avant, now)
+    return nombre
@@ -0,0 +1,190 @@
+"""Événements de début et de fin de promotion, diffusés en direct (Server-Sent Events).
+
+Chaque abonné (une connexion SSE servie par E_Menu.asgi) attend sur une file asyncio : une
+connexion inactive ne coûte ni thread ni requête en base. `publier_promotion` peut être
+appelé depuis n'importe quel thread (signaux, pools, commandes) ; les messages sont remis
+aux files dans la boucle de chaque abonné.
+
+Avec plusieurs processus, REDIS_URL active la diffusion par Redis (pub/sub) : la publication
+passe par Redis et chaque processus la redistribue à ses propres abonnés.
+
+Canaux : 'structure:<id>' et 'ville:<ville>'.
+
+Configuration (settings.PROMOTIONS_EVENEMENTS) :
+    REDIS_URL    diffusion entre processus (None : un seul processus)
+    BATTEMENT    secondes entre deux commentaires de maintien de la connexion
+    TAILLE_FILE  messages en attente par abonné (au-delà, un abonné trop lent en perd)
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from structures.models import Structures
+
+logger = logging.getLogger(__name__)
+
+CONFIGURATION_PAR_DEFAUT = {
+    'REDIS_URL': None,
+    'BATTEMENT': 15,
+    'TAILLE_FILE': 100,
+}
+CANAL_REDIS = 'e-menu:promotions'
+
+
+def configuration():
+    return {**CONFIGURATION_PAR_DEFAUT, **getattr(settings, 'PROMOTIONS_EVENEMENTS', {})}
+
+
+def promotion_visible(plat, now=None):
+    """Vrai si le plat figure parmi les promotions actives (voir PlatsQuerySet.promotions_actives)"""
+    return plat.disponibilite and plat.promotion_est_active(now)
+
+
+class Abonnement:
+    def __init__(self, canaux, taille_file):
+        self.canaux = frozenset(canaux)
+        self.boucle = asyncio.get_running_loop()
+        self.file = asyncio.Queue(maxsize=taille_file)
+
+    def transmettre(self, message):
+        """Remet le message dans la boucle de l'abonné (appelable depuis un autre thread)"""
+        try:
+            self.boucle.call_soon_threadsafe(self._deposer, message)
+        except RuntimeError:
+            # Boucle fermée : l'abonné est parti
+            pass
+
+    def _deposer(self, message):
+        try:
+            self.file.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning("Abonné trop lent, événement de promotion perdu (%s)", ', '.join(sorted(self.canaux)))
+
+    async def recevoir(self, timeout):
+        """Prochain message, None après `timeout` secondes sans message"""
+        try:
+            return await asyncio.wait_for(self.file.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Bus:
+    def __init__(self):
+        self._abonnes = defaultdict(set)
+        self._verrou = threading.Lock()
+        self._ecoute = None
+        self._client_redis = None
+
+    def abonner(self, canaux):
+        """Abonnement aux canaux ; à appeler depuis la boucle asyncio qui lira les messages"""
+        abonnement = Abonnement(canaux, configuration()['TAILLE_FILE'])
+        with self._verrou:
+            for canal in abonnement.canaux:
+                self._abonnes[canal].add(abonnement)
+        if configuration()['REDIS_URL']:
+            self._demarrer_ecoute()
+        return abonnement
+
+    def desabonner(self, abonnement):
+        with self._verrou:
+            for canal in abonnement.canaux:
+                self._abonnes[canal].discard(abonnement)
+                if not self._abonnes[canal]:
+                    del self._abonnes[canal]
+
+    def distribuer(self, canaux, message):
+        """Remet le message aux abonnés de ce processus (une seule fois par abonné)"""
+        with self._verrou:
+            destinataires = set().union(*(self._abonnes.get(canal, ()) for canal in canaux))
+        for abonnement in destinataires:
+            abonnement.transmettre(message)
+
+    def publier(self, canaux, message):
+        url = configuration()['REDIS_URL']
+        if url:
+            try:
+                if self._client_redis is None:
+                    import redis
+                    self._client_redis = redis.Redis.from_url(url)
+                self._client_redis.publish(CANAL_REDIS, json.dumps({'canaux': list(canaux), 'message': message}))
+                return
+            except Exception:
+                logger.exception("Publication Redis impossible, diffusion aux seuls abonnés locaux")
+        self.distribuer(canaux, message)
+
+    def _demarrer_ecoute(self):
+        # Une écoute Redis par processus, dans la boucle du serveur ASGI
+        with self._verrou:
+            if self._ecoute is None or self._ecoute.done():
+                self._ecoute = asyncio.get_running_loop().create_task(self._ecouter(configuration()['REDIS_URL']))
+
+    async def _ecouter(self, url):
+        import redis.asyncio as redis_async
+
+        while True:
+            try:
+                client = redis_async.from_url(url)
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(CANAL_REDIS)
+                    async for brut in pubsub.listen():
+                        if brut['type'] == 'message':
+                            donnees = json.loads(brut['data'])
+                            self.distribuer(donnees['canaux'], donnees['message'])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Écoute Redis des promotions interrompue, nouvelle tentative")
+                await asyncio.sleep(5)
+
+
+bus = Bus()
+
+
+def publier_promotion(plat, active, now=None, ville=None):
+    """Diffuse le début (active) ou la fin d'une promotion après le commit de la transaction.
+
+    `ville` (celle de la structure du plat) évite une requête quand l'appelant la connaît.
+    """
+    now = now or timezone.now()
+    if ville is None:
+        ville = Structures.objects.filter(pk=plat.structure_id).values_list('ville', flat=True).first()
+    message = {
+        'type': 'promotion_debut' if active else 'promotion_fin',
+        'plat': plat.pk,
+        'nom': plat.nom,
+        'structure': plat.structure_id,
+        'ville': ville,
+        'prix': str(Decimal(plat.prix).quantize(Decimal('0.01'))),
+        'prix_promotionnel': str(Decimal(plat.get_prix_promotionnel()).quantize(Decimal('0.01'))) if active else None,
+        'fin': plat.fin_promotion.isoformat() if active and plat.fin_promotion else None,
+        'date': now.isoformat(),
+    }
+    canaux = [f'structure:{plat.structure_id}'] if plat.structure_id else []
+    if ville:
+        canaux.append(f'ville:{ville}')
+    if canaux:
+        transaction.on_commit(lambda: bus.publier(canaux, message))
+
+
+async def flux_sse(canaux):
+    """Corps d'une réponse text/event-stream pour les canaux donnés"""
+    abonnement = bus.abonner(canaux)
+    battement = configuration()['BATTEMENT']
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            message = await abonnement.recevoir(battement)
+            if message is None:
+                # Commentaire : garde la connexion ouverte à travers les proxys
+                yield ': ping\n\n'
+            else:
+                yield f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+    finally:
+        bus.desabonner(abonnement)
@@ -5,7 +5,7 @@ from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.forms.widgets import SplitDateTimeWidget
 
-from plats.models import Plats
+from plats.models import CampagnePromotion, Plats
 
 User = get_user_model()
 
@@ -192,6 +192,9 @@ class PromotionForm(forms.ModelForm):
         if has_promo_info:
             plat.en_promotion = True
         
+        # Promotion propre au plat : il ne suit plus sa campagne
+        plat.campagne = None
+
         # Gestion des champs de promotion
         plat.prix_promotionnel = cleaned_data.get('prix_promotionnel')
         plat.pourcentage_reduction = cleaned_data.get('pourcentage_reduction')
@@ -357,3 +360,42 @@ class PlatForm(forms.ModelForm):
             self.save_m2m()  # Important pour les relations many-to-many si vous en avez
         
         return plat
+
+
+class CampagnePromotionForm(forms.ModelForm):
+    """Campagne de promotion d'une structure : cible, remise et fenêtre"""
+
+    class Meta:
+        model = CampagnePromotion
+        fields = [
+            'nom', 'description', 'categorie', 'menu', 'plats',
+            'pourcentage_reduction', 'prix_promotionnel', 'debut', 'fin',
+        ]
+        widgets = {
+            'nom': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Ex: -20% sur les desserts'}),
+            'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 2}),
+            'categorie': forms.Select(attrs={'class': 'form-control'}),
+            'menu': forms.Select(attrs={'class': 'form-control'}),
+            'plats': forms.SelectMultiple(attrs={'class': 'form-control', 'size': 6}),
+            'pourcentage_reduction': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
+            'prix_promotionnel': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
+            'debut': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}, format='%Y-%m-%dT%H:%M'),
+            'fin': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}, format='%Y-%m-%dT%H:%M'),
+        }
+
+    def __init__(self, *args, structure, createur, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Renseignés avant la validation : CampagnePromotion.clean() contrôle le menu
+        self.instance.structure = structure
+        self.instance.createur = createur
+        self.fields['menu'].queryset = structure.menus.order_by('nom')
+        self.fields['plats'].queryset = structure.plats.order_by('nom')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        cibles = [
+            bool(cleaned_data.get('categorie')), bool(cleaned_data.get('menu')), bool(cleaned_data.get('plats')),
+        ]
+        if sum(cibles) != 1:
+            raise ValidationError("Choisissez une cible : une catégorie, un menu ou une liste de plats.")
+        return cleaned_data
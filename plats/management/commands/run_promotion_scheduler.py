@@ -0,0 +1,36 @@
+import signal
+import threading
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from plats.planificateur import Planificateur, appliquer_bornes
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de longue durée : active et termine les promotions à l'heure exacte de leurs bornes "
+        "(indicateur promotion_active, cache des pages, événements en direct)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Appliquer les bornes échues puis s'arrêter (cron)")
+        parser.add_argument('--horizon', type=int, default=24, help="Bornes gardées en mémoire, en heures (défaut : 24)")
+        parser.add_argument('--reload', type=int, default=60, help="Relecture des promotions, en secondes (défaut : 60)")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            activees, desactivees = appliquer_bornes()
+            self.stdout.write(self.style.SUCCESS(
+                f"{len(activees)} promotion(s) activée(s), {len(desactivees)} terminée(s)."
+            ))
+            return
+
+        arret = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: arret.set())
+        self.stdout.write("Planificateur des promotions démarré (Ctrl+C pour arrêter).")
+        Planificateur(
+            horizon=timedelta(hours=options['horizon']), rechargement=timedelta(seconds=options['reload'])
+        ).executer(arret)
+        self.stdout.write(self.style.SUCCESS("Planificateur des promotions arrêté."))
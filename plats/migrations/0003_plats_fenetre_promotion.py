@@ -0,0 +1,62 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:03
+
+from datetime import datetime, time as dt_time
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def combiner_date_heure(date_value, heure, heure_defaut):
+    # Copie figée de plats.models.combiner_date_heure au moment de la migration
+    if not date_value:
+        return None
+    try:
+        heure_value = datetime.strptime(heure, '%H:%M').time() if heure else heure_defaut
+    except (ValueError, TypeError):
+        heure_value = heure_defaut
+    return timezone.make_aware(datetime.combine(date_value, heure_value))
+
+
+def remplir_fenetre_promotion(apps, schema_editor):
+    Plats = apps.get_model('plats', 'Plats')
+    qs = Plats.objects.filter(
+        models.Q(date_debut_promotion__isnull=False) | models.Q(date_fin_promotion__isnull=False)
+    ).only('date_debut_promotion', 'heure_debut_promotion', 'date_fin_promotion', 'heure_fin_promotion')
+    batch = []
+    for plat in qs.iterator(chunk_size=1000):
+        plat.debut_promotion = combiner_date_heure(plat.date_debut_promotion, plat.heure_debut_promotion, dt_time.min)
+        plat.fin_promotion = combiner_date_heure(plat.date_fin_promotion, plat.heure_fin_promotion, dt_time.max)
+        batch.append(plat)
+        if len(batch) >= 1000:
+            Plats.objects.bulk_update(batch, ['debut_promotion', 'fin_promotion'])
+            batch = []
+    if batch:
+        Plats.objects.bulk_update(batch, ['debut_promotion', 'fin_promotion'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plats', '0002_alter_plats_categorie_alter_plats_date_creation_and_more'),
+        ('structures', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plats',
+            name='debut_promotion',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='plats',
+            name='fin_promotion',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='plats',
+            index=models.Index(fields=['en_promotion', 'disponibilite', 'debut_promotion', 'fin_promotion'], name='plats_promo_fenetre_idx'),
+        ),
+        migrations.RunPython(remplir_fenetre_promotion, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:40
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def remplir_promotion_active(apps, schema_editor):
+    Plats = apps.get_model('plats', 'Plats')
+    now = timezone.now()
+    Plats.objects.filter(
+        models.Q(debut_promotion__isnull=True) | models.Q(debut_promotion__lte=now),
+        models.Q(fin_promotion__isnull=True) | models.Q(fin_promotion__gte=now),
+        en_promotion=True,
+    ).update(promotion_active=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plats', '0005_plats_etat_photo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plats',
+            name='promotion_active',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.RunPython(remplir_promotion_active, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menus', '0005_date_modification'),
+        ('plats', '0006_plats_promotion_active'),
+        ('structures', '0004_structures_date_modification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampagnePromotion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('categorie', models.CharField(blank=True, choices=[('entree', 'Entrée'), ('plat', 'Plat principal'), ('dessert', 'Dessert'), ('boisson', 'Boisson'), ('glass', 'Glass'), ('africain', 'Africain')], max_length=20)),
+                ('pourcentage_reduction', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='Pourcentage de réduction')),
+                ('prix_promotionnel', models.DecimalField(blank=True, decimal_places=2, help_text="Prix fixe de chaque plat visé (un plat déjà moins cher n'est pas visé)", max_digits=6, null=True, verbose_name='Prix promotionnel')),
+                ('debut', models.DateTimeField()),
+                ('fin', models.DateTimeField()),
+                ('date_creation', models.DateTimeField(default=django.utils.timezone.now)),
+                ('date_application', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('date_annulation', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('createur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Créateur')),
+                ('menu', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='campagnes', to='menus.menus')),
+                ('plats', models.ManyToManyField(blank=True, related_name='campagnes_ciblees', to='plats.plats')),
+                ('structure', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='campagnes', to='structures.structures')),
+            ],
+            options={
+                'verbose_name': 'Campagne de promotion',
+                'verbose_name_plural': 'Campagnes de promotion',
+                'ordering': ['-date_creation'],
+            },
+        ),
+        migrations.AddField(
+            model_name='plats',
+            name='campagne',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='plats_en_promotion', to='plats.campagnepromotion'),
+        ),
+    ]
@@ -1,12 +1,76 @@
 from django.conf import settings
 from django.db import models
+from django.db.models.functions import Greatest, Round
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from medias.models import EtatPhoto
 from structures.models import Structures
 from datetime import datetime, time as dt_time
 
 # Create your models here.
 
+def combiner_date_heure(date_value, heure, heure_defaut):
+    """Combine une date et une heure 'HH:MM' en datetime aware (None si pas de date)"""
+    if not date_value:
+        return None
+    try:
+        heure_value = datetime.strptime(heure, '%H:%M').time() if heure else heure_defaut
+    except (ValueError, TypeError):
+        heure_value = heure_defaut
+    return timezone.make_aware(datetime.combine(date_value, heure_value))
+
+
+def fenetre_promotion(now):
+    """Condition : plat en promotion dont la fenêtre contient `now`"""
+    return (
+        models.Q(en_promotion=True)
+        & (models.Q(debut_promotion__isnull=True) | models.Q(debut_promotion__lte=now))
+        & (models.Q(fin_promotion__isnull=True) | models.Q(fin_promotion__gte=now))
+    )
+
+
+class PlatsQuerySet(models.QuerySet):
+    def dans_fenetre_promotion(self, now):
+        """Plats en promotion dont la fenêtre contient `now`"""
+        return self.filter(fenetre_promotion(now))
+
+    def avec_prix_effectif(self, now=None):
+        """Annote `prix_effectif`, calculé en SQL comme get_prix_promotionnel si la promotion est active.
+
+        Sans `now`, lit l'indicateur `promotion_active` ; avec `now`, évalue les fenêtres.
+        """
+        active = models.Q(en_promotion=True, promotion_active=True) if now is None else fenetre_promotion(now)
+        prix = models.DecimalField(max_digits=6, decimal_places=2)
+        return self.annotate(prix_effectif=models.Case(
+            models.When(active & models.Q(prix_promotionnel__gt=0), then=models.F('prix_promotionnel')),
+            models.When(
+                active & models.Q(pourcentage_reduction__gt=0),
+                then=Greatest(
+                    Round(models.F('prix') * (100 - models.F('pourcentage_reduction')) / 100, 2, output_field=prix),
+                    models.Value(0, output_field=prix),
+                ),
+            ),
+            default=models.F('prix'),
+            output_field=prix,
+        ))
+
+    def promotions_actives(self, now=None, limit=None):
+        """Plats disponibles en promotion active, les plus récents d'abord.
+
+        Sans `now`, lit l'indicateur `promotion_active` tenu à jour par le planificateur
+        (plats.planificateur) ; avec `now`, évalue les fenêtres à cet instant.
+        """
+        qs = self.filter(disponibilite=True)
+        if now is None:
+            qs = qs.filter(promotion_active=True)
+        else:
+            qs = qs.dans_fenetre_promotion(now)
+        qs = qs.order_by('-date_modification', '-date_creation')
+        if limit is not None:
+            qs = qs[:limit]
+        return qs
+
+
 class Plats(models.Model):
     CATEGORIES = (
         ('entree', 'Entrée'),
@@ -23,12 +87,13 @@ class Plats(models.Model):
         ('difficile', 'Difficile'),
     )
 
-    nom = models.CharField(max_length=100)
+    nom = models.CharField(max_length=100, db_index=True)
     description = models.TextField()
     prix = models.DecimalField(max_digits=6, decimal_places=2)
-    categorie = models.CharField(max_length=20, choices=CATEGORIES)
-    disponibilite = models.BooleanField(default=True)
+    categorie = models.CharField(max_length=20, choices=CATEGORIES, db_index=True)
+    disponibilite = models.BooleanField(default=True, db_index=True)
     photo = models.ImageField(upload_to='plats/', null=True, blank=True)
+    etat_photo = models.CharField(max_length=12, choices=EtatPhoto.choices, default=EtatPhoto.AUCUN, blank=True, editable=False)
     createur = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="Créateur")
     structure = models.ForeignKey(Structures, on_delete=models.CASCADE, related_name='plats', null=True, blank=True)
     
@@ -40,25 +105,47 @@ class Plats(models.Model):
     portion = models.CharField(max_length=50, blank=True, help_text="Taille de la portion")
     difficulte = models.CharField(max_length=20, choices=DIFFICULTE_CHOICES, default='moyen')
     temps_cuisson = models.IntegerField(blank=True, null=True, help_text="Temps de cuisson en minutes")
-    date_creation = models.DateTimeField(default=timezone.now)
-    date_modification = models.DateTimeField(auto_now=True)
-    note_moyenne = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
+    date_creation = models.DateTimeField(default=timezone.now, db_index=True)
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
+    note_moyenne = models.DecimalField(max_digits=3, decimal_places=2, default=0.00, db_index=True)
     nombre_avis = models.IntegerField(default=0)
+    somme_notes = models.PositiveIntegerField(default=0, editable=False)
     
     # Champs pour les promotions
-    en_promotion = models.BooleanField(default=False, verbose_name="En promotion")
+    en_promotion = models.BooleanField(default=False, verbose_name="En promotion", db_index=True)
     prix_promotionnel = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True, verbose_name="Prix promotionnel")
-    date_debut_promotion = models.DateTimeField(null=True, blank=True)
+    date_debut_promotion = models.DateTimeField(null=True, blank=True, db_index=True)
     heure_debut_promotion = models.CharField(max_length=100, blank=True, null=True)
     heure_fin_promotion = models.CharField(max_length=100, blank=True, null=True)
-    date_fin_promotion = models.DateTimeField(null=True, blank=True)
+    date_fin_promotion = models.DateTimeField(null=True, blank=True, db_index=True)
     pourcentage_reduction = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True, verbose_name="Pourcentage de réduction")
     description_promotion = models.TextField(blank=True, verbose_name="Description de la promotion")
+    # Fenêtre de promotion consolidée (date + heure), calculée à l'enregistrement
+    debut_promotion = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
+    fin_promotion = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
+    # Fenêtre contenant l'instant présent : calculé à l'enregistrement, puis basculé aux bornes
+    # de la fenêtre par le planificateur (commande run_promotion_scheduler)
+    promotion_active = models.BooleanField(default=False, editable=False, db_index=True)
+    # Campagne ayant posé la promotion (plats.campagnes) ; remis à vide par une promotion individuelle
+    campagne = models.ForeignKey(
+        'CampagnePromotion', on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+        related_name='plats_en_promotion',
+    )
+
+    objects = PlatsQuerySet.as_manager()
 
     class Meta:
         ordering = ['nom']
         verbose_name = "Plat"
         verbose_name_plural = "Plats"
+        indexes = [
+            models.Index(fields=['categorie', 'disponibilite'], name='plats_plats_categor_dad162_idx'),
+            models.Index(fields=['en_promotion', 'disponibilite'], name='plats_plats_en_prom_357fc5_idx'),
+            models.Index(fields=['createur', 'structure'], name='plats_plats_createu_b6467f_idx'),
+            models.Index(fields=['date_creation', 'date_modification'], name='plats_plats_date_cr_9a79b0_idx'),
+            models.Index(fields=['en_promotion', 'disponibilite', 'debut_promotion', 'fin_promotion'],
+                         name='plats_promo_fenetre_idx'),
+        ]
 
     def __str__(self):
         return self.nom
@@ -96,6 +183,23 @@ class Plats(models.Model):
         
         return super().clean()
 
+    def calculer_fenetre_promotion(self):
+        """Met à jour debut_promotion/fin_promotion à partir des champs date + heure"""
+        self.debut_promotion = combiner_date_heure(
+            self.date_debut_promotion, self.heure_debut_promotion, dt_time.min
+        )
+        self.fin_promotion = combiner_date_heure(
+            self.date_fin_promotion, self.heure_fin_promotion, dt_time.max
+        )
+
+    def save(self, *args, **kwargs):
+        self.calculer_fenetre_promotion()
+        self.promotion_active = self.promotion_dans_fenetre(timezone.now())
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'debut_promotion', 'fin_promotion', 'promotion_active'}
+        super().save(*args, **kwargs)
+
     def get_prix_affichage(self):
         """Retourne le prix formaté pour l'affichage"""
         if self.est_en_promotion():
@@ -123,49 +227,21 @@ class Plats(models.Model):
         """Vérifie si le plat est configuré pour être en promotion"""
         return self.en_promotion
     
-    def promotion_est_active(self):
-        """Vérifie si la promotion est actuellement active selon les dates"""
+    def promotion_est_active(self, now=None):
+        """Promotion active maintenant (indicateur enregistré) ou à l'instant `now` (fenêtre évaluée)"""
+        if now is None:
+            return self.en_promotion and self.promotion_active
+        return self.promotion_dans_fenetre(now)
+
+    def promotion_dans_fenetre(self, now):
         if not self.en_promotion:
             return False
-        
-        # Si aucune date n'est définie, la promotion est toujours active
-        if not self.date_debut_promotion and not self.date_fin_promotion:
-            return True
-        
-        now = timezone.now()
-        
-        try:
-            # Gestion de la date/heure de début
-            debut_promo = None
-            if self.date_debut_promotion:
-                heure_debut = (datetime.strptime(self.heure_debut_promotion, '%H:%M').time() 
-                            if self.heure_debut_promotion else dt_time.min)
-                debut_promo = timezone.make_aware(
-                    datetime.combine(self.date_debut_promotion, heure_debut)
-                )
-            
-            # Gestion de la date/heure de fin
-            fin_promo = None
-            if self.date_fin_promotion:
-                heure_fin = (datetime.strptime(self.heure_fin_promotion, '%H:%M').time()
-                            if self.heure_fin_promotion else dt_time.max)
-                fin_promo = timezone.make_aware(
-                    datetime.combine(self.date_fin_promotion, heure_fin)
-                )
-            
-            # Vérification de la période de promotion
-            if debut_promo and fin_promo:
-                return debut_promo <= now <= fin_promo
-            elif debut_promo:
-                return now >= debut_promo
-            elif fin_promo:
-                return now <= fin_promo
-            return True
-                
-        except (ValueError, TypeError, AttributeError):
-            # En cas d'erreur (format d'heure invalide, etc.)
-            return True  # Si erreur, on considère que la promotion est active
-    
+        if self.debut_promotion and now < self.debut_promotion:
+            return False
+        if self.fin_promotion and now > self.fin_promotion:
+            return False
+        return True
+
     def get_prix_promotionnel(self):
         """Retourne le prix promotionnel calculé"""
         if not self.en_promotion:
@@ -198,11 +274,88 @@ class Plats(models.Model):
     
     def get_jours_restants_promotion(self):
         """Calcule le nombre de jours restants pour la promotion"""
-        if not self.promotion_est_active() or not self.date_fin_promotion:
+        if not self.promotion_est_active() or not self.fin_promotion:
             return 0
         
         now = timezone.now()
-        if self.date_fin_promotion > now:
-            delta = self.date_fin_promotion - now
+        if self.fin_promotion > now:
+            delta = self.fin_promotion - now
             return delta.days
         return 0
+
+
+class CampagnePromotion(models.Model):
+    """Promotion appliquée d'un coup aux plats d'une structure (voir plats.campagnes).
+
+    Cible : une catégorie, un menu ou une liste de plats ; remise : un pourcentage ou un
+    prix fixe, sur la fenêtre [debut, fin].
+    """
+    structure = models.ForeignKey(Structures, on_delete=models.CASCADE, related_name='campagnes')
+    createur = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="Créateur")
+    nom = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+
+    categorie = models.CharField(max_length=20, choices=Plats.CATEGORIES, blank=True)
+    menu = models.ForeignKey('menus.Menus', on_delete=models.CASCADE, null=True, blank=True, related_name='campagnes')
+    plats = models.ManyToManyField(Plats, blank=True, related_name='campagnes_ciblees')
+
+    pourcentage_reduction = models.DecimalField(
+        max_digits=5, decimal_places=2, blank=True, null=True, verbose_name="Pourcentage de réduction"
+    )
+    prix_promotionnel = models.DecimalField(
+        max_digits=6, decimal_places=2, blank=True, null=True, verbose_name="Prix promotionnel",
+        help_text="Prix fixe de chaque plat visé (un plat déjà moins cher n'est pas visé)",
+    )
+    debut = models.DateTimeField()
+    fin = models.DateTimeField()
+
+    date_creation = models.DateTimeField(default=timezone.now)
+    # Renseignées par plats.campagnes.appliquer_campagne / annuler_campagne
+    date_application = models.DateTimeField(null=True, blank=True, editable=False)
+    date_annulation = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        ordering = ['-date_creation']
+        verbose_name = "Campagne de promotion"
+        verbose_name_plural = "Campagnes de promotion"
+
+    def __str__(self):
+        return self.nom
+
+    def clean(self):
+        if bool(self.categorie) + bool(self.menu_id) > 1:
+            raise ValidationError("Une campagne vise une catégorie, un menu ou une liste de plats, pas plusieurs.")
+        if self.menu_id and self.structure_id and self.menu.structure_id != self.structure_id:
+            raise ValidationError("Le menu doit appartenir à la structure de la campagne.")
+        if (self.pourcentage_reduction is None) == (self.prix_promotionnel is None):
+            raise ValidationError("Indiquez soit un pourcentage de réduction, soit un prix promotionnel.")
+        if self.pourcentage_reduction is not None and not 0 < self.pourcentage_reduction < 100:
+            raise ValidationError("Le pourcentage de réduction doit être compris entre 0 et 100.")
+        if self.prix_promotionnel is not None and self.prix_promotionnel <= 0:
+            raise ValidationError("Le prix promotionnel doit être positif.")
+        if self.debut and self.fin and self.fin <= self.debut:
+            raise ValidationError("La fin de la campagne doit être postérieure à son début.")
+        return super().clean()
+
+    def save(self, *args, **kwargs):
+        # Les plats stockent leurs heures de promotion au format HH:MM
+        if self.debut:
+            self.debut = self.debut.replace(second=0, microsecond=0)
+        if self.fin:
+            self.fin = self.fin.replace(second=0, microsecond=0)
+        super().save(*args, **kwargs)
+
+    def est_appliquee(self):
+        return self.date_application is not None and self.date_annulation is None
+
+    def get_cible_display(self):
+        if self.categorie:
+            return dict(Plats.CATEGORIES)[self.categorie]
+        if self.menu_id:
+            return f"Menu {self.menu}"
+        return "Plats choisis"
+
+    def get_remise_display(self):
+        if self.prix_promotionnel is not None:
+            return f"{self.prix_promotionnel} FCFA"
+        return f"-{float(self.pourcentage_reduction):g} %"
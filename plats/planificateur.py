@@ -0,0 +1,138 @@
+"""Planificateur des promotions : bascule `promotion_active` aux bornes des fenêtres.
+
+`Plats.save()` calcule l'indicateur à l'enregistrement ; ensuite seul le temps le fait
+changer. Le planificateur (commande run_promotion_scheduler) garde dans un tas binaire
+(heapq) les prochains débuts et fins de promotion et dort jusqu'au plus proche. À chaque
+borne atteinte, `appliquer_bornes` met à jour en quelques UPDATE tous les plats concernés :
+
+    début atteint   promotion_active = True
+    fin dépassée    en_promotion = promotion_active = False (la promotion est terminée)
+
+puis reconstruit les snapshots des menus touchés, invalide le cache des pages des
+structures et diffuse les événements de promotion (plats.evenements). Les pages n'ont plus
+qu'à lire l'indicateur.
+"""
+import heapq
+import logging
+from datetime import timedelta
+
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from menus.models import MenuPlat
+from menus.snapshot import reconstruire_snapshots
+from plats.evenements import publier_promotion
+from plats.models import Plats
+from structures.models import Structures
+from structures.signals import invalider_apres_commit
+
+logger = logging.getLogger(__name__)
+
+# La promotion reste active jusqu'à fin_promotion incluse
+APRES_FIN = timedelta(microseconds=1)
+
+
+def appliquer_bornes(now=None):
+    """Matérialise les débuts et fins de promotion atteints à `now` ; retourne les ids (activés, désactivés)"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        a_activer = list(
+            Plats.objects.select_for_update().dans_fenetre_promotion(now)
+            .filter(promotion_active=False).values_list('pk', flat=True)
+        )
+        expires = dict(
+            Plats.objects.select_for_update().filter(en_promotion=True, fin_promotion__lt=now)
+            .values_list('pk', 'promotion_active')
+        )
+        # Indicateur levé hors fenêtre (début reporté, promotion retirée par update()...)
+        a_retirer = list(
+            Plats.objects.select_for_update().filter(promotion_active=True)
+            .exclude(pk__in=Plats.objects.dans_fenetre_promotion(now)).exclude(pk__in=list(expires))
+            .values_list('pk', flat=True)
+        )
+        if a_activer:
+            Plats.objects.filter(pk__in=a_activer).update(promotion_active=True, date_modification=now)
+        if expires:
+            Plats.objects.filter(pk__in=list(expires)).update(
+                en_promotion=False, promotion_active=False, date_modification=now
+            )
+            # en_promotion figure dans le snapshot des menus
+            reconstruire_snapshots(
+                MenuPlat.objects.filter(plat_id__in=list(expires)).values_list('menu_id', flat=True).distinct()
+            )
+        if a_retirer:
+            Plats.objects.filter(pk__in=a_retirer).update(promotion_active=False, date_modification=now)
+
+        # Une promotion expirée sans avoir été active n'a pas de fin à annoncer
+        desactives = [pk for pk, active in expires.items() if active] + a_retirer
+        plats = list(Plats.objects.filter(pk__in=a_activer + desactives).select_related('structure'))
+        # Plats sans structure : pages des structures de leur créateur, lues en une requête
+        createurs = {plat.createur_id for plat in plats if plat.structure_id is None}
+        structures = {plat.structure_id for plat in plats if plat.structure_id is not None}
+        if createurs:
+            structures.update(Structures.objects.filter(user_id__in=createurs).values_list('id', flat=True))
+        for plat in plats:
+            # Sans structure, aucun canal où diffuser
+            if plat.disponibilite and plat.structure_id is not None:
+                publier_promotion(plat, plat.pk in a_activer, now, ville=plat.structure.ville)
+        invalider_apres_commit(*structures)
+    return a_activer, desactives
+
+
+def prochaines_bornes(depuis, jusqua):
+    """[(instant, plat_id)] des débuts et fins de promotion compris dans ]depuis, jusqua]"""
+    plats = Plats.objects.filter(en_promotion=True).filter(
+        Q(debut_promotion__gt=depuis, debut_promotion__lte=jusqua)
+        | Q(fin_promotion__gte=depuis - APRES_FIN, fin_promotion__lte=jusqua)
+    ).values_list('pk', 'debut_promotion', 'fin_promotion')
+    bornes = []
+    for pk, debut, fin in plats:
+        for instant in (debut, fin + APRES_FIN if fin else None):
+            if instant is not None and depuis < instant <= jusqua:
+                bornes.append((instant, pk))
+    return bornes
+
+
+class Planificateur:
+    """Boucle du worker : dort jusqu'à la prochaine borne ou au prochain rechargement"""
+
+    def __init__(self, horizon=timedelta(hours=24), rechargement=timedelta(minutes=1)):
+        self.horizon = horizon
+        self.rechargement = rechargement
+        self.tas = []
+        self._connues = set()
+
+    def charger(self, now):
+        # Relu périodiquement : prend en compte les promotions créées ou modifiées entre-temps
+        for borne in prochaines_bornes(now, now + self.horizon):
+            if borne not in self._connues:
+                self._connues.add(borne)
+                heapq.heappush(self.tas, borne)
+
+    def executer(self, arret):
+        """Jusqu'à ce que l'événement `arret` soit levé"""
+        prochain_chargement = timezone.now()
+        while not arret.is_set():
+            now = timezone.now()
+            echues = False
+            while self.tas and self.tas[0][0] <= now:
+                self._connues.discard(heapq.heappop(self.tas))
+                echues = True
+            if echues or now >= prochain_chargement:
+                # Toutes les bornes échues sont traitées par un seul passage ; le passage
+                # périodique rattrape aussi les modifications faites par update()
+                close_old_connections()
+                try:
+                    activees, desactivees = appliquer_bornes(now)
+                    if activees or desactivees:
+                        logger.info("Promotions : %s activée(s), %s terminée(s)", len(activees), len(desactivees))
+                    if now >= prochain_chargement:
+                        self.charger(now)
+                except Exception:
+                    logger.exception("Échec de l'application des bornes de promotion")
+                if now >= prochain_chargement:
+                    prochain_chargement = now + self.rechargement
+                continue
+            reveil = min(prochain_chargement, self.tas[0][0]) if self.tas else prochain_chargement
+            arret.wait((reveil - now).total_seconds())
@@ -0,0 +1,55 @@
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from plats.evenements import promotion_visible, publier_promotion
+from plats.models import Plats
+
+# Champs saisis dont dépend la promotion (la fenêtre et l'indicateur en sont déduits par save())
+CHAMPS_PROMOTION = {
+    'en_promotion', 'disponibilite',
+    'date_debut_promotion', 'heure_debut_promotion', 'date_fin_promotion', 'heure_fin_promotion',
+}
+# Champs lus par promotion_visible
+CHAMPS_VISIBILITE = ('en_promotion', 'disponibilite', 'promotion_active')
+
+
+@receiver(post_init, sender=Plats)
+def charger_promotion(sender, instance, **kwargs):
+    # Visibilité au chargement : pas de relecture en base au moment du save()
+    if all(champ in instance.__dict__ for champ in CHAMPS_VISIBILITE):
+        instance._promotion_chargee = promotion_visible(instance)
+    else:
+        instance._promotion_chargee = None
+
+
+@receiver(pre_save, sender=Plats)
+def memoriser_promotion(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._promotion_avant = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not CHAMPS_PROMOTION.intersection(update_fields):
+        return
+    if getattr(instance, '_promotion_chargee', None) is not None:
+        instance._promotion_avant = instance._promotion_chargee
+        return
+    # Chargement partiel : état enregistré relu
+    avant = Plats.objects.filter(pk=instance.pk).only(*CHAMPS_VISIBILITE).first()
+    instance._promotion_avant = avant is not None and promotion_visible(avant)
+
+
+@receiver(post_save, sender=Plats)
+def diffuser_promotion(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    avant = False if created else getattr(instance, '_promotion_avant', None)
+    if avant is None:
+        return
+    active = instance._promotion_chargee = promotion_visible(instance)
+    if active != avant:
+        publier_promotion(instance, active)
+
+
+@receiver(post_delete, sender=Plats)
+def diffuser_fin_promotion(sender, instance, **kwargs):
+    if promotion_visible(instance):
+        publier_promotion(instance, False)
@@ -0,0 +1,296 @@
+import asyncio
+import json
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from menus.models import Menus
+from plats.campagnes import annuler_campagne, appliquer_campagne
+from plats.evenements import bus
+from plats.models import CampagnePromotion, Plats
+from plats.planificateur import Planificateur, appliquer_bornes
+from structures.testing import StructureTestMixin, creer_utilisateur
+
+
+class EvenementsPromotionTests(StructureTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.plat = Plats.objects.create(
+            nom='Fufu', description='d', prix=1000, categorie='plat', createur=self.user, structure=self.structure,
+        )
+
+    def publications(self, modification):
+        with mock.patch.object(bus, 'publier') as publier:
+            with self.captureOnCommitCallbacks(execute=True):
+                modification()
+        return [appel.args for appel in publier.call_args_list]
+
+    def test_debut_et_fin_de_promotion_publies_une_fois(self):
+        def activer():
+            self.plat.en_promotion = True
+            self.plat.pourcentage_reduction = 20
+            self.plat.save()
+
+        (canaux, message), = self.publications(activer)
+        self.assertEqual(canaux, [f'structure:{self.structure.pk}', 'ville:Lomé'])
+        self.assertEqual((message['type'], message['prix_promotionnel']), ('promotion_debut', '800.00'))
+
+        # Promotion déjà active : rien à diffuser
+        self.assertEqual(self.publications(lambda: self.plat.save(update_fields=['nom'])), [])
+        self.assertEqual(self.publications(self.plat.save), [])
+
+        def programmer():
+            self.plat.date_debut_promotion = timezone.now() + timedelta(days=1)
+            self.plat.save()
+
+        (_, message), = self.publications(programmer)
+        self.assertEqual(message['type'], 'promotion_fin')
+
+    def test_etat_precedent_lu_au_chargement(self):
+        plat = Plats.objects.get(pk=self.plat.pk)
+        with CaptureQueriesContext(connection) as sans_relecture:
+            plat.save()
+        # Chargement partiel : l'état enregistré est relu avant le save()
+        plat = Plats.objects.defer('promotion_active').get(pk=self.plat.pk)
+        with CaptureQueriesContext(connection) as avec_relecture:
+            plat.save()
+        self.assertEqual(len(avec_relecture), len(sans_relecture) + 1)
+
+        plat = Plats.objects.get(pk=self.plat.pk)
+        plat.en_promotion, plat.pourcentage_reduction = True, Decimal('20')
+        (_, message), = self.publications(plat.save)
+        self.assertEqual(message['type'], 'promotion_debut')
+
+
+class PlanificateurPromotionsTests(StructureTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        demain = timezone.now() + timedelta(days=1)
+        self.plat = Plats.objects.create(
+            nom='Fufu', description='d', prix=1000, categorie='plat', createur=self.user, structure=self.structure,
+            en_promotion=True, prix_promotionnel=800,
+            date_debut_promotion=demain, date_fin_promotion=demain + timedelta(days=1),
+        )
+
+    def test_bornes_materialisees_et_diffusees(self):
+        self.assertFalse(self.plat.promotion_active)
+        self.assertFalse(Plats.objects.promotions_actives().exists())
+
+        with mock.patch.object(bus, 'publier') as publier, self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(appliquer_bornes(self.plat.debut_promotion), ([self.plat.pk], []))
+            # Rien de plus au second passage
+            self.assertEqual(appliquer_bornes(self.plat.debut_promotion), ([], []))
+        self.assertEqual([appel.args[1]['type'] for appel in publier.call_args_list], ['promotion_debut'])
+        self.assertEqual(list(Plats.objects.promotions_actives()), [self.plat])
+
+        with mock.patch.object(bus, 'publier') as publier, self.captureOnCommitCallbacks(execute=True):
+            appliquer_bornes(self.plat.fin_promotion + timedelta(seconds=1))
+        self.assertEqual(publier.call_args.args[1]['type'], 'promotion_fin')
+        self.plat.refresh_from_db()
+        self.assertEqual((self.plat.en_promotion, self.plat.promotion_active), (False, False))
+
+    def test_requetes_constantes_par_borne(self):
+        demain = self.plat.debut_promotion
+        Plats.objects.bulk_create([
+            Plats(nom=f'Plat {i}', description='d', prix=1000, categorie='plat', createur=self.user,
+                  structure=self.structure, en_promotion=True, prix_promotionnel=800,
+                  debut_promotion=demain, fin_promotion=self.plat.fin_promotion)
+            for i in range(20)
+        ])
+        with mock.patch.object(bus, 'publier') as publier, self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(7):
+                activees, _ = appliquer_bornes(demain)
+        self.assertEqual((len(activees), publier.call_count), (21, 21))
+
+    def test_tas_des_prochaines_bornes(self):
+        planificateur = Planificateur(horizon=timedelta(days=3))
+        planificateur.charger(timezone.now())
+        planificateur.charger(timezone.now())
+        self.assertEqual(len(planificateur.tas), 2)
+        self.assertEqual(planificateur.tas[0], (self.plat.debut_promotion, self.plat.pk))
+
+
+class FenetrePromotionTests(TestCase):
+    def setUp(self):
+        self.user = creer_utilisateur()
+        self.jour = timezone.make_aware(datetime(2026, 10, 20))
+
+    def creer_plat(self, nom, **champs):
+        return Plats.objects.create(
+            nom=nom, description='d', prix=1000, categorie='plat', createur=self.user, en_promotion=True, **champs
+        )
+
+    def test_fenetre_calculee_depuis_date_et_heure(self):
+        plat = self.creer_plat(
+            'Fufu', date_debut_promotion=self.jour, heure_debut_promotion='08:30',
+            date_fin_promotion=self.jour + timedelta(days=2), heure_fin_promotion='hier',
+        )
+        self.assertEqual(plat.debut_promotion, self.jour.replace(hour=8, minute=30))
+        # Heure illisible ou absente : toute la journée
+        self.assertEqual(plat.fin_promotion, timezone.make_aware(datetime.combine(date(2026, 10, 22), dt_time.max)))
+        plat.date_debut_promotion = None
+        plat.save()
+        self.assertIsNone(Plats.objects.get(pk=plat.pk).debut_promotion)
+
+    def test_promotions_actives_a_un_instant(self):
+        en_cours = self.creer_plat('En cours', date_debut_promotion=self.jour, date_fin_promotion=self.jour)
+        sans_borne = self.creer_plat('Sans borne')
+        self.creer_plat('Terminée', date_fin_promotion=self.jour - timedelta(days=1))
+        self.creer_plat('A venir', date_debut_promotion=self.jour, heure_debut_promotion='18:00')
+        self.creer_plat('Indisponible', disponibilite=False)
+        Plats.objects.create(nom='Hors promotion', description='d', prix=1000, categorie='plat', createur=self.user)
+        Plats.objects.filter(pk=sans_borne.pk).update(date_modification=self.jour + timedelta(days=1))
+
+        midi = self.jour.replace(hour=12)
+        self.assertEqual(list(Plats.objects.promotions_actives(now=midi)), [sans_borne, en_cours])
+        self.assertEqual(list(Plats.objects.promotions_actives(now=midi, limit=1)), [sans_borne])
+        self.assertEqual(
+            set(Plats.objects.promotions_actives(now=self.jour.replace(hour=19)).values_list('nom', flat=True)),
+            {'En cours', 'Sans borne', 'A venir'},
+        )
+
+
+class CampagnesPromotionTests(StructureTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.menu = Menus.objects.create(nom='Midi', status='actif', createur=self.user, structure=self.structure)
+        self.now = timezone.now()
+
+    def desserts(self, nombre):
+        plats = Plats.objects.bulk_create([
+            Plats(nom=f'Dessert {i}', description='d', prix=1000 + i, categorie='dessert',
+                  createur=self.user, structure=self.structure)
+            for i in range(nombre)
+        ])
+        self.menu.plats.add(*plats)
+        return plats
+
+    def campagne(self, **champs):
+        champs = {'categorie': 'dessert', **champs}
+        return CampagnePromotion.objects.create(
+            structure=self.structure, createur=self.user, nom='-20% desserts',
+            debut=self.now - timedelta(hours=1), fin=self.now + timedelta(days=2), **champs,
+        )
+
+    def test_nombre_de_requetes_independant_du_nombre_de_plats(self):
+        Plats.objects.create(
+            nom='Fufu', description='d', prix=1000, categorie='plat', createur=self.user, structure=self.structure,
+        )
+        comptes = []
+        for nombre in (3, 30):
+            Plats.objects.filter(categorie='dessert').delete()
+            self.desserts(nombre)
+            campagne = self.campagne(pourcentage_reduction=20)
+            with mock.patch.object(bus, 'publier') as publier, self.captureOnCommitCallbacks(execute=True):
+                with CaptureQueriesContext(connection) as requetes:
+                    self.assertEqual(appliquer_campagne(campagne, self.now), (nombre, 0))
+            comptes.append(len(requetes))
+            self.assertEqual(publier.call_count, nombre)
+        self.assertEqual(comptes[0], comptes[1])
+
+        dessert = Plats.objects.get(nom='Dessert 1')
+        self.assertEqual((dessert.prix_promotionnel, dessert.pourcentage_reduction), (Decimal('800.80'), 20))
+        self.assertTrue(dessert.promotion_active)
+        self.assertEqual(Plats.objects.promotions_actives().count(), 30)
+        self.assertEqual(Plats.objects.avec_prix_effectif().get(pk=dessert.pk).prix_effectif, Decimal('800.80'))
+        self.assertFalse(Plats.objects.get(nom='Fufu').en_promotion)
+
+        # Le plat réenregistré garde la fenêtre posée par la campagne
+        dessert.save()
+        self.assertEqual(dessert.debut_promotion, campagne.debut)
+        self.assertTrue(dessert.promotion_active)
+
+    def test_prix_fixe_sur_une_liste_puis_annulation(self):
+        plats = self.desserts(3)
+        Plats.objects.filter(pk=plats[2].pk).update(prix=1250)
+        campagne = self.campagne(categorie='', prix_promotionnel=1000)
+        campagne.plats.set([plats[0], plats[2]])
+        # Le plat à 1000 FCFA n'est pas moins cher en promotion : il n'est pas visé
+        self.assertEqual(appliquer_campagne(campagne, self.now), (1, 0))
+        plat = Plats.objects.get(pk=plats[2].pk)
+        self.assertEqual((plat.prix_promotionnel, plat.pourcentage_reduction), (1000, 20))
+        snapshot = Menus.objects.get(pk=self.menu.pk).snapshot
+        self.assertEqual(
+            [plat['promotion'] and plat['promotion']['prix'] for plat in snapshot['categories'][0]['plats']],
+            [None, None, '1000.00'],
+        )
+
+        with mock.patch.object(bus, 'publier'):
+            self.assertEqual(annuler_campagne(campagne, self.now), 1)
+        plat.refresh_from_db()
+        self.assertEqual((plat.en_promotion, plat.promotion_active, plat.campagne_id), (False, False, None))
+        self.assertIsNotNone(CampagnePromotion.objects.get(pk=campagne.pk).date_annulation)
+
+    def test_promotion_individuelle_conservee(self):
+        individuel, suivant = self.desserts(2)
+        individuel.en_promotion, individuel.prix_promotionnel = True, 500
+        individuel.save()
+        campagne = self.campagne(pourcentage_reduction=20)
+        with mock.patch.object(bus, 'publier'):
+            self.assertEqual(appliquer_campagne(campagne, self.now), (1, 1))
+            annuler_campagne(campagne, self.now)
+        individuel.refresh_from_db()
+        self.assertEqual((individuel.en_promotion, individuel.prix_promotionnel, individuel.campagne_id), (True, 500, None))
+        self.assertFalse(Plats.objects.get(pk=suivant.pk).en_promotion)
+
+    def test_vues_du_proprietaire(self):
+        self.desserts(2)
+        self.client.force_login(self.user)
+        url = reverse('plats:campagne-list')
+        debut = timezone.localtime(self.now).strftime('%Y-%m-%dT%H:%M')
+        fin = timezone.localtime(self.now + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M')
+        response = self.client.post(url, {
+            'nom': 'Week-end', 'categorie': 'dessert', 'pourcentage_reduction': '10', 'debut': debut, 'fin': fin,
+        })
+        self.assertRedirects(response, url)
+        self.assertEqual(Plats.objects.filter(en_promotion=True).count(), 2)
+        self.assertContains(self.client.get(url), '-10 %')
+
+        # Deux cibles à la fois : refusé
+        self.client.post(url, {
+            'nom': 'Double', 'categorie': 'dessert', 'menu': self.menu.pk, 'pourcentage_reduction': '10',
+            'debut': debut, 'fin': fin,
+        })
+        self.assertEqual(CampagnePromotion.objects.count(), 1)
+
+        campagne = CampagnePromotion.objects.get()
+        self.client.post(reverse('plats:campagne-annuler', args=[campagne.pk]))
+        self.assertFalse(Plats.objects.filter(en_promotion=True).exists())
+
+    def test_proprietaire_sans_structure_redirige(self):
+        self.client.force_login(creer_utilisateur('nouveau@emenu.tg'))
+        response = self.client.get(reverse('plats:campagne-list'))
+        self.assertRedirects(response, reverse('structures:register_structure'), fetch_redirect_response=False)
+
+
+class FluxPromotionsTests(SimpleTestCase):
+    async def test_flux_sse_recoit_les_evenements_de_ses_canaux(self):
+        response = await self.async_client.get(reverse('plats:promotions-flux'), {'structure': 7})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        flux = response.streaming_content
+        self.assertEqual(await anext(flux), b'retry: 5000\n\n')
+
+        bus.distribuer(['structure:8'], {'type': 'promotion_debut', 'plat': 1})
+        bus.distribuer(['structure:7', 'ville:Lomé'], {'type': 'promotion_fin', 'plat': 2})
+        evenement = (await anext(flux)).decode()
+        self.assertTrue(evenement.startswith('event: promotion_fin\n'))
+        self.assertEqual(json.loads(evenement.split('data: ')[1])['plat'], 2)
+
+        # Déconnexion du client : le serveur annule la lecture en cours
+        lecture = asyncio.ensure_future(anext(flux))
+        await asyncio.sleep(0)
+        lecture.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await lecture
+        self.assertNotIn('structure:7', bus._abonnes)
+
+    def test_parametres_requis_et_repli_wsgi(self):
+        self.assertEqual(self.client.get(reverse('plats:promotions-flux')).status_code, 400)
+        response = self.client.get(reverse('plats:promotions-flux'), {'ville': 'Lomé'})
+        self.assertEqual(b''.join(response.streaming_content), b'retry: 30000\n\n')
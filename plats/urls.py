@@ -13,6 +13,10 @@ urlpatterns = [
     
     # Promotions
     path('promotions/', views.plats_promotion, name='plats-promotion'),
+    path('promotions/flux/', views.flux_promotions, name='promotions-flux'),
     path('plats/<int:pk>/toggle-promotion/', views.toggle_promotion, name='toggle-promotion'),
     path('plats/<int:pk>/promotion/', views.promotion_form, name='promotion-form'),
+    path('promotions/campagnes/', views.campagne_list, name='campagne-list'),
+    path('promotions/campagnes/<int:pk>/appliquer/', views.campagne_appliquer, name='campagne-appliquer'),
+    path('promotions/campagnes/<int:pk>/annuler/', views.campagne_annuler, name='campagne-annuler'),
 ]
\ No newline at end of file
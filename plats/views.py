@@ -2,46 +2,39 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Count, Q
+from django.views.decorators.http import require_GET, require_POST
 
-from plats.forms import PlatForm, PromotionForm
-from avis.models import Avis
-from plats.models import Plats
+from plats.campagnes import annuler_campagne, appliquer_campagne
+from plats.evenements import flux_sse
+from plats.forms import CampagnePromotionForm, PlatForm, PromotionForm
+from plats.models import CampagnePromotion, Plats
+from recherche.index import filtrer as filtrer_recherche
+from structures.cache import cache_page_structure
 
 User = get_user_model()
 
 # Vue publique pour voir les détails d'un plat
+@cache_page_structure(lambda pk: Plats.objects.filter(pk=pk).values_list('structure_id', flat=True).first())
 def plat_detail(request, pk):
     plat = get_object_or_404(Plats, pk=pk)
     
-    # Trouver le premier menu contenant ce plat (pour le bouton de retour)
-    menu_parent = None
-    # Infos avis utilisateur
-    user_has_avis = False
-    user_avis = None
-    if request.user.is_authenticated:
-        menu_parent = plat.menus.first()
-        user_avis = Avis.objects.filter(user=request.user, plat=plat).first()
-        user_has_avis = user_avis is not None
+    # Page commune à tous les visiteurs (mise en cache) : menu de retour et avis de
+    # l'utilisateur sont chargés par accounts:contexte-utilisateur
     context = {
         'plat': plat,
-        'menu_parent': menu_parent,
         'temps_total': plat.get_temps_total(),
         'prix_affichage': plat.get_prix_affichage(),
-        'user_has_avis': user_has_avis,
-        'user_avis': user_avis,
     }
     return render(request, 'plats/detail.html', context)
 
 # Vue publique pour voir les plats en promotion
 def plats_promotion(request):
-    # Récupérer tous les plats configurés pour être en promotion
-    plats = Plats.objects.filter(disponibilite=True).select_related('createur', 'structure')
-    plats_promotion = [plat for plat in plats if plat.est_en_promotion()]
-    
-    # Trier par date de modification/création
-    plats_promotion.sort(key=lambda x: (x.date_modification or x.date_creation), reverse=True)
+    # Plats dont la promotion est active, triés par date de modification/création
+    plats_promotion = Plats.objects.promotions_actives().select_related('createur', 'structure')
     
     # Catégories uniques pour les filtres
     unique_codes = list(Plats.objects.values_list('categorie', flat=True).distinct())
@@ -55,15 +48,41 @@ def plats_promotion(request):
     }
     return render(request, 'plats/promotion.html', context)
 
+
+@require_GET
+async def flux_promotions(request):
+    """Flux SSE des débuts et fins de promotion d'une structure (?structure=) et/ou d'une ville (?ville=)"""
+    canaux = []
+    structure = request.GET.get('structure', '')
+    if structure.isdigit():
+        canaux.append(f'structure:{int(structure)}')
+    ville = request.GET.get('ville', '').strip()
+    if ville:
+        canaux.append(f'ville:{ville}')
+    if not canaux:
+        return HttpResponseBadRequest("Paramètre « structure » ou « ville » requis.")
+
+    if isinstance(request, ASGIRequest):
+        corps = flux_sse(canaux)
+    else:
+        # Sous WSGI (runserver, gunicorn) un flux ouvert bloquerait un worker : le client
+        # est invité à se reconnecter plus tard, ce qui revient à un sondage espacé
+        corps = iter(['retry: 30000\n\n'])
+    response = StreamingHttpResponse(corps, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx : ne pas retenir les événements dans son tampon
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 # CRUD pour Plat
 @login_required(login_url='accounts:login')
 def plat_list(request):
     plats = Plats.objects.filter(createur=request.user).order_by('-date_modification', '-date_creation')
     
-    # Recherche par nom
+    # Recherche plein texte (nom, description, ingrédients, allergènes), classée par pertinence en base
     search_query = request.GET.get('search', '')
     if search_query:
-        plats = plats.filter(nom__icontains=search_query)
+        plats = filtrer_recherche(plats, search_query, 'plat').order_by('-pertinence', '-date_modification')
     
     # Filtres avancés
     categorie_filter = request.GET.get('categorie', '')
@@ -202,10 +221,65 @@ def toggle_promotion(request, pk):
         plat.date_fin_promotion = None
         plat.heure_fin_promotion = None
         plat.description_promotion = ''
+        plat.campagne = None
         plat.save()
         messages.success(request, 'Promotion désactivée avec succès!')
     else:
         # Si la promotion n'est pas active, on redirige vers le formulaire de configuration
         return redirect('plats:promotion-form', pk=pk)
     
-    return redirect('plats:plat-list')
\ No newline at end of file
+    return redirect('plats:plat-list')
+
+
+# Campagnes : une promotion posée d'un coup sur une catégorie, un menu ou une liste de plats
+def _message_application(request, campagne, nombre, ignores):
+    messages.success(request, f'Campagne « {campagne.nom} » appliquée à {nombre} plat(s).')
+    if ignores:
+        messages.warning(
+            request, f'{ignores} plat(s) déjà en promotion ont gardé leur promotion : '
+                     f'retirez-la pour les inclure dans la campagne.'
+        )
+
+
+@login_required
+def campagne_list(request):
+    structure = request.user.structure.first()
+    if not structure:
+        messages.error(request, "Vous devez d'abord créer votre structure avant de lancer une campagne.")
+        return redirect('structures:register_structure')
+
+    if request.method == 'POST':
+        form = CampagnePromotionForm(request.POST, structure=structure, createur=request.user)
+        if form.is_valid():
+            campagne = form.save()
+            _message_application(request, campagne, *appliquer_campagne(campagne))
+            return redirect('plats:campagne-list')
+        for field, errors in form.errors.items():
+            for error in errors:
+                messages.error(request, f"{form.fields[field].label if field in form.fields else field}: {error}")
+    else:
+        form = CampagnePromotionForm(structure=structure, createur=request.user)
+
+    campagnes = structure.campagnes.select_related('menu').annotate(nombre_plats=Count('plats_en_promotion'))
+    return render(request, 'plats/campagnes.html', {
+        'form': form,
+        'campagnes': campagnes,
+        'title': 'Campagnes de promotion',
+    })
+
+
+@login_required
+@require_POST
+def campagne_appliquer(request, pk):
+    campagne = get_object_or_404(CampagnePromotion, pk=pk, structure__user=request.user)
+    _message_application(request, campagne, *appliquer_campagne(campagne))
+    return redirect('plats:campagne-list')
+
+
+@login_required
+@require_POST
+def campagne_annuler(request, pk):
+    campagne = get_object_or_404(CampagnePromotion, pk=pk, structure__user=request.user)
+    nombre = annuler_campagne(campagne)
+    messages.success(request, f'Campagne « {campagne.nom} » annulée : promotion retirée de {nombre} plat(s).')
+    return redirect('plats:campagne-list')
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class RechercheConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'recherche'
+
+    def ready(self):
+        # Mise à jour de l'index à chaque enregistrement/suppression
+        from recherche import signals  # noqa: F401
@@ -0,0 +1,119 @@
+"""Maintenance de l'index de recherche et requêtes classées par pertinence.
+
+Le texte est normalisé en Python (minuscules + suppression des accents, l'équivalent de
+`unaccent(lower(...))`) avant d'être stocké et avant d'être recherché : "entree" trouve
+"Entrée" et "lome" trouve "Lomé" quel que soit le moteur.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, OuterRef, Subquery, Value
+from django.db.models.expressions import RawSQL
+
+from recherche.models import DocumentRecherche
+
+LIMITE_RESULTATS = 200
+
+_MOTS = re.compile(r'\w+')
+
+
+def normaliser(texte):
+    """Minuscules et suppression des accents"""
+    decompose = unicodedata.normalize('NFKD', texte or '')
+    return ''.join(c for c in decompose if not unicodedata.combining(c)).lower()
+
+
+def texte_plat(plat):
+    return ' '.join([plat.nom, plat.description or '', plat.ingredients or '', plat.allergenes or ''])
+
+
+def texte_structure(structure):
+    return ' '.join([structure.nom, structure.ville or ''])
+
+
+def indexer(type_objet, objet_id, texte):
+    DocumentRecherche.objects.update_or_create(
+        type_objet=type_objet,
+        objet_id=objet_id,
+        defaults={'texte': normaliser(texte)},
+    )
+
+
+def desindexer(type_objet, objet_id):
+    DocumentRecherche.objects.filter(type_objet=type_objet, objet_id=objet_id).delete()
+
+
+class BackendPostgres:
+    """Recherche tsvector ('simple') complétée par la similarité trigramme pour les fautes de frappe"""
+
+    correspondance = "(to_tsvector('simple', texte) @@ websearch_to_tsquery('simple', %s) OR texte %% %s)"
+    rang = "ts_rank(to_tsvector('simple', texte), websearch_to_tsquery('simple', %s)) + similarity(texte, %s)"
+
+    def documents(self, requete, type_objet):
+        return DocumentRecherche.objects.filter(
+            RawSQL(self.correspondance, [requete, requete], output_field=BooleanField()),
+            type_objet=type_objet,
+        ).annotate(rang=RawSQL(self.rang, [requete, requete], output_field=FloatField()))
+
+
+class BackendSQLite:
+    """Recherche FTS5 (table externe synchronisée par triggers), classée par bm25"""
+
+    correspondance = "id IN (SELECT rowid FROM recherche_fts WHERE recherche_fts MATCH %s)"
+    # bm25 est d'autant plus petit que le document est pertinent
+    rang = "(SELECT -bm25(recherche_fts) FROM recherche_fts WHERE recherche_fts MATCH %s AND rowid = id)"
+
+    def documents(self, requete, type_objet):
+        # Chaque mot devient un préfixe : "poul fri" trouve "poulet frites"
+        expression = ' '.join(f'"{mot}"*' for mot in _MOTS.findall(requete))
+        if not expression:
+            return DocumentRecherche.objects.none()
+        return DocumentRecherche.objects.filter(
+            RawSQL(self.correspondance, [expression], output_field=BooleanField()),
+            type_objet=type_objet,
+        ).annotate(rang=RawSQL(self.rang, [expression], output_field=FloatField()))
+
+
+class BackendContient:
+    """Autres moteurs (MySQL...) : chaque mot contenu dans le texte normalisé, sans classement"""
+
+    def documents(self, requete, type_objet):
+        qs = DocumentRecherche.objects.filter(type_objet=type_objet)
+        for mot in _MOTS.findall(requete):
+            qs = qs.filter(texte__contains=mot)
+        return qs.annotate(rang=Value(0.0, output_field=FloatField()))
+
+
+def get_backend():
+    if connection.vendor == 'postgresql':
+        return BackendPostgres()
+    if connection.vendor == 'sqlite':
+        return BackendSQLite()
+    return BackendContient()
+
+
+def documents(requete, type_objet):
+    """Documents correspondant à la requête, annotés de leur `rang` (plus grand : plus pertinent)"""
+    requete = normaliser(requete).strip()
+    if not requete:
+        return DocumentRecherche.objects.none()
+    return get_backend().documents(requete, type_objet)
+
+
+def rechercher(requete, type_objet, limite=LIMITE_RESULTATS):
+    """Ids des objets correspondant à la requête, du plus pertinent au moins pertinent"""
+    ids = documents(requete, type_objet).order_by('-rang', '-objet_id').values_list('objet_id', flat=True)
+    return list(ids if limite is None else ids[:limite])
+
+
+def filtrer(qs, requete, type_objet):
+    """Restreint le queryset aux objets correspondant à la requête, annotés de leur `pertinence`.
+
+    La correspondance reste dans la requête (sous-requête) : ni liste d'ids en mémoire ni
+    limite sur le nombre de résultats ; les filtres du queryset s'appliquent en base.
+    """
+    correspondants = documents(requete, type_objet)
+    return qs.filter(pk__in=correspondants.values('objet_id')).annotate(
+        pertinence=Subquery(correspondants.filter(objet_id=OuterRef('pk')).values('rang')[:1])
+    )
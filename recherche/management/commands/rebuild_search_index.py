@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from plats.models import Plats
+from recherche import index
+from recherche.models import DocumentRecherche
+from structures.models import Structures
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche (initialisation ; il est ensuite tenu à jour par signaux)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        sources = (
+            ('plat', Plats.objects.only('id', 'nom', 'description', 'ingredients', 'allergenes'), index.texte_plat),
+            ('structure', Structures.objects.only('id', 'nom', 'ville'), index.texte_structure),
+        )
+        with transaction.atomic():
+            DocumentRecherche.objects.all().delete()
+            for type_objet, qs, texte in sources:
+                batch = []
+                total = 0
+                for objet in qs.order_by().iterator(chunk_size=batch_size):
+                    batch.append(DocumentRecherche(
+                        type_objet=type_objet, objet_id=objet.pk, texte=index.normaliser(texte(objet))
+                    ))
+                    if len(batch) >= batch_size:
+                        DocumentRecherche.objects.bulk_create(batch)
+                        total += len(batch)
+                        batch = []
+                if batch:
+                    DocumentRecherche.objects.bulk_create(batch)
+                    total += len(batch)
+                self.stdout.write(f"{type_objet}: {total} document(s) indexé(s)")
+        self.stdout.write(self.style.SUCCESS("Index de recherche reconstruit."))
@@ -0,0 +1,112 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+from recherche.index import normaliser
+
+POSTGRES_CREATION = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX recherche_doc_tsv_idx ON recherche_documentrecherche USING GIN (to_tsvector('simple', texte))",
+    "CREATE INDEX recherche_doc_trgm_idx ON recherche_documentrecherche USING GIN (texte gin_trgm_ops)",
+]
+POSTGRES_SUPPRESSION = [
+    "DROP INDEX IF EXISTS recherche_doc_trgm_idx",
+    "DROP INDEX IF EXISTS recherche_doc_tsv_idx",
+]
+
+# Table FTS5 à contenu externe, synchronisée par triggers sur recherche_documentrecherche
+SQLITE_CREATION = [
+    """CREATE VIRTUAL TABLE recherche_fts USING fts5(
+        texte, content='recherche_documentrecherche', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER recherche_fts_ai AFTER INSERT ON recherche_documentrecherche BEGIN
+        INSERT INTO recherche_fts(rowid, texte) VALUES (new.id, new.texte);
+    END""",
+    """CREATE TRIGGER recherche_fts_ad AFTER DELETE ON recherche_documentrecherche BEGIN
+        INSERT INTO recherche_fts(recherche_fts, rowid, texte) VALUES ('delete', old.id, old.texte);
+    END""",
+    """CREATE TRIGGER recherche_fts_au AFTER UPDATE ON recherche_documentrecherche BEGIN
+        INSERT INTO recherche_fts(recherche_fts, rowid, texte) VALUES ('delete', old.id, old.texte);
+        INSERT INTO recherche_fts(rowid, texte) VALUES (new.id, new.texte);
+    END""",
+]
+SQLITE_SUPPRESSION = [
+    "DROP TRIGGER IF EXISTS recherche_fts_au",
+    "DROP TRIGGER IF EXISTS recherche_fts_ad",
+    "DROP TRIGGER IF EXISTS recherche_fts_ai",
+    "DROP TABLE IF EXISTS recherche_fts",
+]
+
+
+def _executer(schema_editor, requetes):
+    for requete in requetes:
+        schema_editor.execute(requete)
+
+
+def creer_index_moteur(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _executer(schema_editor, POSTGRES_CREATION)
+    elif vendor == 'sqlite':
+        _executer(schema_editor, SQLITE_CREATION)
+
+
+def supprimer_index_moteur(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _executer(schema_editor, POSTGRES_SUPPRESSION)
+    elif vendor == 'sqlite':
+        _executer(schema_editor, SQLITE_SUPPRESSION)
+
+
+def indexer_existants(apps, schema_editor):
+    DocumentRecherche = apps.get_model('recherche', 'DocumentRecherche')
+    Plats = apps.get_model('plats', 'Plats')
+    Structures = apps.get_model('structures', 'Structures')
+
+    def documents():
+        for plat in Plats.objects.only('nom', 'description', 'ingredients', 'allergenes').iterator():
+            texte = ' '.join([plat.nom, plat.description or '', plat.ingredients or '', plat.allergenes or ''])
+            yield DocumentRecherche(type_objet='plat', objet_id=plat.pk, texte=normaliser(texte))
+        for structure in Structures.objects.only('nom', 'ville').iterator():
+            texte = ' '.join([structure.nom, structure.ville or ''])
+            yield DocumentRecherche(type_objet='structure', objet_id=structure.pk, texte=normaliser(texte))
+
+    batch = []
+    for document in documents():
+        batch.append(document)
+        if len(batch) >= 1000:
+            DocumentRecherche.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        DocumentRecherche.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('plats', '0003_plats_fenetre_promotion'),
+        ('structures', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentRecherche',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_objet', models.CharField(choices=[('plat', 'Plat'), ('structure', 'Structure')], max_length=20)),
+                ('objet_id', models.BigIntegerField()),
+                ('texte', models.TextField()),
+            ],
+            options={
+                'verbose_name': 'Document de recherche',
+                'verbose_name_plural': 'Documents de recherche',
+                'constraints': [models.UniqueConstraint(fields=('type_objet', 'objet_id'), name='unique_document_recherche')],
+            },
+        ),
+        migrations.RunPython(creer_index_moteur, supprimer_index_moteur),
+        migrations.RunPython(indexer_existants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+from django.db import models
+
+
+# Create your models here.
+class DocumentRecherche(models.Model):
+    """Texte normalisé (minuscules, sans accents) indexé pour la recherche plein texte.
+
+    Les index spécifiques au moteur (tsvector/trigrammes sous PostgreSQL, table FTS5
+    sous SQLite) sont créés par la migration initiale sur la colonne `texte`.
+    """
+    TYPE_CHOICES = (
+        ('plat', 'Plat'),
+        ('structure', 'Structure'),
+    )
+
+    type_objet = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    objet_id = models.BigIntegerField()
+    texte = models.TextField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['type_objet', 'objet_id'], name='unique_document_recherche'),
+        ]
+        verbose_name = "Document de recherche"
+        verbose_name_plural = "Documents de recherche"
+
+    def __str__(self):
+        return f"{self.type_objet} #{self.objet_id}"
@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from plats.models import Plats
+from recherche import index
+from structures.models import Structures
+
+
+@receiver(post_save, sender=Plats)
+def indexer_plat(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index.indexer('plat', instance.pk, index.texte_plat(instance))
+
+
+@receiver(post_delete, sender=Plats)
+def desindexer_plat(sender, instance, **kwargs):
+    index.desindexer('plat', instance.pk)
+
+
+@receiver(post_save, sender=Structures)
+def indexer_structure(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index.indexer('structure', instance.pk, index.texte_structure(instance))
+
+
+@receiver(post_delete, sender=Structures)
+def desindexer_structure(sender, instance, **kwargs):
+    index.desindexer('structure', instance.pk)
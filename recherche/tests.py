@@ -0,0 +1,70 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+from plats.models import Plats
+from recherche import index
+from recherche.index import rechercher
+from structures import catalogue
+from structures.testing import creer_structure, creer_utilisateur
+
+
+class RechercheTests(TestCase):
+    def setUp(self):
+        self.user = creer_utilisateur()
+
+    def creer_plat(self, **kwargs):
+        valeurs = {'nom': 'Plat', 'description': 'Description', 'prix': 1000, 'categorie': 'plat', 'createur': self.user}
+        valeurs.update(kwargs)
+        return Plats.objects.create(**valeurs)
+
+    def test_recherche_insensible_aux_accents(self):
+        plat = self.creer_plat(nom='Entrée du chef')
+        structure = creer_structure(self.user)
+        self.assertEqual(rechercher('entree', 'plat'), [plat.pk])
+        self.assertEqual(rechercher('LOME', 'structure'), [structure.pk])
+
+    def test_index_mis_a_jour_a_l_enregistrement_et_a_la_suppression(self):
+        plat = self.creer_plat(nom='Poulet', ingredients='Arachide')
+        self.assertEqual(rechercher('arachide', 'plat'), [plat.pk])
+        plat.ingredients = 'Piment'
+        plat.save()
+        self.assertEqual(rechercher('arachide', 'plat'), [])
+        self.assertEqual(rechercher('piment', 'plat'), [plat.pk])
+        plat.delete()
+        self.assertEqual(rechercher('piment', 'plat'), [])
+
+    def test_resultats_classes_par_pertinence(self):
+        peu = self.creer_plat(nom='Riz', description='Riz au gras et attieke')
+        beaucoup = self.creer_plat(nom='Attieke', description='Attieke poisson, attieke frais')
+        self.assertEqual(rechercher('attieke', 'plat'), [beaucoup.pk, peu.pk])
+
+    def test_filtre_en_sous_requete_sans_limite_et_pages_par_pertinence(self):
+        peu = self.creer_plat(nom='Riz', description='Riz au gras et attieke')
+        beaucoup = self.creer_plat(nom='Attieke', description='Attieke poisson, attieke frais')
+        moyen = self.creer_plat(nom='Attieke simple', description='Poisson')
+        self.creer_plat(nom='Fufu')
+        criteres = catalogue.criteres_plats({'q': 'attieke'})
+        with mock.patch('recherche.index.LIMITE_RESULTATS', 1):
+            self.assertEqual(catalogue.filtrer_plats(criteres).count(), 3)
+        self.assertEqual(catalogue.facettes_plats(criteres)['categorie'], {'plat': 3})
+
+        page, suivant = catalogue.paginer(catalogue.filtrer_plats(criteres), taille=2)
+        suite, fin = catalogue.paginer(catalogue.filtrer_plats(criteres), suivant, taille=2)
+        self.assertEqual([plat.pk for plat in page + suite], rechercher('attieke', 'plat'))
+        self.assertEqual(page[0], beaucoup)
+        self.assertEqual(set(page + suite), {peu, beaucoup, moyen})
+        self.assertIsNone(fin)
+
+        # Liste du propriétaire : mêmes plats, classés en base
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('plats:plat-list'), {'search': 'attieke'})
+        self.assertEqual(list(response.context['plats']), page + suite)
+
+    def test_repli_contient_pour_les_autres_moteurs(self):
+        plat = self.creer_plat(nom='Poulet braisé', description='Frites')
+        self.creer_plat(nom='Poulet DG')
+        with mock.patch.object(index.connection, 'vendor', 'mysql'):
+            self.assertIsInstance(index.get_backend(), index.BackendContient)
+            self.assertEqual(rechercher('POULET braise', 'plat'), [plat.pk])
@@ -0,0 +1,86 @@
+// ===== PARTIES PROPRES À L'UTILISATEUR DES PAGES EN CACHE - E-Menu Togo =====
+//
+// Les pages publiques (structure, plat, avis) sont rendues pour un visiteur anonyme et
+// mises en cache pour tous. Ce script récupère le contexte de l'utilisateur
+// (accounts:contexte-utilisateur) puis :
+//   - remplace les liens de navigation des visiteurs par ceux de l'utilisateur ;
+//   - affiche les éléments [data-si="condition ..."] dont toutes les conditions sont vraies ;
+//   - renseigne les liens [data-lien="nom"] et les jetons CSRF des formulaires.
+//
+// Conditions : connecte, anonyme, proprietaire, non-proprietaire, avec-avis, sans-avis,
+// menu-parent, sans-menu-parent, autre-avis (élément portant data-avis différent de l'avis de l'utilisateur).
+
+(function() {
+    const script = document.currentScript;
+    const url = script && script.dataset.contexteUrl;
+    if (!url) {
+        return;
+    }
+
+    function conditions(contexte) {
+        const liens = contexte.liens || {};
+        return {
+            'connecte': contexte.connecte,
+            'anonyme': !contexte.connecte,
+            'proprietaire': !!contexte.proprietaire,
+            'non-proprietaire': !contexte.proprietaire,
+            'avec-avis': !!contexte.avis,
+            'sans-avis': !contexte.avis,
+            'menu-parent': !!liens.menu_parent,
+            'sans-menu-parent': !liens.menu_parent,
+        };
+    }
+
+    function appliquer(contexte) {
+        const etat = conditions(contexte);
+
+        document.querySelectorAll('[data-si]').forEach(function(element) {
+            const visible = element.dataset.si.split(/\s+/).every(function(condition) {
+                if (condition === 'autre-avis') {
+                    return String(element.dataset.avis) !== String(contexte.avis);
+                }
+                return !!etat[condition];
+            });
+            element.hidden = !visible;
+        });
+
+        document.querySelectorAll('[data-lien]').forEach(function(element) {
+            const lien = (contexte.liens || {})[element.dataset.lien];
+            if (lien) {
+                element.href = lien;
+            }
+        });
+
+        if (contexte.csrf) {
+            document.querySelectorAll('[data-si] input[name="csrfmiddlewaretoken"]').forEach(function(champ) {
+                champ.value = contexte.csrf;
+            });
+        }
+
+        if (contexte.navigation !== undefined) {
+            const anciens = document.querySelectorAll('[data-navigation-utilisateur]');
+            const liste = anciens.length ? anciens[0].parentElement : null;
+            if (liste) {
+                anciens.forEach(function(element) { element.remove(); });
+                liste.insertAdjacentHTML('beforeend', contexte.navigation);
+            }
+        }
+    }
+
+    const parametres = new URLSearchParams(script.dataset.contexteObjet || '');
+    parametres.set('chemin', window.location.pathname);
+
+    fetch(url + '?' + parametres.toString(), {
+        credentials: 'same-origin',
+        headers: {'X-Requested-With': 'XMLHttpRequest'},
+    })
+        .then(function(response) { return response.ok ? response.json() : null; })
+        .then(function(contexte) {
+            if (contexte) {
+                appliquer(contexte);
+            }
+        })
+        .catch(function() {
+            // Page laissée dans son état visiteur
+        });
+})();
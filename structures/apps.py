@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class StructuresConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'structures'
+
+    def ready(self):
+        from structures import signals  # noqa: F401
@@ -0,0 +1,91 @@
+"""Cache des pages publiques d'une structure, invalidé par compteur de génération.
+
+Chaque structure possède un numéro de génération conservé dans le cache et inclus dans
+toutes les clés de ses pages et fragments. Toute modification de la structure ou de ses
+plats, menus, liaisons menu/plat et avis incrémente ce numéro (voir `structures.signals`) :
+les anciennes entrées ne sont plus jamais lues et expirent d'elles-mêmes, sans parcours de clés.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse
+
+DUREE_PAGE = 60 * 60
+
+
+def _cle_generation(structure_id):
+    return f'structure:{structure_id}:generation'
+
+
+def generation(structure_id):
+    """Numéro de génération courant de la structure"""
+    cle = _cle_generation(structure_id)
+    valeur = cache.get(cle)
+    if valeur is None:
+        # Valeur initiale horodatée : une génération évincée du cache ne peut pas être réutilisée
+        cache.add(cle, time.time_ns(), timeout=None)
+        valeur = cache.get(cle)
+    return valeur
+
+
+def generations(structure_ids):
+    """{structure_id: génération} pour plusieurs structures, en une lecture du cache"""
+    structure_ids = {structure_id for structure_id in structure_ids if structure_id is not None}
+    cles = {_cle_generation(structure_id): structure_id for structure_id in structure_ids}
+    valeurs = {cles[cle]: valeur for cle, valeur in cache.get_many(cles).items()}
+    for structure_id in structure_ids - set(valeurs):
+        valeurs[structure_id] = generation(structure_id)
+    return valeurs
+
+
+def invalider(structure_id):
+    """Rend obsolètes toutes les entrées en cache de la structure"""
+    if structure_id is None:
+        return
+    cle = _cle_generation(structure_id)
+    try:
+        cache.incr(cle)
+    except ValueError:
+        cache.set(cle, time.time_ns(), timeout=None)
+
+
+def cle_structure(structure_id, *parties):
+    """Clé de cache d'un fragment de la structure pour la génération courante"""
+    empreinte = hashlib.md5(':'.join(str(partie) for partie in parties).encode()).hexdigest()
+    return f'structure:{structure_id}:{generation(structure_id)}:{empreinte}'
+
+
+def cache_page_structure(structure_de, parametres=()):
+    """Met en cache les pages GET, par structure et par génération.
+
+    La page est partagée par tous les visiteurs : le template ne doit rien contenir de propre
+    à l'utilisateur (voir `accounts.contexte`). `structure_de(**kwargs)` reçoit les paramètres
+    d'URL de la vue et retourne l'id de la structure affichée (None : la page n'est pas mise en cache).
+    La clé ne retient de la query string que les `parametres` lus par la vue, dans cet ordre :
+    les autres (utm_…) ne créent pas de nouvelle entrée.
+    """
+    def decorateur(vue):
+        @wraps(vue)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return vue(request, *args, **kwargs)
+            structure_id = structure_de(**kwargs)
+            if structure_id is None:
+                return vue(request, *args, **kwargs)
+
+            cle = cle_structure(
+                structure_id, 'page', request.path, *(request.GET.get(nom, '') for nom in parametres)
+            )
+            en_cache = cache.get(cle)
+            if en_cache is not None:
+                content_type, contenu = en_cache
+                return HttpResponse(contenu, content_type=content_type)
+
+            response = vue(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(cle, (response['Content-Type'], response.content), DUREE_PAGE)
+            return response
+        return wrapper
+    return decorateur
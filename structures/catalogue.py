@@ -0,0 +1,129 @@
+"""Recherche à facettes du catalogue (structures et plats) exécutée côté base de données.
+
+Les filtres reprennent ceux de la page `structures:structure` ; la pagination se fait
+par clé (keyset) sur l'id décroissant, ou sur (pertinence, id) décroissants pour une
+recherche textuelle, ce qui évite les OFFSET coûteux.
+"""
+from django.db.models import Count, Q
+
+from plats.models import Plats
+from recherche import index
+from structures.models import Structures
+
+TAILLE_PAGE = 12
+
+FILTRES_STRUCTURES = ('ville', 'type')
+FILTRES_PLATS = ('categorie', 'disponibilite', 'en_promotion')
+
+
+def _booleen(valeur):
+    """Convertit 'true'/'false' (insensible à la casse) en booléen, None sinon"""
+    valeur = (valeur or '').lower()
+    if valeur == 'true':
+        return True
+    if valeur == 'false':
+        return False
+    return None
+
+
+def _curseur(valeur, classe):
+    """id, ou (pertinence, id) pour une page classée par pertinence ; None si invalide"""
+    try:
+        if classe:
+            pertinence, _, pk = valeur.rpartition(':')
+            return float(pertinence), int(pk)
+        return int(valeur)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def criteres_structures(params):
+    """Extrait les critères de recherche des structures depuis un QueryDict"""
+    return {
+        'q': params.get('q', '').strip(),
+        'ville': params.get('ville', ''),
+        'type': params.get('type', ''),
+    }
+
+
+def criteres_plats(params):
+    """Extrait les critères de recherche des plats depuis un QueryDict"""
+    return {
+        'q': params.get('q', '').strip(),
+        'categorie': params.get('categorie', ''),
+        'disponibilite': _booleen(params.get('disponibilite')),
+        'en_promotion': _booleen(params.get('promotion')),
+    }
+
+
+def filtrer_structures(criteres, sauf=None):
+    """Queryset des structures correspondant aux critères (en ignorant le filtre `sauf`)"""
+    qs = Structures.objects.all()
+    if criteres['q']:
+        qs = index.filtrer(qs, criteres['q'], 'structure')
+    for champ in FILTRES_STRUCTURES:
+        if champ != sauf and criteres[champ]:
+            qs = qs.filter(**{champ: criteres[champ]})
+    return qs
+
+
+def filtrer_plats(criteres, sauf=None):
+    """Queryset des plats correspondant aux critères (en ignorant le filtre `sauf`)"""
+    qs = Plats.objects.all()
+    if criteres['q']:
+        qs = index.filtrer(qs, criteres['q'], 'plat')
+    for champ in FILTRES_PLATS:
+        valeur = criteres[champ]
+        if champ != sauf and valeur not in ('', None):
+            qs = qs.filter(**{champ: valeur})
+    return qs
+
+
+def paginer(qs, curseur=None, taille=TAILLE_PAGE):
+    """Retourne (objets, curseur_suivant) pour une page triée par id décroissant.
+
+    Un queryset annoté par une recherche (`pertinence`) est trié par pertinence puis id.
+    """
+    classe = 'pertinence' in qs.query.annotations
+    qs = qs.order_by('-pertinence', '-id') if classe else qs.order_by('-id')
+    curseur = _curseur(curseur, classe)
+    if curseur is not None:
+        if classe:
+            pertinence, pk = curseur
+            qs = qs.filter(Q(pertinence__lt=pertinence) | Q(pertinence=pertinence, id__lt=pk))
+        else:
+            qs = qs.filter(id__lt=curseur)
+    objets = list(qs[:taille + 1])
+    suivant = None
+    if len(objets) > taille:
+        objets = objets[:taille]
+        dernier = objets[-1]
+        suivant = f'{dernier.pertinence!r}:{dernier.id}' if classe else str(dernier.id)
+    return objets, suivant
+
+
+def _compter(qs, champ):
+    lignes = qs.order_by().values(champ).annotate(total=Count('id'))
+    return {ligne[champ]: ligne['total'] for ligne in lignes}
+
+
+def facettes_structures(criteres):
+    """Nombre de structures par valeur de chaque facette (les autres filtres appliqués)"""
+    return {
+        champ: _compter(filtrer_structures(criteres, sauf=champ), champ)
+        for champ in FILTRES_STRUCTURES
+    }
+
+
+def facettes_plats(criteres):
+    """Nombre de plats par valeur de chaque facette (les autres filtres appliqués)"""
+    facettes = {}
+    for champ in FILTRES_PLATS:
+        comptes = _compter(filtrer_plats(criteres, sauf=champ), champ)
+        if champ == 'categorie':
+            facettes[champ] = comptes
+        else:
+            # Clés 'true'/'false' et nom du paramètre GET pour correspondre aux filtres
+            cle_facette = 'promotion' if champ == 'en_promotion' else champ
+            facettes[cle_facette] = {str(cle).lower(): total for cle, total in comptes.items()}
+    return facettes
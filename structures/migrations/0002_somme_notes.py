@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('structures', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='structures',
+            name='somme_notes',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Somme des notes'),
+        ),
+    ]
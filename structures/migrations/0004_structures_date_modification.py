@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('structures', '0003_structures_etat_photo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='structures',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.core.exceptions import ValidationError
 
 from accounts.models import User
+from medias.models import EtatPhoto
 
 
 # Create your models here.
@@ -39,13 +40,16 @@ class Structures(models.Model):
     description = models.TextField(blank=True, null=True)
     type = models.CharField(max_length=100, choices=TYPE_CHOICES)
     photo = models.ImageField(upload_to='structures/', blank=True, null=True)
+    etat_photo = models.CharField(max_length=12, choices=EtatPhoto.choices, default=EtatPhoto.AUCUN, blank=True, editable=False)
     date_creation = models.DateTimeField(auto_now_add=True)
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
 
     featured = models.BooleanField(default=False, verbose_name="Mettre en avant")
     
     # Champs pour les notes et avis
     note_moyenne = models.DecimalField(max_digits=3, decimal_places=2, default=0.00, verbose_name="Note moyenne")
     nombre_avis = models.IntegerField(default=0, verbose_name="Nombre d'avis")
+    somme_notes = models.PositiveIntegerField(default=0, editable=False, verbose_name="Somme des notes")
 
     class Meta:
         ordering = ['-date_creation']
@@ -0,0 +1,82 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from avis.models import Avis
+from medias.traitement import photo_traitee
+from menus.models import MenuPlat, Menus
+from plats.models import Plats
+from structures import cache
+from structures.models import Structures
+
+
+def invalider_apres_commit(*structure_ids):
+    # Après le commit : une lecture concurrente ne peut pas remettre en cache l'ancien état
+    for structure_id in set(structure_ids):
+        if structure_id is not None:
+            transaction.on_commit(lambda structure_id=structure_id: cache.invalider(structure_id))
+
+
+def structures_du_plat(plat_id=None, plat=None):
+    """Structures dont les pages affichent le plat (sa structure, sinon celles de son créateur)"""
+    if plat is None:
+        plat = Plats.objects.filter(pk=plat_id).only('structure_id', 'createur_id').first()
+        if plat is None:
+            return []
+    if plat.structure_id is not None:
+        return [plat.structure_id]
+    return list(Structures.objects.filter(user_id=plat.createur_id).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Structures)
+@receiver(post_delete, sender=Structures)
+def invalider_structure(sender, instance, **kwargs):
+    invalider_apres_commit(instance.pk)
+
+
+@receiver(photo_traitee, sender=Structures)
+def invalider_photo_structure(sender, instance, **kwargs):
+    # Renditions prêtes : les pages doivent passer de l'original aux renditions
+    invalider_apres_commit(instance.pk)
+
+
+@receiver(post_save, sender=Plats)
+@receiver(post_delete, sender=Plats)
+@receiver(photo_traitee, sender=Plats)
+def invalider_plat(sender, instance, **kwargs):
+    invalider_apres_commit(*structures_du_plat(plat=instance))
+
+
+@receiver(post_save, sender=Menus)
+@receiver(post_delete, sender=Menus)
+def invalider_menu(sender, instance, **kwargs):
+    invalider_apres_commit(instance.structure_id)
+
+
+@receiver(post_save, sender=MenuPlat)
+@receiver(post_delete, sender=MenuPlat)
+def invalider_menu_plat(sender, instance, **kwargs):
+    invalider_apres_commit(*Menus.objects.filter(pk=instance.menu_id).values_list('structure_id', flat=True))
+
+
+@receiver(m2m_changed, sender=MenuPlat)
+def invalider_plats_du_menu(sender, instance, action, reverse, pk_set, **kwargs):
+    # menu.plats.set()/add()/remove() passent par bulk_create/delete, sans post_save/post_delete
+    # clear() est traité avant coup, tant que les liaisons existent encore
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        # plat.menus.add(...) : instance est le plat, pk_set les menus
+        menus = Menus.objects.filter(pk__in=pk_set) if pk_set else Menus.objects.filter(plats=instance)
+        invalider_apres_commit(*menus.values_list('structure_id', flat=True))
+    else:
+        invalider_apres_commit(instance.structure_id)
+
+
+@receiver(post_save, sender=Avis)
+@receiver(post_delete, sender=Avis)
+def invalider_avis(sender, instance, **kwargs):
+    if instance.structure_id is not None:
+        invalider_apres_commit(instance.structure_id)
+    if instance.plat_id is not None:
+        invalider_apres_commit(*structures_du_plat(plat_id=instance.plat_id))
@@ -0,0 +1,24 @@
+"""Données communes aux tests des applications : un restaurateur et sa structure"""
+from accounts.models import User
+from structures.models import Structures
+
+
+def creer_utilisateur(email='chef@emenu.tg', **champs):
+    valeurs = {'password': 'x', 'first_name': 'A', 'last_name': 'B'}
+    valeurs.update(champs)
+    return User.objects.create_user(email=email, **valeurs)
+
+
+def creer_structure(user, **champs):
+    valeurs = {'nom': 'Maquis', 'telephone': '90000000', 'adresse': 'Rue 1', 'ville': 'Lomé', 'type': 'restaurant'}
+    valeurs.update(champs)
+    return Structures.objects.create(user=user, **valeurs)
+
+
+class StructureTestMixin:
+    """Crée dans setUp le restaurateur `self.user` et sa structure `self.structure`"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = creer_utilisateur()
+        self.structure = creer_structure(self.user)
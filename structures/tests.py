@@ -1,3 +1,106 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from menus.models import Menus
+from plats.models import Plats
+from structures import catalogue
+from structures.cache import generation
+from structures.testing import StructureTestMixin, creer_structure, creer_utilisateur
+
+
+class CachePagesStructureTests(StructureTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.plat = Plats.objects.create(
+            nom='Fufu', description='d', prix=1000, categorie='plat', createur=self.user, structure=self.structure,
+        )
+        self.menu = Menus.objects.create(nom='Midi', createur=self.user, structure=self.structure)
+        self.url = reverse('structures:detail', args=[self.structure.pk])
+
+    def test_page_anonyme_servie_depuis_le_cache(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Fufu')
+
+    def test_query_string_non_lue_ignoree(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url, {'utm_source': 'facebook', 'x': '1'})
+
+        # Seul le paramètre lu par la vue distingue les entrées
+        url = reverse('avis:avis-structure-public', args=[self.structure.pk])
+        self.client.get(url, {'page': '2', 'utm_source': 'facebook'})
+        with self.assertNumQueries(0):
+            self.client.get(url, {'x': '1', 'page': '2'})
+        with CaptureQueriesContext(connection) as requetes:
+            self.client.get(url, {'page': '1'})
+        self.assertTrue(requetes.captured_queries)
+
+    def test_modification_d_un_plat_invalide_la_page(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plat.nom = 'Akoume'
+            self.plat.save()
+        self.assertContains(self.client.get(self.url), 'Akoume')
+
+    def test_liaison_menu_plat_change_la_generation(self):
+        avant = generation(self.structure.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.menu.plats.add(self.plat)
+        self.assertNotEqual(generation(self.structure.pk), avant)
+
+    def test_page_identique_pour_un_utilisateur_connecte(self):
+        anonyme = self.client.get(self.url).content
+        self.client.force_login(self.user)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.content, anonyme)
+        self.assertNotContains(response, 'Mon compte')
+
+
+class CatalogueTests(StructureTestMixin, TestCase):
+    def creer_plat(self, nom, **champs):
+        valeurs = {'description': 'd', 'prix': 1000, 'categorie': 'plat'}
+        valeurs.update(champs)
+        return Plats.objects.create(nom=nom, createur=self.user, structure=self.structure, **valeurs)
+
+    def test_curseur_stable_entre_les_pages(self):
+        plats = [self.creer_plat(f'Plat {i}') for i in range(5)]
+        criteres = catalogue.criteres_plats({})
+        page, suivant = catalogue.paginer(catalogue.filtrer_plats(criteres), taille=2)
+        # Un plat ajouté entre deux pages ne décale pas la suite
+        self.creer_plat('Nouveau')
+        lus = [plat.pk for plat in page]
+        while suivant:
+            page, suivant = catalogue.paginer(catalogue.filtrer_plats(criteres), suivant, taille=2)
+            lus += [plat.pk for plat in page]
+        self.assertEqual(lus, [plat.pk for plat in reversed(plats)])
+
+        # Curseur illisible : première page
+        page, _ = catalogue.paginer(catalogue.filtrer_plats(criteres), 'abc', taille=2)
+        self.assertEqual(page[0].nom, 'Nouveau')
+
+    def test_facettes_sous_filtres(self):
+        self.creer_plat('Fufu')
+        self.creer_plat('Ablo', disponibilite=False)
+        self.creer_plat('Dégué', categorie='dessert', en_promotion=True, pourcentage_reduction=10)
+        self.creer_plat('Bissap', categorie='boisson', disponibilite=False)
+
+        criteres = catalogue.criteres_plats({'categorie': 'plat', 'disponibilite': 'true'})
+        self.assertEqual(catalogue.filtrer_plats(criteres).count(), 1)
+        facettes = catalogue.facettes_plats(criteres)
+        # Chaque facette ignore son propre filtre et applique les autres
+        self.assertEqual(facettes['categorie'], {'plat': 1, 'dessert': 1})
+        self.assertEqual(facettes['disponibilite'], {'true': 1, 'false': 1})
+        self.assertEqual(facettes['promotion'], {'false': 1})
+
+        creer_structure(creer_utilisateur('cafe@emenu.tg'), nom='Café', ville='Kara', type='cafe')
+        creer_structure(creer_utilisateur('resto@emenu.tg'), nom='Resto', ville='Kara')
+        facettes = catalogue.facettes_structures(catalogue.criteres_structures({'ville': 'Kara', 'type': 'cafe'}))
+        self.assertEqual(facettes['ville'], {'Kara': 1})
+        self.assertEqual(facettes['type'], {'cafe': 1, 'restaurant': 1})
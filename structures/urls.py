@@ -1,5 +1,3 @@
-from django.conf import settings
-from django.conf.urls.static import static
 from django.urls import path
 from . import views  # Importez vos vues depuis accounts/views.py
 
@@ -9,6 +7,8 @@ urlpatterns = [
     # Authentification
     path('register_structure/', views.register_structure, name='register_structure'),
     path('structure/', views.list_structures, name='structure'),
+    path('recherche/structures/', views.recherche_structures, name='recherche-structures'),
+    path('recherche/plats/', views.recherche_plats, name='recherche-plats'),
 
     # URLs de gestion des structures
     path('structure_detail/<int:pk>/', views.structure_detail, name='structure-detail'),
@@ -16,4 +16,4 @@ urlpatterns = [
     path('structure_form/<int:pk>/', views.structure_update, name='structure-update'),
     path('account_delete/<int:pk>/', views.structure_delete, name='structure-delete'),
 
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+]
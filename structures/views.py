@@ -1,9 +1,14 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import render_to_string
 
+from medias.renditions import url_rendition
 from menus.models import Menus
 from plats.models import Plats
+from structures import catalogue
+from structures.cache import cache_page_structure
 from structures.forms import StructuresRegistrationForm, StructuresUpdateForm
 from structures.models import Structures
 from django.templatetags.static import static
@@ -44,33 +49,67 @@ def register_structure(request):
     })
 
 def list_structures(request):
-    """Liste toutes les structures disponibles"""
-    featured_structures = Structures.objects.all().order_by('-id')
+    """Liste des structures et des plats : seule la première page est rendue, la suite est chargée via la recherche"""
+    criteres_s = catalogue.criteres_structures(request.GET)
+    criteres_p = catalogue.criteres_plats(request.GET)
 
-    # Récupère les villes et catégories uniques pour les filtres
-    villes = Structures.objects.order_by('ville').values_list('ville', flat=True).distinct()
-    categories = Structures.objects.order_by('type').values_list('type', flat=True).distinct()
+    featured_structures, structures_suivant = catalogue.paginer(catalogue.filtrer_structures(criteres_s))
+    featured_plats, plats_suivant = catalogue.paginer(catalogue.filtrer_plats(criteres_p))
 
-    # Plats
-    featured_plats = Plats.objects.all().order_by('-id')
-    # Catégories uniques (code, label)
-    unique_codes = list(Plats.objects.values_list('categorie', flat=True).distinct())
+    # Valeurs disponibles pour les filtres, avec leur nombre de résultats
+    facettes_s = catalogue.facettes_structures(criteres_s)
+    facettes_p = catalogue.facettes_plats(criteres_p)
     label_map = dict(Plats.CATEGORIES)
-    plat_categories = [(code, label_map.get(code, code)) for code in unique_codes]
-
+    plat_categories = [
+        (code, label_map.get(code, code), total)
+        for code, total in sorted(facettes_p['categorie'].items())
+    ]
 
     context = {
         # Structures
         'featured_structures': featured_structures,
-        'villes': villes,
-        'categories': categories,
+        'structures_suivant': structures_suivant,
+        'villes': sorted(facettes_s['ville'].items()),
+        'categories': sorted(facettes_s['type'].items()),
+        'criteres_structures': criteres_s,
 
         # Plats
         'featured_plats': featured_plats,
+        'plats_suivant': plats_suivant,
         'plat_categories': plat_categories,
+        'criteres_plats': criteres_p,
     }
     return render(request, 'structures/structure.html', context)
 
+
+def _reponse_recherche(request, template, nom_objet, objets, suivant, facettes):
+    html = ''.join(
+        render_to_string(template, {nom_objet: objet}, request=request)
+        for objet in objets
+    )
+    return JsonResponse({
+        'html': html,
+        'nombre': len(objets),
+        'suivant': suivant,
+        'facettes': facettes,
+    })
+
+
+def recherche_structures(request):
+    """Page de structures filtrée côté serveur (JSON : cartes HTML, curseur suivant, facettes)"""
+    criteres = catalogue.criteres_structures(request.GET)
+    objets, suivant = catalogue.paginer(catalogue.filtrer_structures(criteres), request.GET.get('apres'))
+    facettes = catalogue.facettes_structures(criteres) if not request.GET.get('apres') else None
+    return _reponse_recherche(request, 'structures/_carte_structure.html', 'structure', objets, suivant, facettes)
+
+
+def recherche_plats(request):
+    """Page de plats filtrée côté serveur (JSON : cartes HTML, curseur suivant, facettes)"""
+    criteres = catalogue.criteres_plats(request.GET)
+    objets, suivant = catalogue.paginer(catalogue.filtrer_plats(criteres), request.GET.get('apres'))
+    facettes = catalogue.facettes_plats(criteres) if not request.GET.get('apres') else None
+    return _reponse_recherche(request, 'structures/_carte_plat.html', 'plat', objets, suivant, facettes)
+
 @login_required(login_url='accounts:login')
 def structure_detail(request, pk):
     """Détails d'une structure spécifique (accessible seulement par son propriétaire)"""
@@ -78,6 +117,7 @@ def structure_detail(request, pk):
     return render(request, 'structures/structure_detail.html', {'structure': structure})
 
 
+@cache_page_structure(lambda pk: pk)
 def detail(request, pk):
     """Détails d'une structure spécifique avec les menus et les plats qui la constituent"""
     structure = get_object_or_404(Structures, pk=pk)
@@ -85,18 +125,8 @@ def detail(request, pk):
     # Récupère tous les plats créés par l'utilisateur qui possède cette structure
     plats = Plats.objects.filter(createur=structure.user)
 
-    # Vérifie si l'utilisateur actuel a des structures
-    has_structure = False
-    if request.user.is_authenticated:
-        has_structure = request.user.structure.exists()
-
-    # Infos avis utilisateur
-    from avis.models import Avis
-    user_has_avis = False
-    user_avis = None
-    if request.user.is_authenticated:
-        user_avis = Avis.objects.filter(user=request.user, structure=structure).first()
-        user_has_avis = user_avis is not None
+    # Page commune à tous les visiteurs (mise en cache) : les parties propres à
+    # l'utilisateur sont chargées par accounts:contexte-utilisateur
 
     # Catégories dynamiques présentes pour cette structure, ordonnées selon les choix du modèle
     order = [k for k, _ in Plats.CATEGORIES]
@@ -111,14 +141,11 @@ def detail(request, pk):
         for key in present_keys
     ]
 
-    hero_bg_url = structure.photo.url if structure.photo else static('images/restaurant-bg1.jpg')
+    hero_bg_url = url_rendition(structure.photo, 'hero') if structure.photo else static('images/restaurant-bg1.jpg')
 
     context = {
         'structure': structure,
         'plats': plats,
-        'has_structure': has_structure,
-        'user_has_avis': user_has_avis,
-        'user_avis': user_avis,
         'categories': categories,
         'hero_bg_url': hero_bg_url,
     }